@@ -12,15 +12,13 @@ library(tidyr)
 # Edit the fields below to choose the individual lion, date,
 # and exact time span of accelerometery data you want to view
 # R Script inputs (filled in by python script)
-csv_path = "{csv_path}"
+csv_paths = c({csv_paths})      # day file(s) covering the plot window, in time order
+csv_days = c({csv_days})        # date (YYYY-MM-DD) of each day file
 lion.name = "{lion_name}"
 year = {year}
 month = {month}
 day = {day}
-day_low = day
-day_high = day
 hour = {hour}
-hour_high = hour
 plot_title = toTitleCase("{plot_type}")
 minor_tick_interval = {minor_tick_interval}
 
@@ -86,36 +84,17 @@ window_high_sec = 0
 second_low = 00
 second_high = 00
 
-min_low = window_low_min - window_pre_mins
-while (min_low < 0){{
-  min_low = 60 + min_low
-  hour = hour - 1
-}}
-
-min_high = window_high_min + window_post_mins
-while (min_high >= 60){{
-  min_high = min_high - 60;
-  hour_high = hour_high + 1;
-}}
-
-if (hour < 0){{
-    hour = 0
-    min_low = 0
-    #hour = hour + 24
-    #day_low = day_low - 1
-}}
-
-if (hour_high >= 24){{
-    hour_high = 23
-    min_high = 59
-    #hour_high -= 24
-    #day_high = day_high + 1
-}}
 # added to file name
 file_desc = "_{plot_type}_{Kill_ID}"
 
 
-accel <- read.csv(csv_path, skip=1) # directory where daily accel files are stored
+# read each day file and prefix its times with the day, so windows can cross midnight
+read_day <- function(path, day_str) {{
+  day_accel <- read.csv(path, skip=1)
+  day_accel$UTC.DateTime <- paste(day_str, day_accel$UTC.DateTime, sep = " ")
+  day_accel
+}}
+accel <- do.call(rbind, unname(mapply(read_day, csv_paths, csv_days, SIMPLIFY = FALSE)))
 
 
 
@@ -126,8 +105,7 @@ accel <- accel %>%
          Z.Axis = Acc.Z..g.)
 
 #format the date column
-utc_col = sprintf("%s-%s-%s", year, month, day)
-accel$UTC.DateTime <- force_tz(strptime(paste(utc_col, accel$UTC.DateTime, sep = " "), format = "%Y-%m-%d %H:%M:%S"), tz = "UTC")
+accel$UTC.DateTime <- force_tz(strptime(accel$UTC.DateTime, format = "%Y-%m-%d %H:%M:%S"), tz = "UTC")
 
 ###Double check Hrz of collar
 # filen = paste(as.character(filename), year, "/Month_", month, "/Day_", day, "/Data_", year, "-", str_pad(month, 2, pad="0"), "-", str_pad(day, 2, pad = "0"), "_", hour, ".csv", sep="")
@@ -148,19 +126,16 @@ Xg = accel$X.Axis*64/1000
 Yg = accel$Y.Axis*64/1000
 Zg = accel$Z.Axis*64/1000
 
-#make time objects for start and end times
-time_low <- paste(paste(year, month, day, sep = "-"), paste(hour, min_low, second_low, sep = ":"))
-time_low <- strptime(as.character(paste(time_low, "001", sep = ".")), format = "%Y-%m-%d %H:%M:%OS", tz = "UTC")
-
-time_high <- paste(paste(year, month, day, sep = "-"), paste(hour_high, min_high, second_high, sep = ":"))
-time_high <- strptime(as.character(paste(time_high, "999", sep = ".")), format = "%Y-%m-%d %H:%M:%OS", tz = "UTC")
-
 window_low <- paste(paste(year, month, day, sep = "-"), paste(window_low_hour, window_low_min, window_low_sec, sep = ":"))
 window_low <- strptime(as.character(paste(window_low, "001", sep = ".")), format = "%Y-%m-%d %H:%M:%OS", tz = "UTC")
 
 window_high <- paste(paste(year, month, day, sep = "-"), paste(window_high_hour, window_high_min, window_high_sec, sep = ":"))
 window_high <- strptime(as.character(paste(window_high, "001", sep = ".")), format = "%Y-%m-%d %H:%M:%OS", tz = "UTC")
 
+#make time objects for start and end times (may fall on the previous/next day)
+time_low <- as.POSIXct(window_low) - window_pre_mins * 60
+time_high <- as.POSIXct(window_high) + window_post_mins * 60 + 0.998
+
 cons_window_low <- paste(paste(year, month, day, sep = "-"), paste(cons_window_low_hour, cons_window_low_min, cons_window_low_sec, sep = ":"))
 cons_window_low <- strptime(as.character(paste(cons_window_low, "001", sep = ".")), format = "%Y-%m-%d %H:%M:%OS", tz = "UTC")
 
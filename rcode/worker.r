@@ -0,0 +1,58 @@
+# Long lived plotting worker, launched by spreadsheet_utils.py (render_mode = "r_pool")
+#
+# Usage: Rscript worker.r <manifest.csv> <template.r> <worker_id> <num_workers>
+#
+# Loads the libraries once, then renders every num_workers-th row of the job manifest by
+# filling the plot template with the row's fields (the same fields python would .format() in)
+# and evaluating it in a fresh environment. One status line is printed per job, the worker exits
+# with status 1 if any of its jobs failed.
+
+library(stringr)
+library(dplyr)
+library(lubridate)
+library(ggplot2)
+library(tools)
+library(tidyr)
+
+args <- commandArgs(trailingOnly = TRUE)
+manifest_path <- args[1]
+template_path <- args[2]
+worker_id <- as.integer(args[3])
+num_workers <- as.integer(args[4])
+
+template <- paste(readLines(template_path), collapse = "\n")
+manifest <- read.csv(manifest_path, colClasses = "character", check.names = FALSE)
+
+fill_template <- function(template, row) {
+  # one pass over the template, like python's str.format: "{{"/"}}" are unescaped and "{key}" is
+  # replaced by the row's field, text coming from the fields is never unescaped or substituted again
+  tokens <- gregexpr("\\{\\{|\\}\\}|\\{[A-Za-z_][A-Za-z0-9_]*\\}", template, perl = TRUE)
+  regmatches(template, tokens) <- list(vapply(regmatches(template, tokens)[[1]], function(token) {
+    if (token == "{{") return("{")
+    if (token == "}}") return("}")
+    key <- substr(token, 2, nchar(token) - 1)
+    if (key %in% names(row)) row[[key]] else token
+  }, character(1), USE.NAMES = FALSE))
+  template
+}
+
+failed <- 0
+for (i in seq_len(nrow(manifest))) {
+  if ((i - 1) %% num_workers != worker_id) next
+
+  row <- as.list(manifest[i, ])
+  start <- Sys.time()
+  status <- tryCatch({
+    eval(parse(text = fill_template(template, row)), envir = new.env())
+    "OK"
+  }, error = function(e) paste("ERROR:", conditionMessage(e)))
+  if (status != "OK") failed <- failed + 1
+  elapsed <- as.numeric(difftime(Sys.time(), start, units = "secs"))
+  cat(sprintf("%s\t%s\t%.2f\n", row[["job_id"]], status, elapsed))
+}
+
+# a non zero exit marks the worker as failed in the run report, the log has the status of each job
+if (failed > 0) {
+  cat(sprintf("%d jobs failed\n", failed))
+  quit(status = 1)
+}
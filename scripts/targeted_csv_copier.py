@@ -1,13 +1,27 @@
 import argparse
 from collections import defaultdict
+import concurrent.futures
+import contextlib
 from datetime import datetime, timedelta
 import glob
+import hashlib
+import json
+import gzip
 import logging
+import numpy as np
 import os
 import pandas as pd
 import shutil
+import sys
+import tempfile
 import unittest
 
+# Add the parent directory to the system path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+
+from utils.data_config import data_paths
+from utils.day_catalog import open_catalog, refresh_catalog, find_day_file
+
 """
 Script: targeted_csv_copier.py
 
@@ -25,6 +39,15 @@ Features:
 - Reads an input CSV file with required columns: `cougID`, `species`, `cluster_start_MST`.
 - Adjusts cluster start times by a configurable hour offset (`--hour_offset`), defaulting to 7 (Mountain Time to UTC).
 - Copies daily motion data files based on adjusted times and a buffer window (`--buffer_hours`), defaulting to 6 hours.
+- Resolves the daily files through a catalog of the input directory (utils/day_catalog.py) built by a single
+  directory walk and refreshed incrementally on later runs, instead of a glob per date.
+- Copies each (cougID, date) file once, however many clusters need it, in a thread pool (`--workers`).
+- Skips files already in the output directory with the same size (and sha1 with `--checksum`), and records every
+  completed file in a manifest (`--manifest`) so an interrupted copy resumes where it stopped.
+- Optionally hardlinks or reflinks instead of copying when input and output share a filesystem (`--link`).
+- Trim mode (`--trim`) writes only the rows within `--buffer_hours` of each cluster start instead of whole days
+  (taking rows from the previous/next day's file when the window crosses midnight), optionally gzip compressed
+  (`--compress`).
 - Maintains the directory structure during file copying.
 - Includes a dry run mode (`--dry_run`) to simulate operations without making changes.
 - Logs missing files and generates a detailed summary of copied and missing files.
@@ -36,6 +59,14 @@ Arguments:
 - `--input_csv`: Path to the input CSV file containing cluster times.
 - `--hour_offset`: Number of hours to adjust cluster start times (default: 7 for Mountain Time to UTC).
 - `--buffer_hours`: Buffer period in hours to include adjacent days' data (default: 6 hours).
+- `--catalog`: SQLite catalog of the day files (default: data_paths day_catalog_path).
+- `--no_catalog`: Resolve each day file with a glob instead of the catalog.
+- `--workers`: Number of files copied in parallel (default: 8).
+- `--link`: copy (default), hardlink or reflink; falls back to a copy where linking is not possible.
+- `--checksum`: Compare sha1 checksums (not only sizes) before skipping a file already in the output directory.
+- `--manifest`: Manifest of completed files (default: <output_dir>/copy_manifest.jsonl).
+- `--trim`: Keep only the rows within buffer_hours of each cluster start (default: copy whole days).
+- `--compress`: With --trim, write the trimmed files gzip compressed (<date>.csv.gz).
 - `--dry_run`: Simulates the process without copying files.
 - `--run_tests`: Runs unit tests to validate script behavior.
 
@@ -46,6 +77,12 @@ python targeted_csv_copier.py --input_dir <input_directory> --output_dir <output
 
 logging.basicConfig(level=logging.INFO, format='%(message)s')
 
+MANIFEST_NAME = "copy_manifest.jsonl"
+LINK_MODES = ["copy", "hardlink", "reflink"]
+FICLONE = 0x40049409    # linux/fs.h, clone a whole file (reflink)
+HEADER_LINES = 2        # collar info and column header lines at the top of each daily CSV
+TRIM_BLOCK_BYTES = 1 << 24
+
 
 def adjust_time(cluster_start, hour_offset):
     """Adjust the time by the given hour offset."""
@@ -61,9 +98,22 @@ def adjust_time(cluster_start, hour_offset):
         raise ValueError(f"Error parsing time for cluster_start '{cluster_start}': {e}")
 
 
-def copy_csv_files(input_dir, output_dir, coug_id, additional_dates, copied_files, missing_files):
-    """Copy the target CSV and additional date files to the output directory."""
-    for date in additional_dates:
+def get_target_dates(adjusted_time, buffer_hours):
+    """Dates whose daily files are needed for a cluster (the previous/next day too when within buffer_hours of midnight)."""
+    dates = [adjusted_time]
+    if adjusted_time.hour <= buffer_hours:
+        dates.append(adjusted_time - timedelta(days=1))
+    if adjusted_time.hour >= (24 - buffer_hours):
+        dates.append(adjusted_time + timedelta(days=1))
+    return dates
+
+
+def resolve_csv_files(input_dir, output_dir, coug_id, dates, missing_files, catalog=None):
+    """Source and destination paths of the daily CSVs of a cougar on the given dates.
+    Files are looked up in the catalog (refreshed for input_dir) when given, else with a glob per date.
+    Dates without a file are added to missing_files."""
+    jobs = []
+    for date in dates:
         csv_path = os.path.join(
             input_dir,
             f"{coug_id}_*",
@@ -75,33 +125,244 @@ def copy_csv_files(input_dir, output_dir, coug_id, additional_dates, copied_file
         )
 
         # Resolve glob pattern to an actual file path
-        matching_files = list(glob.glob(csv_path))
-        if not matching_files:
+        if catalog is not None:
+            matching_files = [find_day_file(catalog, coug_id, date, root=input_dir)]
+        else:
+            matching_files = sorted(glob.glob(csv_path))
+        if not matching_files or matching_files[0] is None:
             missing_files[coug_id].append(csv_path)
             continue
 
         target_file = matching_files[0]
         relative_path = os.path.relpath(target_file, input_dir)
-        destination_file = os.path.join(output_dir, relative_path)
+        jobs.append((target_file, os.path.join(output_dir, relative_path)))
+    return jobs
+
+
+def load_manifest(manifest_path):
+    """Files completed by earlier (possibly interrupted) runs, keyed by destination."""
+    done = {}
+    if os.path.isfile(manifest_path):
+        with open(manifest_path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue    # last line of a run that was killed while writing it
+                done[entry["destination"]] = entry
+    return done
+
+
+def get_stamp(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
 
-        # Create intermediate directories if necessary
-        if args.dry_run:
-            logging.info(f"Dry run: Would copy {target_file} to {destination_file}")
-        else:
-            os.makedirs(os.path.dirname(destination_file), exist_ok=True)
-            shutil.copyfile(target_file, destination_file)
-        copied_files[coug_id].append(target_file)
 
+def get_checksum(path, block_size=1 << 20):
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            sha1.update(block)
+    return sha1.hexdigest()
 
-def process(input_dir, output_dir, input_csv, hour_offset, buffer_hours):
+
+def files_match(source, destination, checksum=False):
+    """True when destination already holds source: same size (and same sha1 when checksum is set)."""
+    if not os.path.isfile(destination) or os.path.getsize(source) != os.path.getsize(destination):
+        return False
+    return not checksum or get_checksum(source) == get_checksum(destination)
+
+
+def reflink(source, destination):
+    """Copy-on-write clone of source (FICLONE ioctl, Linux on btrfs/XFS); raises OSError where unsupported."""
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError("reflinks are not supported on this platform")
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+
+def transfer_file(source, destination, link_mode="copy"):
+    """Copy (or hardlink/reflink) source to destination.
+    The data goes to a temporary file renamed into place, so an interrupted copy never leaves a partial
+    destination. Linking falls back to a copy when it is not possible (e.g. different filesystems).
+    Returns the mode actually used."""
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    partial = f"{destination}.part"
+    if os.path.lexists(partial):
+        os.remove(partial)
+    used = "copy"
+    try:
+        if link_mode == "hardlink":
+            os.link(source, partial)
+            used = "hardlink"
+        elif link_mode == "reflink":
+            reflink(source, partial)
+            used = "reflink"
+    except OSError as e:
+        logging.debug(f"Unable to {link_mode} {source}, copying instead: {e}")
+        if os.path.lexists(partial):
+            os.remove(partial)
+    if used == "copy":
+        shutil.copyfile(source, partial)
+    os.replace(partial, destination)
+    return used
+
+
+def get_trim_intervals(adjusted_time, buffer_hours):
+    """Seconds of the day [start, end] within buffer_hours of adjusted_time, for each day the window touches."""
+    window_start = adjusted_time - timedelta(hours=buffer_hours)
+    window_end = adjusted_time + timedelta(hours=buffer_hours)
+    intervals = {}
+    day = datetime(window_start.year, window_start.month, window_start.day)
+    while day <= window_end:
+        start = max(window_start, day) - day
+        end = min(window_end, day + timedelta(days=1) - timedelta(seconds=1)) - day
+        intervals[day] = [int(start.total_seconds()), int(end.total_seconds())]
+        day += timedelta(days=1)
+    return intervals
+
+
+def merge_intervals(intervals):
+    """Sorted, non overlapping union of [start, end] intervals."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def decode_row_seconds(raw, starts):
+    """Seconds of the day of the rows starting at the given offsets (HH:MM:SS first column), -1 for other lines."""
+    seconds = np.full(len(starts), -1, dtype=np.int64)
+    valid = starts + 8 <= len(raw)
+    time_bytes = raw[starts[valid][:, None] + np.arange(8)]
+    digits = time_bytes[:, [0, 1, 3, 4, 6, 7]].astype(np.int64) - ord("0")
+    is_time = (time_bytes[:, 2] == ord(":")) & (time_bytes[:, 5] == ord(":")) & np.all((digits >= 0) & (digits <= 9), axis=1)
+    decoded = (digits[:, 0] * 10 + digits[:, 1]) * 3600 + (digits[:, 2] * 10 + digits[:, 3]) * 60 \
+        + digits[:, 4] * 10 + digits[:, 5]
+    seconds[np.flatnonzero(valid)] = np.where(is_time, decoded, -1)
+    return seconds
+
+
+def trim_day_file(source, destination, intervals, compress=False, block_size=TRIM_BLOCK_BYTES):
+    """Stream a daily CSV and write its header lines plus only the rows inside the [start, end] seconds intervals.
+    Rows are in time order, reading stops after the last interval. Written through a temporary file like
+    transfer_file, gzip compressed when compress is set. Returns the number of rows written."""
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    partial = f"{destination}.part"
+    last_second = max(end for _, end in intervals)
+    rows = 0
+    with open(source, "rb") as src, \
+            (gzip.open(partial, "wb", compresslevel=6) if compress else open(partial, "wb")) as dst:
+        for _ in range(HEADER_LINES):
+            dst.write(src.readline())
+        carry = b""
+        while True:
+            block = src.read(block_size)
+            if block:
+                block = carry + block
+            elif carry.strip():
+                block = carry + b"\n"     # last row without a line break
+            else:
+                break
+            raw = np.frombuffer(block, dtype=np.uint8)
+            ends = np.flatnonzero(raw == ord("\n")) + 1
+            if not len(ends):
+                carry = block
+                continue
+            carry = block[ends[-1]:]
+            starts = np.concatenate([[0], ends[:-1]])
+            seconds = decode_row_seconds(raw, starts)
+            keep = np.zeros(len(starts), dtype=bool)
+            for start, end in intervals:
+                keep |= (seconds >= start) & (seconds <= end)
+            # write each run of kept rows as one slice of the block
+            edges = np.flatnonzero(np.diff(np.concatenate([[0], keep.astype(np.int8), [0]])))
+            for first, stop in zip(edges[::2], edges[1::2]):
+                dst.write(block[starts[first]:ends[stop - 1]])
+            rows += int(keep.sum())
+            if seconds.max(initial=-1) > last_second:
+                break
+    os.replace(partial, destination)
+    return rows
+
+
+def copy_files(jobs, manifest_path, link_mode="copy", max_workers=8, checksum=False, dry_run=False, trims=None,
+               compress=False):
+    """Copy (source, destination) pairs in a thread pool.
+    Files recorded in the manifest (source unchanged since) or already present with the same size/checksum are
+    skipped; every completed file is appended to the manifest so an interrupted run resumes where it stopped.
+    With trims (source -> list of [start, end] seconds of the day) only the rows inside those windows are written.
+    Returns a dict of source -> status (copy, hardlink, reflink, trimmed, skipped, failed, dry_run)."""
+    done = load_manifest(manifest_path)
+    statuses = {}
+    pending = []
+    for source, destination in jobs:
+        entry = done.get(destination)
+        trim = trims[source] if trims else None
+        if entry and entry["source"] == source and [entry["size"], entry["mtime_ns"]] == list(get_stamp(source)) \
+                and entry.get("trim") == trim and os.path.isfile(destination) \
+                and os.path.getsize(destination) == entry["destination_size"]:
+            statuses[source] = "skipped"
+        elif dry_run:
+            logging.info(f"Dry run: Would {'trim' if trims else 'copy'} {source} to {destination}")
+            statuses[source] = "dry_run"
+        else:
+            pending.append((source, destination))
+
+    def transfer(job):
+        source, destination = job
+        if trims:
+            trim_day_file(source, destination, trims[source], compress)
+            return "trimmed"
+        if files_match(source, destination, checksum):
+            return "skipped"
+        return transfer_file(source, destination, link_mode)
+
+    with open(manifest_path, "a") if not dry_run else contextlib.nullcontext() as manifest, \
+            concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(transfer, job): job for job in pending}
+        for future in concurrent.futures.as_completed(futures):
+            source, destination = futures[future]
+            try:
+                statuses[source] = future.result()
+            except (OSError, ValueError) as e:
+                logging.error(f"Failed to copy {source}: {e}")
+                statuses[source] = "failed"
+                continue
+            size, mtime_ns = get_stamp(source)
+            entry = {"source": source, "destination": destination, "size": size, "mtime_ns": mtime_ns,
+                     "destination_size": os.path.getsize(destination)}
+            if trims:
+                entry["trim"] = trims[source]
+            manifest.write(json.dumps(entry) + "\n")
+            manifest.flush()
+    return statuses
+
+
+def process(input_dir, output_dir, input_csv, hour_offset, buffer_hours, catalog_path=None, link_mode="copy",
+            max_workers=8, checksum=False, manifest_path=None, dry_run=False, trim=False, compress=False):
     """Main processing logic."""
     # Load the input CSV
     df = pd.read_csv(input_csv)
-
-    # Dictionaries to track copied and missing files (key is cougar name, value is list of files)
-    copied_files = defaultdict(list)
-    missing_files = defaultdict(list)
-
+    if manifest_path is None:
+        manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+
+    # One walk of the input directory (only new/changed files are read on later runs)
+    catalog = None
+    if catalog_path is not None:
+        catalog = open_catalog(catalog_path)
+        refresh_catalog(catalog, [input_dir])
+
+    # Unique (cougar, date) pairs: clusters on the same day share a single file
+    target_dates = defaultdict(dict)
+    # In trim mode the windows (seconds of the day) each file must keep, a window crossing midnight is split
+    # over the files of both days
+    trim_intervals = defaultdict(list)
     for _, row in df.iterrows():
         coug_id = row["cougID"]
         species = row["species"]
@@ -109,16 +370,46 @@ def process(input_dir, output_dir, input_csv, hour_offset, buffer_hours):
 
         # Adjust the time and determine additional dates to copy
         adjusted_time = adjust_time(cluster_start, hour_offset)
-        additional_dates = [adjusted_time]
-        if adjusted_time.hour <= buffer_hours:
-            additional_dates.append(adjusted_time - timedelta(days=1))
-            logging.info(f"Adjusted time close to PREV day, adding additional date ({coug_id=}, {cluster_start=})")
-        if adjusted_time.hour >= (24 - buffer_hours):
-            additional_dates.append(adjusted_time + timedelta(days=1))
-            logging.info(f"Adjusted time close to NEXT day, adding additional date ({coug_id=}, {cluster_start=})")
+        if trim:
+            day_intervals = get_trim_intervals(adjusted_time, buffer_hours)
+            dates = list(day_intervals)
+            for date, interval in day_intervals.items():
+                trim_intervals[(coug_id, date.date())].append(interval)
+        else:
+            dates = get_target_dates(adjusted_time, buffer_hours)
+        for date in dates:
+            if date.date() != adjusted_time.date():
+                side = "PREV" if date < adjusted_time else "NEXT"
+                logging.info(f"Adjusted time close to {side} day, adding additional date ({coug_id=}, {cluster_start=})")
+            target_dates[coug_id].setdefault(date.date(), date)
 
-        # Copy the required CSV files
-        copy_csv_files(input_dir, output_dir, coug_id, additional_dates, copied_files, missing_files)
+    # Dictionaries to track copied and missing files (key is cougar name, value is list of files)
+    copied_files = defaultdict(list)
+    skipped_files = defaultdict(list)
+    missing_files = defaultdict(list)
+    jobs = {}
+    trims = {}
+    for coug_id, dates in target_dates.items():
+        for day, date in dates.items():
+            for source, destination in resolve_csv_files(input_dir, output_dir, coug_id, [date], missing_files,
+                                                         catalog):
+                if trim:
+                    trims[source] = merge_intervals(trim_intervals[(coug_id, day)])
+                    if compress:
+                        destination += ".gz"
+                jobs[source] = (coug_id, destination)
+    logging.info(f"{len(jobs)} unique daily files needed by {len(df)} clusters")
+
+    # Copy the required CSV files
+    statuses = copy_files([(source, destination) for source, (_, destination) in jobs.items()], manifest_path,
+                          link_mode, max_workers, checksum, dry_run, trims, compress)
+    for source, (coug_id, _) in jobs.items():
+        if statuses[source] == "failed":
+            missing_files[coug_id].append(source)
+        elif statuses[source] == "skipped":
+            skipped_files[coug_id].append(source)
+        else:
+            copied_files[coug_id].append(source)
 
     # Print details of missing files
     if missing_files:
@@ -131,18 +422,30 @@ def process(input_dir, output_dir, input_csv, hour_offset, buffer_hours):
         logging.info("All files found/copied!")
     # Print a summary for each cougID
     logging.info("\nSummary of Processing:")
-    for coug_id in sorted(set(copied_files.keys()).union(missing_files.keys())):
-        logging.info(f"Coug ID: {coug_id}\tCopied: {len(copied_files[coug_id]):3d} Missing: {len(missing_files[coug_id]):3d}")
+    for coug_id in sorted(set(copied_files.keys()).union(skipped_files.keys()).union(missing_files.keys())):
+        logging.info(f"Coug ID: {coug_id}\tCopied: {len(copied_files[coug_id]):3d} "
+                     f"Already present: {len(skipped_files[coug_id]):3d} Missing: {len(missing_files[coug_id]):3d}")
 
     total_copied = sum(len(v) for v in copied_files.values())
+    total_skipped = sum(len(v) for v in skipped_files.values())
     total_missing = sum(len(v) for v in missing_files.values())
-    total_files = total_copied + total_missing
+    total_files = total_copied + total_skipped + total_missing
+    total_linked = sum(1 for status in statuses.values() if status in ("hardlink", "reflink"))
 
     logging.info(f"Total files processed: {total_files}")
-    logging.info(f"Files successfully copied: {total_copied}")
+    logging.info(f"Files successfully copied: {total_copied}" + (f" ({total_linked} linked)" if total_linked else ""))
+    logging.info(f"Files already present (skipped): {total_skipped}")
+    if trim and not dry_run:
+        kept = [(os.path.getsize(source), os.path.getsize(destination)) for source, (_, destination) in jobs.items()
+                if statuses[source] != "failed"]
+        input_size = sum(size for size, _ in kept)
+        output_size = sum(size for _, size in kept)
+        logging.info(f"Trimmed output size: {output_size / 2 ** 20:.1f} MB of {input_size / 2 ** 20:.1f} MB "
+                     f"({100 * output_size / max(input_size, 1):.1f}%)")
     logging.info(f"Files missing: {total_missing}")
-    if args.dry_run:
+    if dry_run:
         logging.warning("\nThis was a dry run, no files were actually copied!")
+    return copied_files, skipped_files, missing_files
 
 
 def validate_input_csv(input_csv):
@@ -225,6 +528,162 @@ class TestScriptFunctions(unittest.TestCase):
         os.remove(temp_csv)
         os.rmdir(temp_dir)
 
+    @staticmethod
+    def make_day_file(input_dir, date, rows=1):
+        day_dir = os.path.join(input_dir, "F202_27905_010518", "MotionData_27905", date.strftime("%Y"),
+                               date.strftime("%m %b"), date.strftime("%d"))
+        os.makedirs(day_dir, exist_ok=True)
+        path = os.path.join(day_dir, date.strftime("%Y-%m-%d.csv"))
+        with open(path, "w") as f:
+            f.write("collar info\nUTC DateTime,Milliseconds,Acc X [g],Acc Y [g],Acc Z [g]\n")
+            f.write("12:00:00,0,0.1,0.2,0.3\n" * rows)
+        return path
+
+    def test_resolve_csv_files_catalog(self):
+        # The catalog must resolve the same files as the glob
+        input_dir = tempfile.mkdtemp()
+        self.make_day_file(input_dir, datetime(2018, 3, 11))
+        catalog = open_catalog(":memory:")
+        refresh_catalog(catalog, [input_dir])
+
+        dates = [datetime(2018, 3, 11, 3), datetime(2018, 3, 10, 3)]
+        results = []
+        for use_catalog in [False, True]:
+            missing_files = defaultdict(list)
+            jobs = resolve_csv_files(input_dir, "out", "F202", dates, missing_files, catalog if use_catalog else None)
+            results.append((jobs, dict(missing_files)))
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(len(results[1][0]), 1)
+        self.assertEqual(len(results[1][1]["F202"]), 1)
+
+        # Clean up
+        catalog.close()
+        shutil.rmtree(input_dir)
+
+    def test_copy_files_resume(self):
+        input_dir = tempfile.mkdtemp()
+        output_dir = tempfile.mkdtemp()
+        manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+        sources = [self.make_day_file(input_dir, datetime(2018, 3, day)) for day in [10, 11]]
+        jobs = [(source, os.path.join(output_dir, os.path.relpath(source, input_dir))) for source in sources]
+
+        statuses = copy_files(jobs, manifest_path)
+        self.assertEqual(sorted(statuses.values()), ["copy", "copy"])
+        self.assertEqual(len(load_manifest(manifest_path)), 2)
+        for source, destination in jobs:
+            self.assertTrue(files_match(source, destination, checksum=True))
+            self.assertFalse(os.path.exists(f"{destination}.part"))
+
+        # Nothing to do on a second run, a changed source is copied again
+        self.assertEqual(sorted(copy_files(jobs, manifest_path).values()), ["skipped", "skipped"])
+        self.make_day_file(input_dir, datetime(2018, 3, 11), rows=3)
+        statuses = copy_files(jobs, manifest_path)
+        self.assertEqual([statuses[source] for source in sources], ["skipped", "copy"])
+
+        # A file already in place (e.g. copied by hand) is skipped without a manifest
+        os.remove(manifest_path)
+        self.assertEqual(sorted(copy_files(jobs, manifest_path, checksum=True).values()), ["skipped", "skipped"])
+
+        # Clean up
+        shutil.rmtree(input_dir)
+        shutil.rmtree(output_dir)
+
+    def test_link_modes(self):
+        input_dir = tempfile.mkdtemp()
+        source = self.make_day_file(input_dir, datetime(2018, 3, 11))
+        destination = os.path.join(input_dir, "out", "2018-03-11.csv")
+
+        self.assertEqual(transfer_file(source, destination, "hardlink"), "hardlink")
+        self.assertTrue(os.path.samefile(source, destination))
+        # reflinks need a copy-on-write filesystem, anywhere else a plain copy is made
+        self.assertIn(transfer_file(source, destination, "reflink"), ["reflink", "copy"])
+        self.assertFalse(os.path.samefile(source, destination))
+        self.assertTrue(files_match(source, destination, checksum=True))
+
+        # Clean up
+        shutil.rmtree(input_dir)
+
+    def test_process_dedupes_dates(self):
+        input_dir = tempfile.mkdtemp()
+        output_dir = tempfile.mkdtemp()
+        for day in [10, 11]:
+            self.make_day_file(input_dir, datetime(2018, 3, day))
+        input_csv = os.path.join(input_dir, "clusters.csv")
+        with open(input_csv, "w") as f:
+            f.write("cougID,species,cluster_start_MST\n"
+                    "F202,ELK,2018-03-10 20:00:00\n"     # 03:00 UTC on the 11th, needs the 10th too
+                    "F202,DEER,2018-03-11 05:00:00\n"
+                    "F202,ELK,2018-03-11 10:00:00\n")
+
+        copied_files, skipped_files, missing_files = process(input_dir, output_dir, input_csv, 7, 6)
+        self.assertEqual(len(copied_files["F202"]), 2)
+        self.assertEqual(len(load_manifest(os.path.join(output_dir, MANIFEST_NAME))), 2)
+        self.assertEqual(missing_files["F202"], [])
+
+        # Clean up
+        shutil.rmtree(input_dir)
+        shutil.rmtree(output_dir)
+
+    def test_get_trim_intervals(self):
+        self.assertEqual(get_trim_intervals(datetime(2018, 3, 11, 12), 6), {datetime(2018, 3, 11): [21600, 64800]})
+        # A window crossing midnight is split over both days
+        self.assertEqual(get_trim_intervals(datetime(2018, 3, 11, 2, 30), 3),
+                         {datetime(2018, 3, 10): [84600, 86399], datetime(2018, 3, 11): [0, 19800]})
+        self.assertEqual(merge_intervals([[50, 60], [0, 10], [5, 20], [21, 30]]), [[0, 30], [50, 60]])
+
+    def test_trim_day_file(self):
+        input_dir = tempfile.mkdtemp()
+        source = os.path.join(input_dir, "2018-03-11.csv")
+        with open(source, "w") as f:
+            f.write("collar info\nUTC DateTime,Milliseconds,Acc X [g],Acc Y [g],Acc Z [g]\n")
+            for secs in range(0, 86400, 7):
+                f.write(f"{secs // 3600:02d}:{secs // 60 % 60:02d}:{secs % 60:02d},0,0.1,0.2,0.3\n")
+        expected = pd.read_csv(source, skiprows=1)
+        seconds = pd.to_timedelta(expected["UTC DateTime"]).dt.total_seconds()
+        intervals = [[0, 600], [3600, 7200], [86000, 86399]]
+        expected = expected[((seconds <= 600) | seconds.between(3600, 7200) | (seconds >= 86000)).to_numpy()]
+
+        for compress in [False, True]:
+            destination = os.path.join(input_dir, "out", "2018-03-11.csv" + (".gz" if compress else ""))
+            # a small block size so rows are split across blocks
+            rows = trim_day_file(source, destination, intervals, compress, block_size=1000)
+            trimmed = pd.read_csv(destination, skiprows=1)
+            self.assertEqual(rows, len(expected))
+            pd.testing.assert_frame_equal(trimmed, expected.reset_index(drop=True))
+
+        # Clean up
+        shutil.rmtree(input_dir)
+
+    def test_process_trim(self):
+        input_dir = tempfile.mkdtemp()
+        output_dir = tempfile.mkdtemp()
+        for day in [10, 11]:
+            self.make_day_file(input_dir, datetime(2018, 3, day))
+        input_csv = os.path.join(input_dir, "clusters.csv")
+        with open(input_csv, "w") as f:
+            f.write("cougID,species,cluster_start_MST\nF202,ELK,2018-03-10 20:00:00\n")
+
+        # 03:00 UTC +-6 hours: 21:00 - 24:00 on the 10th, 00:00 - 09:00 on the 11th (the rows are at 12:00)
+        copied_files, _, _ = process(input_dir, output_dir, input_csv, 7, 6, trim=True, compress=True)
+        self.assertEqual(len(copied_files["F202"]), 2)
+        manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+        for destination in load_manifest(manifest_path):
+            self.assertTrue(destination.endswith(".csv.gz"))
+            self.assertEqual(len(pd.read_csv(destination, skiprows=1)), 0)
+
+        # Resumes like a copy, a different window is trimmed again: 15:00 on the 10th - 15:00 on the 11th
+        # (only the row of the 11th is inside)
+        _, skipped_files, _ = process(input_dir, output_dir, input_csv, 7, 6, trim=True, compress=True)
+        self.assertEqual(len(skipped_files["F202"]), 2)
+        copied_files, _, _ = process(input_dir, output_dir, input_csv, 7, 12, trim=True, compress=True)
+        self.assertEqual(len(copied_files["F202"]), 2)
+        self.assertEqual(sorted(len(pd.read_csv(destination, skiprows=1)) for destination in load_manifest(manifest_path)),
+                         [0, 1])
+
+        # Clean up
+        shutil.rmtree(input_dir)
+        shutil.rmtree(output_dir)
+
 
 def run_tests():
     unittest.main(argv=["first-arg-is-ignored"], exit=False)
@@ -244,17 +703,34 @@ if __name__ == "__main__":
                             "the next day's CSV will also be copied."
                         ))
     parser.add_argument("--input_csv", required=True, help="CSV file containing target times.")
+    parser.add_argument("--catalog", default=data_paths["day_catalog_path"],
+                        help="SQLite catalog of the day files, built/refreshed for input_dir.")
+    parser.add_argument("--no_catalog", action="store_true", help="Find the day files with a glob per date instead.")
+    parser.add_argument("--workers", type=int, default=8, help="Number of files copied in parallel.")
+    parser.add_argument("--link", choices=LINK_MODES, default="copy",
+                        help="Hardlink or reflink instead of copying when input and output share a filesystem.")
+    parser.add_argument("--checksum", action="store_true",
+                        help="Compare checksums, not only sizes, of files already in the output directory.")
+    parser.add_argument("--manifest", default=None,
+                        help="Manifest of completed files used to resume (default: <output_dir>/copy_manifest.jsonl).")
+    parser.add_argument("--trim", action="store_true",
+                        help="Write only the rows within buffer_hours of each cluster start instead of whole days.")
+    parser.add_argument("--compress", action="store_true", help="Gzip compress the trimmed files (requires --trim).")
     parser.add_argument("--dry_run", action="store_true", help="Run without copying files (for testing).")
     parser.add_argument("--run_tests", action="store_true", help="Run unit tests.")
 
     args = parser.parse_args()
+    if args.compress and not args.trim:
+        parser.error("--compress requires --trim")
 
     if args.run_tests:
         run_tests()
     else:
         try:
             validate_params(args.input_dir, args.output_dir, args.input_csv, args.buffer_hours)
-            process(args.input_dir, args.output_dir, args.input_csv, args.hour_offset, args.buffer_hours)
+            process(args.input_dir, args.output_dir, args.input_csv, args.hour_offset, args.buffer_hours,
+                    None if args.no_catalog else args.catalog, args.link, args.workers, args.checksum, args.manifest,
+                    args.dry_run, args.trim, args.compress)
         except ValueError as e:
             logging.info(f"Error: {e}")
             exit(1)
@@ -0,0 +1,111 @@
+import os
+from pathlib import Path
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from utils.clip_stats import create_list_of_durations, expand_runs, get_clip_stats
+
+ROOT_DIR = str(Path(__file__).parent.parent.absolute())
+
+
+def legacy_create_list_of_durations(x, infill_max_dur_sec, samplerate, unknown_value=0):
+    # create_list_of_durations as it was in BEBE_format_cougar.py, kept as the reference behavior
+    current_value = 0
+    current_dur = 0
+    list_of_durs = []
+    list_of_labels = []
+    for i in x:
+        if i == current_value:
+            current_dur += 1
+        elif i != current_value:
+            list_of_durs.append(current_dur / samplerate)
+            list_of_labels.append(current_value)
+            current_dur = 1
+            current_value = i
+
+    list_of_durs.append(current_dur)
+    list_of_labels.append(current_value)
+
+    infill_max_dur_samples = int(infill_max_dur_sec * samplerate)
+
+    if list_of_labels[0] == unknown_value:
+        del list_of_labels[0]
+        del list_of_durs[0]
+
+    if list_of_labels[-1] == unknown_value:
+        del list_of_labels[-1]
+        del list_of_durs[-1]
+
+    j = 1
+    while j < len(list_of_labels) - 1:
+        if list_of_labels[j] != unknown_value:
+            j += 1
+        elif list_of_labels[j - 1] == list_of_labels[j + 1] and list_of_durs[j] < infill_max_dur_samples:
+            list_of_durs[j - 1] += list_of_durs[j + 1]
+            del list_of_durs[j + 1]
+            del list_of_durs[j]
+            del list_of_labels[j + 1]
+            del list_of_labels[j]
+        else:
+            del list_of_durs[j]
+            del list_of_labels[j]
+
+    return list_of_labels, list_of_durs
+
+
+class TestClipStats(unittest.TestCase):
+    sample_clip = os.path.join(ROOT_DIR, "BEBE-datasets", "format_cougar", "clip_data", "exp940_user202.csv")
+    label_names = ['unknown', 'STALK', 'KILL', 'FEED', 'NON_KILL']
+
+    def assert_matches_legacy(self, x, infill_max_dur_sec, samplerate):
+        labels, durs = create_list_of_durations(x, infill_max_dur_sec, samplerate)
+        legacy_labels, legacy_durs = legacy_create_list_of_durations(list(x), infill_max_dur_sec, samplerate)
+        if legacy_durs and x[-1] != 0:
+            # the legacy loop appends the final duration in samples
+            legacy_durs[-1] /= samplerate
+        self.assertEqual(labels, legacy_labels)
+        np.testing.assert_allclose(durs, legacy_durs)
+
+    def test_sample_clip(self):
+        names = pd.read_csv(self.sample_clip, header=None).values[:, -1]
+        x = np.array([self.label_names.index(name) for name in names])
+        for samplerate in [1, 16]:
+            self.assert_matches_legacy(x, 0, samplerate)
+        labels, durs = create_list_of_durations(x, 0, 1)
+        self.assertEqual(labels, [self.label_names.index('NON_KILL')])
+        self.assertEqual(durs, [len(x)])
+
+    def test_final_duration_in_seconds(self):
+        labels, durs = create_list_of_durations([0, 2, 2, 0, 3, 3, 3, 3], 0, 2)
+        self.assertEqual(labels, [2, 3])
+        self.assertEqual(durs, [1.0, 2.0])
+
+    def test_infill(self):
+        x = [0, 1, 1, 0, 1, 1, 1, 0, 0, 0, 2, 2, 0, 0, 0, 0, 0, 2, 0]
+        self.assertEqual(create_list_of_durations(x, 0, 1), ([1, 1, 2, 2], [2, 3, 2, 1]))
+        self.assertEqual(create_list_of_durations(x, 2, 1), ([1, 2, 2], [5, 2, 1]))
+        self.assertEqual(create_list_of_durations(x, 10, 1), ([1, 2], [5, 3]))
+        # the limit is in seconds, the unknown runs are 1, 3 and 5 samples long at 2 Hz
+        self.assertEqual(create_list_of_durations(x, 1, 2), ([1, 2, 2], [2.5, 1.0, 0.5]))
+
+    def test_random_against_legacy(self):
+        rng = np.random.default_rng(0)
+        for _ in range(200):
+            x = np.repeat(rng.integers(0, 3, 30), rng.integers(1, 6, 30))
+            # at 1 Hz the legacy loop has no unit mix up, so infill results must match exactly
+            self.assert_matches_legacy(x, int(rng.integers(0, 5)), 1)
+
+    def test_edge_cases(self):
+        self.assertEqual(create_list_of_durations([], 0, 1), ([], []))
+        self.assertEqual(create_list_of_durations([0, 0, 0], 5, 1), ([], []))
+        self.assertEqual(create_list_of_durations([4], 0, 1), ([4], [1.0]))
+
+    def test_clip_stats(self):
+        stats = get_clip_stats([0, 2, 2, 4, 4, 4], 5)
+        self.assertEqual(stats["samples"], 6)
+        self.assertEqual(stats["label_counts"], [1, 0, 2, 0, 3])
+        self.assertEqual(stats["run_labels"], [0, 2, 4])
+        self.assertEqual(stats["run_lengths"], [1, 2, 3])
+        np.testing.assert_array_equal(expand_runs(stats), [0, 2, 2, 4, 4, 4])
@@ -0,0 +1,60 @@
+from datetime import date, datetime
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from utils.csv_index import build_index, read_csv_window
+from utils.day_store import day_start_ms, get_day_csv_path, to_epoch_ms
+from utils.window_reader import read_window
+
+DAY = date(2018, 3, 11)
+HEADER = "Collar 27905 export\nUTC DateTime,Milliseconds,Acc X [g],Acc Y [g],Acc Z [g],Temperature [C]\n"
+
+
+class TestCsvIndexFallback(unittest.TestCase):
+    """
+    Day csvs the byte index can not handle are read with a full parse, as before the index existed
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_root = self.tmp.name
+        self.csv_path = get_day_csv_path(self.data_root, DAY)
+        os.makedirs(os.path.dirname(self.csv_path))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_day(self, times):
+        with open(self.csv_path, "w") as f:
+            f.write(HEADER)
+            for i, time in enumerate(times):
+                f.write(f"{time},0,{i}.0,0.0,-1.0,20\n")
+
+    def read(self, start, end):
+        return read_csv_window(self.csv_path, to_epoch_ms(start), to_epoch_ms(end))
+
+    def test_not_zero_padded(self):
+        self.write_day(["9:59:59", "10:00:00", "10:00:01", "10:00:02", "10:00:03"])
+        with self.assertRaises(ValueError):
+            build_index(self.csv_path)
+        columns = self.read(datetime(2018, 3, 11, 10), datetime(2018, 3, 11, 10, 0, 2))
+        np.testing.assert_array_equal(columns["x"], [1, 2, 3])
+        np.testing.assert_array_equal(columns["ts"] - day_start_ms(DAY), [36000000, 36001000, 36002000])
+
+    def test_out_of_order(self):
+        self.write_day(["10:00:00", "10:05:00", "10:01:00", "10:06:00"])
+        with self.assertRaises(ValueError):
+            build_index(self.csv_path)
+        columns = self.read(datetime(2018, 3, 11, 10, 1), datetime(2018, 3, 11, 10, 5))
+        np.testing.assert_array_equal(columns["x"], [1, 2])
+        # the window reader (labeled windows, plots) gets the same rows instead of an error
+        columns = read_window(self.data_root, datetime(2018, 3, 11, 10, 1), datetime(2018, 3, 11, 10, 5), lion_id=None)
+        np.testing.assert_array_equal(columns["x"], [1, 2])
+
+    def test_indexed(self):
+        self.write_day(["09:59:59", "10:00:00", "10:00:01", "10:02:00"])
+        columns = self.read(datetime(2018, 3, 11, 10), datetime(2018, 3, 11, 10, 1))
+        np.testing.assert_array_equal(columns["x"], [1, 2])
+        self.assertTrue(os.path.isfile(f"{self.csv_path}.idx.json"))
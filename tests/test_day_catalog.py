@@ -0,0 +1,78 @@
+from datetime import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+from utils.day_catalog import (find_day_file, get_day_file, get_day_info, normalize_path, open_catalog,
+                               parse_day_path, refresh_catalog, STAT_FIELDS)
+from utils.day_store import day_start_ms
+
+
+class TestDayCatalog(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.data_root = os.path.join(self.root, "F202_27905_010518_072219", "MotionData_27905")
+        self.conn = open_catalog(":memory:")
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.root)
+
+    def write_day(self, date, rows, sample_rate=2):
+        day_dir = os.path.join(self.data_root, date[:4], f"{date[5:7]} Mar", date[8:])
+        os.makedirs(day_dir, exist_ok=True)
+        path = os.path.join(day_dir, f"{date}.csv")
+        with open(path, "w") as f:
+            f.write("collar info\nUTC DateTime,Milliseconds,Acc X [g],Acc Y [g],Acc Z [g]\n")
+            for i in range(rows):
+                secs = 3600 + i // sample_rate
+                f.write(f"{secs // 3600:02d}:{secs // 60 % 60:02d}:{secs % 60:02d},"
+                        f"{i % sample_rate * 1000 // sample_rate},0.1,0.2,0.3\n")
+        return normalize_path(path)
+
+    def test_refresh_and_lookup(self):
+        path = self.write_day("2018-03-11", 100)
+        self.assertEqual(refresh_catalog(self.conn, [self.root]), (1, 0, 0))
+        self.assertEqual(find_day_file(self.conn, "F202", "2018-03-11"), path)
+        self.assertEqual(get_day_file(self.conn, self.data_root + "/", "2018-03-11"), path)
+        self.assertIsNone(find_day_file(self.conn, "F202", "2018-03-12"))
+        self.assertIsNone(find_day_file(self.conn, "F202", "2018-03-11", root=os.path.join(self.root, "other")))
+
+        info = get_day_info(self.conn, path)
+        self.assertEqual(info["rows"], 100)
+        self.assertEqual(info["sample_rate"], 2)
+        self.assertEqual(info["first_ts"], day_start_ms(datetime(2018, 3, 11)) + 3600 * 1000)
+        self.assertEqual(info["last_ts"], day_start_ms(datetime(2018, 3, 11)) + (3600 + 49) * 1000 + 500)
+
+    def test_incremental_refresh(self):
+        path = self.write_day("2018-03-11", 10)
+        self.write_day("2018-03-12", 10)
+        self.assertEqual(refresh_catalog(self.conn, [self.root]), (2, 0, 0))
+        self.assertEqual(refresh_catalog(self.conn, [self.root]), (0, 0, 0))
+
+        self.write_day("2018-03-11", 20)
+        os.remove(self.write_day("2018-03-12", 10))
+        self.assertEqual(refresh_catalog(self.conn, [self.root]), (0, 1, 1))
+        self.assertEqual(get_day_info(self.conn, path)["rows"], 20)
+        self.assertIsNone(find_day_file(self.conn, "F202", "2018-03-12"))
+
+    def test_stat_only_refresh(self):
+        path = self.write_day("2018-03-11", 10)
+        refresh_catalog(self.conn, [self.root])
+        row = self.conn.execute("SELECT * FROM day_files WHERE path = ?", (path,)).fetchone()
+        self.assertEqual([row[field] for field in STAT_FIELDS], [None] * 4)
+        # filled on first use
+        self.assertEqual(get_day_info(self.conn, path)["rows"], 10)
+        self.assertEqual(self.conn.execute("SELECT rows FROM day_files").fetchone()["rows"], 10)
+
+        other = self.write_day("2018-03-12", 6)
+        refresh_catalog(self.conn, [self.root], scan=True)
+        row = self.conn.execute("SELECT * FROM day_files WHERE path = ?", (other,)).fetchone()
+        self.assertEqual((row["rows"], row["sample_rate"]), (6, 2))
+
+    def test_parse_day_path(self):
+        self.assertEqual(parse_day_path("/a/F207_22263_030117/MotionData_0/2017/04 Apr/02/2017-04-02.csv"),
+                         ("F207", "/a/F207_22263_030117/MotionData_0", "2017-04-02"))
+        self.assertIsNone(parse_day_path("/a/F207_22263_030117/MotionData_0/2017/04 Apr/03/2017-04-02.csv"))
+        self.assertIsNone(parse_day_path("/a/2017-04-02.csv"))
@@ -0,0 +1,32 @@
+import unittest
+
+from utils.data_config import constants, view_configs
+from utils.envelope import get_bucket_ms, MAX_RAW_POINTS, select_level
+
+WINDOW_MINS = 1     # window_high_min - window_low_min of a spreadsheet row
+
+
+def select_view_level(view_name):
+    view = view_configs[view_name]
+    duration_ms = (view["window_pre_mins"] + WINDOW_MINS + view["window_post_mins"]) * 60 * 1000
+    num_samples = duration_ms // 1000 * constants["INPUT_SAMPLE_RATE"]
+    return select_level(duration_ms, num_samples, view["plot_width_px"]), duration_ms
+
+
+class TestSelectLevel(unittest.TestCase):
+    def test_labeling_views_are_raw(self):
+        for view_name in ["killing", "stalking"]:
+            self.assertIsNone(select_view_level(view_name)[0], view_name)
+
+    def test_wide_views_use_envelope(self):
+        for view_name in ["day", "sixhour"]:
+            level, duration_ms = select_view_level(view_name)
+            self.assertIsNotNone(level, view_name)
+            width_px = view_configs[view_name]["plot_width_px"]
+            # coarsest level that still has a bucket per pixel
+            self.assertGreaterEqual(duration_ms / get_bucket_ms(level), width_px)
+            self.assertLess(duration_ms / get_bucket_ms(level + 1), width_px)
+
+    def test_raw_limit(self):
+        self.assertIsNone(select_level(1000 * 1000, MAX_RAW_POINTS, 700))
+        self.assertEqual(select_level(1000 * 1000, MAX_RAW_POINTS + 1, 700), 0)
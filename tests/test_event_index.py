@@ -0,0 +1,57 @@
+from datetime import datetime
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from utils.event_index import EventIndex, MARKER_CODE
+from utils.labeling import get_label_code
+
+
+class TestEventIndex(unittest.TestCase):
+    @staticmethod
+    def config(kill_id, hour, minute, lion_id="F202"):
+        kill_start = pd.Timestamp(2018, 3, 11, hour, minute)
+        return {"lion_id": lion_id, "Kill_ID": kill_id, "year": 2018, "month": 3, "day": 11,
+                "df_stalk_start": kill_start - pd.Timedelta(minutes=5), "df_kill_start": kill_start,
+                "df_kill_end": kill_start + pd.Timedelta(minutes=2),
+                "df_feed_start": kill_start + pd.Timedelta(minutes=4),
+                "df_feed_stop": kill_start + pd.Timedelta(minutes=20),
+                "marker_1_hour": hour, "marker_1_min": minute, "marker_1_sec": 30, "marker_1_label": "Bed",
+                "marker_2_hour": 0, "marker_2_min": 0, "marker_2_sec": 0, "marker_2_label": "Unused"}
+
+    def test_query_matches_scan(self):
+        rng = np.random.default_rng(0)
+        starts = np.sort(rng.integers(0, 10 ** 6, 2000))
+        ends = starts + rng.integers(0, 5000, 2000)
+        index = EventIndex(("F202", 1, start, end, None, i) for i, (start, end) in enumerate(zip(starts, ends)))
+        self.assertEqual(len(index), 2000)
+        for start, end in rng.integers(0, 10 ** 6, (100, 2)):
+            start, end = min(start, end), max(start, end)
+            expected = np.flatnonzero((starts <= end) & (ends >= start))
+            np.testing.assert_array_equal(index.query("F202", start, end)["kill_id"].astype(np.int64), expected)
+        self.assertEqual(len(index.query("M201", 0, 10 ** 6)["start"]), 0)
+
+    def test_label_times_matches_label_window(self):
+        from utils.labeling import label_window
+
+        config = self.config(1, 12, 0)
+        times = pd.Series(pd.date_range("2018-03-11 11:30", "2018-03-11 12:30", freq="500ms"))
+        index = EventIndex.from_configs([config, self.config(2, 12, 0, lion_id="M201")])
+        np.testing.assert_array_equal(index.label_times("F202", times), label_window(times, config))
+
+    def test_overlapping_kills(self):
+        # the window of kill 1 overlaps the stalk of kill 2, both windows must agree on the shared samples
+        configs = [self.config(1, 12, 0), self.config(2, 12, 15)]
+        index = EventIndex.from_configs(configs)
+        times = pd.Series(pd.date_range("2018-03-11 12:00", "2018-03-11 12:30", freq="1s"))
+        labels = index.label_times("F202", times)
+        stalk_2 = (times >= configs[1]["df_stalk_start"]) & (times < configs[1]["df_kill_start"])
+        self.assertTrue(np.all(labels[stalk_2.to_numpy()] == get_label_code("STALK")))
+
+    def test_markers(self):
+        index = EventIndex.from_configs([self.config(1, 12, 0)])
+        events = index.query("F202", datetime(2018, 3, 11, 12), datetime(2018, 3, 11, 12, 1))
+        self.assertEqual(events["label"][events["code"] == MARKER_CODE].tolist(), ["Bed"])
+        self.assertNotIn(MARKER_CODE, index.query("F202", datetime(2018, 3, 11), datetime(2018, 3, 12),
+                                                  markers=False)["code"])
@@ -0,0 +1,78 @@
+from datetime import datetime
+import pickle
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from utils.event_table import build_info_table, build_kill_table, KILL_TIME_COLS
+
+
+class TestEventTable(unittest.TestCase):
+    @staticmethod
+    def kill_row(**changes):
+        times = {column: datetime.strptime(text, "%H:%M:%S").time() for column, text in zip(
+            KILL_TIME_COLS.values(), ["05:59:00", "05:59:40", "05:58:50", "05:59:15", "05:59:35", "06:00:20",
+                                      "06:07:00", "06:30:00"])}
+        row = {"AnimalID": 202.0, "Sex": "F", "Kill_ID": 12, "Start Date": pd.Timestamp(2018, 6, 8), **times,
+               "data_root": "/data/F202"}
+        row.update(changes)
+        return row
+
+    def test_kill_record(self):
+        table = build_kill_table(pd.DataFrame([self.kill_row()]))
+        self.assertEqual(table.errors, {})
+        record = table.record(0, csv_path="/data/F202/2018-06-08.csv")
+        self.assertEqual(record["lion_id"], "F202")
+        self.assertEqual((record["hour"], record["window_low_min"], record["window_high_min"]), (5, 59, 60))
+        self.assertEqual((record["cons_window_low_hour"], record["cons_window_low_min"],
+                          record["cons_window_low_sec"]), (5, 59, 15))
+        self.assertEqual((record["lib_window_high_hour"], record["lib_window_high_min"]), (6, 0))
+        self.assertEqual(record["df_kill_end"], pd.Timestamp(2018, 6, 8, 5, 59, 35))
+        self.assertEqual(record["ts_kill_start"], datetime(2018, 6, 8, 5, 59, 15))
+        self.assertIs(type(record["Kill_ID"]), int)
+        self.assertEqual(record["marker_1_label"], 0)
+        self.assertEqual(table.times["plot_date"][0], pd.Timestamp(2018, 6, 8, 5, 59))
+        self.assertEqual("{lion_name}_{Kill_ID}_{csv_path}".format(**record), "F202_12_/data/F202/2018-06-08.csv")
+
+    def test_validation(self):
+        rows = [self.kill_row(), self.kill_row(StartKill=np.nan), self.kill_row(StartKill="No accel data"),
+                self.kill_row(Kill_ID=np.nan), self.kill_row(StartKill=np.nan, **{"Start time": np.nan})]
+        table = build_kill_table(pd.DataFrame(rows))
+        np.testing.assert_array_equal(table.skipped, [False, True, False, False, False])
+        self.assertEqual(table.errors, {2: "StartKill is not a time", 3: "missing Kill_ID", 4: "missing Start time"})
+        np.testing.assert_array_equal(table.valid, [True, False, False, False, False])
+
+    def test_record_mapping(self):
+        table = build_kill_table(pd.DataFrame([self.kill_row(), self.kill_row(Kill_ID=13)]))
+        record = table.record(1, csv_path="a.csv")
+        record["plot_type"] = "sixhour"
+        record.update(is_sixhour="TRUE")
+        self.assertEqual(record["is_sixhour"], "TRUE")
+        self.assertEqual(table.record(0)["is_sixhour"], "FALSE")
+        as_dict = dict(record)
+        self.assertEqual(len(as_dict), len(record))
+        self.assertEqual(as_dict["Kill_ID"], 13)
+        self.assertEqual(pickle.loads(pickle.dumps(record)), as_dict)
+        self.assertIs(type(pickle.loads(pickle.dumps(record))), dict)
+        with self.assertRaises(KeyError):
+            del record["Kill_ID"]
+
+    def test_info_table(self):
+        df = pd.DataFrame({
+            "AnimalID": [220.0, 202.0, np.nan], "Sex": ["M", "F", "F"], "Kill_ID": [1000.0, 940.0, 941.0],
+            "Start Date": ["02/23/2020", datetime(2018, 3, 11), "03/11/2018"],
+            "Start time": ["05:19:42", datetime(2018, 3, 11, 12).time(), "12:00:00"],
+            "End time": ["05:39:42", datetime(2018, 3, 11, 12, 20).time(), "12:20:00"],
+            "MarkerTime1": ["05:29:42", np.nan, np.nan], "MarkerLabel1": ["TrailCamStart", np.nan, np.nan],
+            "MarkerTime2": [np.nan, "later", np.nan], "MarkerLabel2": [np.nan, "Bed", np.nan],
+            "PlotLabel": ["Walking", "Bed", "Bed"]})
+        table = build_info_table(df)
+        self.assertEqual(table.errors, {1: "MarkerTime2 is not a time", 2: "missing AnimalID"})
+        record = table.record(0)
+        self.assertEqual((record["year"], record["month"], record["day"], record["hour"]), (2020, 2, 23, 5))
+        self.assertEqual((record["marker_1_hour"], record["marker_1_min"], record["marker_1_sec"]), (5, 29, 42))
+        self.assertEqual((record["marker_1_label"], record["marker_2_label"]), ("TrailCamStart", "Unused"))
+        self.assertEqual(record["Kill_ID"], 1000.0)
+        self.assertEqual(record["stalk_start_hour"], 0)
+        self.assertTrue(record["info_view"])
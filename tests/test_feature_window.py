@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from utils import spreadsheet_utils
+from utils.day_store import to_epoch_ms
+from utils.features import get_feature_padding
+from utils.window_reader import slice_columns
+
+SAMPLE_RATE = 16
+CONSTANTS = {**spreadsheet_utils.constants, "INPUT_SAMPLE_RATE": SAMPLE_RATE, "OUTPUT_SAMPLE_RATE": 1,
+             "RESAMPLE_AGGREGATOR": "decimate", "FEATURE_CHANNELS": ["ODBA", "VeDBA"]}
+
+
+def make_columns(start, end):
+    rng = np.random.default_rng(0)
+    ts = np.arange(to_epoch_ms(start), to_epoch_ms(end) + 1, 1000 // SAMPLE_RATE, dtype=np.int64)
+    columns = {"ts": ts}
+    columns.update({key: rng.normal(0, 0.1, len(ts)).astype(np.float32) for key in ["x", "y", "z"]})
+    return columns
+
+
+@mock.patch.dict(spreadsheet_utils.constants, CONSTANTS)
+class TestFeatureWindow(unittest.TestCase):
+    def test_independent_of_shared_span(self):
+        # a window cut from the span read for a whole day group must match the window read alone
+        start, end = datetime(2018, 3, 11, 12), datetime(2018, 3, 11, 12, 10)
+        padding = timedelta(seconds=get_feature_padding())
+        group = make_columns(start - timedelta(hours=1), end + timedelta(hours=1))
+        padded = slice_columns(group, to_epoch_ms(start - padding), to_epoch_ms(end + padding))
+        alone = spreadsheet_utils.get_feature_window(padded, start, end)
+        shared = spreadsheet_utils.get_feature_window(group, start, end)
+        self.assertEqual(len(alone["ts"]), 10 * 60 + 1)
+        for key in alone:
+            np.testing.assert_array_equal(alone[key], shared[key], err_msg=key)
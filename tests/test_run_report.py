@@ -0,0 +1,45 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from utils.run_report import build_run_report, find_missing_plots, run_job
+
+
+class TestRunReport(unittest.TestCase):
+    def test_run_job(self):
+        entry, result = run_job(sum, [1, 2], name="sum", kind="python_render", lion_id="F202")
+        self.assertEqual((entry["status"], entry["exit_code"], result), ("ok", 0, 3))
+        self.assertEqual((entry["lion_id"], entry["view"], entry["input_bytes"]), ("F202", None, 0))
+
+        def fail():
+            subprocess.run([sys.executable, "-c", "exit(3)"], check=True)
+        entry, result = run_job(fail, name="r", kind="r_script", output_paths=None)
+        self.assertEqual((entry["status"], entry["exit_code"], entry["output_bytes"], result), ("failed", 3, None, None))
+
+    def test_missing_plots(self):
+        with tempfile.TemporaryDirectory() as plot_root:
+            os.makedirs(os.path.join(plot_root, "F202", "windows"))
+            for path in ["F202/windows/a_killing_1.png", "F202/b_mega_1.png"]:
+                open(os.path.join(plot_root, path), "w").close()
+            expected = {"a_killing_1.png", "a_killing", "b_mega_1.png", "c_killing_2.png"}
+            # exact names only: a prefix of a generated plot is not enough
+            self.assertEqual(find_missing_plots(expected, plot_root), {"a_killing", "c_killing_2.png"})
+
+    def test_report(self):
+        jobs = [{"name": name, "kind": "r_script", "status": status, "seconds": seconds, "lion_id": lion_id,
+                 "view": view, "log_path": None, "error": None}
+                for name, status, seconds, lion_id, view in [("a", "ok", 1.0, "F202", "killing"),
+                                                             ("b", "failed", 5.0, "F202", "sixhour"),
+                                                             ("c", "ok", 2.0, "F209", "killing"),
+                                                             ("d", "ok", 0.5, None, None)]]
+        report = build_run_report(jobs, 10, expected_plots={"x", "y"}, missing_plots={"y"}, slowest=2)
+        self.assertEqual([job["name"] for job in report["slowest"]], ["b", "c"])
+        self.assertEqual([job["name"] for job in report["failures"]], ["b"])
+        self.assertEqual(report["per_animal"], {"F202": {"jobs": 2, "seconds": 6.0}, "F209": {"jobs": 1, "seconds": 2.0}})
+        self.assertEqual(list(report["per_view"]), ["sixhour", "killing"])
+        self.assertEqual(report["per_kind"]["r_script"]["jobs"], 4)
+        self.assertEqual((report["expected_plots"], report["missing_plots"]), (2, ["y"]))
+        json.dumps(report)
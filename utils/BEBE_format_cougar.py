@@ -7,6 +7,9 @@
 # [Leaderboard](https://paperswithcode.com/dataset/har)
 # 
 # [Paper](https://www.esann.org/sites/default/files/proceedings/legacy/es2013-84.pdf)
+import argparse
+import concurrent.futures
+import multiprocessing
 import os
 from pathlib import Path
 import sys
@@ -14,7 +17,20 @@ import sys
 # get the project root as the parent of the parent directory of this file
 ROOT_DIR = str(Path(__file__).parent.parent.absolute())
 sys.path.append(ROOT_DIR)
-from utils.data_config import data_paths, constants
+from utils.data_config import data_paths, constants, behavior_labels, is_unix
+from utils.build_cache import load_build_cache, save_build_cache, hash_inputs, get_file_stamp, is_stale, record
+from utils.clip_store import check_clip_format, get_clip_path, load_clip, open_hdf5, save_clip, to_attr
+from utils.clip_formatter import format_clip
+from utils.clip_stats import get_clip_stats, get_durations_from_runs, load_clip_stats, save_clip_stats
+
+# format of the formatted clips: "csv" (what BEBE reads), "npy" (memory mapped) or "hdf5" (single
+# compressed file with the metadata as attributes), see clip_store.py
+clip_format = "csv"
+
+parser = argparse.ArgumentParser(description="Format the labeled windows into a BEBE dataset.")
+parser.add_argument("--workers", type=int, default=1, help="Number of processes formatting clips in parallel.")
+# parse_known_args: this file is also run as a notebook, where the kernel adds its own arguments
+args, _ = parser.parse_known_args()
 
 raw_data_root = Path(data_paths["raw_data_root"])
 raw_data_dir = str(raw_data_root.parent)
@@ -163,24 +179,11 @@ dataset_metadata['clip_ids_per_fold'] = clip_ids_per_fold
 # %%
 ## Integer codes for specific behaviors
 
-# list of behaviors, see activity_labels.txt
-beh_names = ['unknown', 
-             'STALK',
-             'KILL',
-             'FEED',
-            'NON_KILL',
-            ]
+# list of behaviors, shared with the labeling code in spreadsheet_utils (see data_config.behavior_labels)
+beh_names = list(behavior_labels)
 
 dataset_metadata['label_names'] = beh_names
 
-def get_index_of_behavior(behavior):
-    # given the string of a label, convert it into an int representation of the behavior names list
-    # If not found, return 0 for unknown
-    try:
-        return int(beh_names.index(behavior))
-    except ValueError:
-        return 0
-
 # %% [markdown]
 # We name each data channel we will use. 
 # 
@@ -191,19 +194,14 @@ def get_index_of_behavior(behavior):
 # %%
 ## clip_data column names
 
-clip_column_names = ['AccX', 'AccY', 'AccZ', 'individual_id', 'label']
+# derived channels (ODBA, VeDBA, ...) configured in constants['FEATURE_CHANNELS'] follow the raw axes,
+# their names do not contain 'Acc' so BEBE does not filter them again
+feature_channels = list(constants['FEATURE_CHANNELS'])
+clip_column_names = ['AccX', 'AccY', 'AccZ', *feature_channels, 'individual_id', 'label']
 dataset_metadata['clip_column_names'] = clip_column_names
 
 # %% [markdown]
-# We save the metadata dictionary as a `.yaml` file. However, we will still need to reload it and edit it at the very end of this notebook when we can compute average annotation duration.
-
-# %%
-## Save off dataset level metadata
-
-dataset_metadata_fp = os.path.join(formatted_data_dir, 'dataset_metadata.yaml')
-
-with open(dataset_metadata_fp, 'w') as file:
-    yaml.dump(dataset_metadata, file)
+# The metadata dictionary is saved as a `.yaml` file once, at the very end of this notebook when we can compute average annotation duration.
 
 # %% [markdown]
 # ## Format Clip Data
@@ -212,6 +210,10 @@ with open(dataset_metadata_fp, 'w') as file:
 # Now we are ready to format the data for BEBE. For each clip, we save the data from that clip as `clip_id.csv`. This file is a csv array without header. Its shape is `[num_sampled_time_steps, num_channels]`, where the `num_channels` is equal to the length of `dataset_metadata['clip_column_names']`.
 
 # %%
+check_clip_format(clip_format)
+# all clips share one file in the hdf5 format, it is rewritten on every run
+h5_file = open_hdf5(formatted_data_dir, dataset_metadata, mode="w") if clip_format == "hdf5" else None
+
 # load up annotations (not needed when experiment data is already in CSVs)
 
 # annotations_fp = os.path.join(raw_data_dir, 'RawData', 'labels.txt')
@@ -226,62 +228,60 @@ total_annotation_dur_samples = 0
 # includes timestamp
 # header_names = ["UTC DateTime", "Milliseconds", "Acc X [g]", "Acc Y [g]", "Acc Z [g]", "Category"]
 # excludes timestamp
-header_names = ["Acc X [g]", "Acc Y [g]", "Acc Z [g]", "Category"]
+header_names = ["Acc X [g]", "Acc Y [g]", "Acc Z [g]", *feature_channels, "Category"]
+
+# clips whose raw window file is unchanged since they were formatted are not rewritten
+build_cache = load_build_cache()
+
+# label histogram, label runs and sample count of every clip, gathered while writing it (see clip_stats.py)
+previous_clip_stats = load_clip_stats(formatted_data_dir)
+clip_stats = {}
 
+stale_clips = []
 for clip_id in clip_ids:
     # load features
     acc_fp = os.path.join(raw_data_dir, 'RawData', 'acc_' + clip_id + '.txt')
-    
-    acc_data = pd.read_csv(acc_fp, delimiter = ',', header = 1)
-    
-    clip_dur_samples = len(acc_data)
-    total_dur_samples += clip_dur_samples
-        
-    exp_id = int(clip_id[3:5])
-    # annotations_sub = annotations[annotations['exp_id'] == exp_id]
-    
-    # reformat annotations
-    per_frame_annotations = np.zeros([clip_dur_samples, 1]) # populate with 0's, aka "unknown"
-    # for i, row in annotations_sub.iterrows():
-        # obs_int_label = row['label']
-        # int_label = obs_int_label if obs_int_label < 7 else 0 # Treat transitional states as unknown
-        # start_sample = row['start_sample']
-        # end_sample = row['end_sample']
-        # per_frame_annotations[start_sample: end_sample, :] = int_label
-
-    # insert individual id
-    individual_id = clip_id_to_individual_id[clip_id]
-    per_frame_individual_id = np.full_like(per_frame_annotations, individual_id)
-
-    
-    # clip_data = np.concatenate([acc_data, gyr_data, per_frame_individual_id, per_frame_annotations], axis = 1)
-    # clip_data = np.concatenate([acc_data, per_frame_individual_id, per_frame_annotations], axis = 1)
-
-    clip_data = pd.read_csv(acc_fp, delimiter=",", header=1, names=header_names)
-    clip_data["Category"] = clip_data["Category"].apply(get_index_of_behavior)
-    
-    # for row_idx, row in clip_data.iterrows():
-    #     # Check if the row already has a label
-    #     if type(row["Category"]) == str:
-    #         row["Category"] = get_index_of_behavior(row["Category"])
-            
-    #         # continue
-    #         # clip_data[row_idx]["Category"] = get_index_of_behavior(row["Category"])
-    #     else:
-    #         # It is NaN, because there was no label in this row
-    #         row["Dummy Index"] = "Other"
-
-    individual_id_array = np.full(len(clip_data), individual_id, dtype=int)
-
-    clip_data.insert(len(header_names) - 1, "individual_id", individual_id_array)
-    clip_data["individual_id"] = clip_data["individual_id"].astype('Int64')
+    clip_data_fp = get_clip_path(formatted_data_dir, clip_id, clip_format)
+    clip_hash = hash_inputs(get_file_stamp(acc_fp), clip_id_to_individual_id[clip_id], header_names, beh_names)
+    if clip_format != "hdf5" and not is_stale(build_cache, clip_data_fp, clip_hash):
+        if clip_id in previous_clip_stats:
+            clip_stats[clip_id] = previous_clip_stats[clip_id]
+        else:
+            labels = np.asarray(load_clip(formatted_data_dir, clip_id, clip_format)[:, -1])
+            clip_stats[clip_id] = get_clip_stats(labels, len(beh_names))
+        continue
+    stale_clips.append((clip_id, acc_fp, clip_data_fp, clip_hash))
+
+# each clip is independent: with --workers N they are formatted in a process pool (see clip_formatter.py)
+format_args = [(acc_fp, clip_id, clip_id_to_individual_id[clip_id], header_names, beh_names, formatted_data_dir,
+                clip_format) for clip_id, acc_fp, _, _ in stale_clips]
+if args.workers > 1 and not is_unix:
+    # spawned workers would re-run this whole notebook style script on import, only forked workers are safe
+    print("WARNING: --workers needs fork (Linux), formatting clips sequentially")
+if args.workers > 1 and is_unix and len(stale_clips) > 1:
+    print(f"Formatting {len(stale_clips)} clips with {args.workers} workers")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.workers,
+                                                mp_context=multiprocessing.get_context("fork")) as executor:
+        # map returns the results in clip order, so the merge below does not depend on which worker finishes first
+        results = list(executor.map(format_clip, *zip(*format_args)))
+else:
+    results = [format_clip(*clip_args) for clip_args in format_args]
+
+for (clip_id, acc_fp, clip_data_fp, clip_hash), (stats, values) in zip(stale_clips, results):
+    clip_stats[clip_id] = stats
+    if clip_format == "hdf5":
+        save_clip(formatted_data_dir, clip_id, values, clip_format, h5_file)
+    else:
+        record(build_cache, clip_data_fp, clip_hash)
 
-    
-    clip_data_fp = os.path.join(clip_data_dir, clip_id + '.csv')
-    np.savetxt(clip_data_fp, clip_data, delimiter=",", fmt="%s")
-    
     # clip_annotation_dur_samples = sum(per_frame_annotations > 0)
     # total_annotation_dur_samples += clip_annotation_dur_samples
+
+# clip_stats holds every clip in clip_ids order, whether it was formatted or skipped
+total_dur_samples = sum(clip_stats[clip_id]["samples"] for clip_id in clip_ids)
+
+save_build_cache(build_cache)
+save_clip_stats(formatted_data_dir, clip_stats)
     
 
 # %% [markdown]
@@ -333,15 +333,14 @@ print("total annotation duration is %f seconds, i.e. %f hours" % (total_annotati
 beh_names = dataset_metadata['label_names']
 label_count = {fold : {name : 0 for name in beh_names} for fold in range(n_folds)}
 
+# counted from the clip stats gathered while formatting, the clips are not read again
 for clip_id in clip_ids:
-    clip_data_fp = os.path.join(clip_data_dir, clip_id + '.csv')
-    data = pd.read_csv(clip_data_fp, delimiter = ',', header = None)
-    counts = data[data.keys()[-1]].astype(int).value_counts()
-    for key in counts.keys():
+    counts = clip_stats[clip_id]["label_counts"]
+    for key, count in enumerate(counts):
         name = beh_names[key]
         for fold in range(n_folds):
             if clip_id in dataset_metadata['clip_ids_per_fold'][fold]:
-                label_count[fold][name] += counts[key]
+                label_count[fold][name] += count
                 
 label_perc = {fold : {name : 0 for name in beh_names[1:]} for fold in range(n_folds)}
 
@@ -421,67 +420,21 @@ from pathlib import Path
 
 dataset_metadata_fp = os.path.join(formatted_data_dir, 'dataset_metadata.yaml')
 
-with open(dataset_metadata_fp, 'r') as file:
-    metadata = yaml.safe_load(file)
-
-clip_fps = list(Path(clip_data_dir).glob('*.csv'))
-
-def create_list_of_durations(x, infill_max_dur_sec, samplerate, unknown_value = 0):
-    # First pass: create a list of label durations, together with a list of the associated classes
-    current_value = 0
-    current_dur = 0
-    list_of_durs = []
-    list_of_labels = []
-    for i in x:
-        if i == current_value:
-            current_dur += 1
-        elif i != current_value:
-            list_of_durs.append(current_dur / samplerate)
-            list_of_labels.append(current_value)
-            current_dur = 1
-            current_value = i
-            
-    list_of_durs.append(current_dur)
-    list_of_labels.append(current_value)
-            
-    # repeatedly merge similar labels if they are seperated by unknowns of short duration
-    # This is mainly to deal with duty cycling of observations
-    infill_max_dur_samples = int(infill_max_dur_sec * samplerate)
-    
-    if list_of_labels[0] == unknown_value:
-        del list_of_labels[0]
-        del list_of_durs[0]
-        
-    if list_of_labels[-1] == unknown_value:
-        del list_of_labels[-1]
-        del list_of_durs[-1]
-    
-    j = 1
-    while j<len(list_of_labels)-1:
-        if list_of_labels[j] != unknown_value:
-            j+= 1
-        elif list_of_labels[j-1] == list_of_labels[j+1] and list_of_durs[j] < infill_max_dur_samples:
-            # merge if it's a short interval of unknowns between two of the same label
-            list_of_durs[j-1] += list_of_durs[j+1]
-            del list_of_durs[j+1]
-            del list_of_durs[j]
-            del list_of_labels[j+1]
-            del list_of_labels[j]
-        else:
-            # otherwise, drop the unknown segment
-            del list_of_durs[j]
-            del list_of_labels[j]
+# the metadata is only written below (once), start from the dictionary built above
+metadata = dict(dataset_metadata)
+clip_stats = load_clip_stats(formatted_data_dir)
+
+# create_list_of_durations (BEBE's per sample loop) is replaced by a run-length version that works on the
+# label runs in the clip stats, see clip_stats.py. All durations are in seconds.
 
-    return list_of_labels, list_of_durs # list of annotation durations, in samples.
-                             
 durs_sec_by_individual = {i : [] for i in metadata['individual_ids']}
 overall_durs_sec = []
     
-for fp in tqdm.tqdm(clip_fps):
-    clip_id = fp.stem
+for clip_id in tqdm.tqdm(metadata['clip_ids']):
     individual_id = metadata['clip_id_to_individual_id'][clip_id]
-    clip_annotations = list(pd.read_csv(fp, header = None).values[:, -1])
-    l, d = create_list_of_durations(clip_annotations, infill_max_dur_sec, metadata['sr'])
+    # durations come from the label runs in the clip stats instead of reading the clip
+    l, d = get_durations_from_runs(clip_stats[clip_id]["run_labels"], clip_stats[clip_id]["run_lengths"],
+                                   infill_max_dur_sec, metadata['sr'])
     durs_sec_by_individual[individual_id].extend(d)
     overall_durs_sec.extend(d)
     
@@ -493,12 +446,16 @@ metadata['mean_overall_dur_sec'] = mean_overall_dur_sec
 
 print("Mean overall label duration is %0.3f seconds" % mean_overall_dur_sec)
 
-print("Re-saving metadata to %s" % str(dataset_metadata_fp))
+print("Saving metadata to %s" % str(dataset_metadata_fp))
 
 with open(dataset_metadata_fp, 'w') as file:
     yaml.dump(metadata, file)
 
 # %%
+if h5_file is not None:
+    # keep the mean durations computed above in the file attributes as well
+    for key in ['mean_dur_sec_by_individual', 'mean_overall_dur_sec']:
+        h5_file.attrs[key] = to_attr(metadata[key])
+    h5_file.close()
 
-
-
+# %%
@@ -0,0 +1,104 @@
+from collections.abc import Mapping
+import hashlib
+import json
+import os
+from pathlib import Path
+import sys
+
+# get the project root as the parent of the parent directory of this file
+ROOT_DIR = str(Path(__file__).parent.parent.absolute())
+sys.path.append(ROOT_DIR)
+from utils.data_config import data_paths
+
+"""
+Incremental build bookkeeping shared by the pipeline stages
+(spreadsheet row -> window csv -> R script -> png -> mega plot -> BEBE clip).
+
+Every generated artifact is recorded with a hash of everything it was built from (config fields, template
+text, view config, size/mtime of the source files). A stage only rebuilds an artifact when it is missing or
+the hash of its current inputs differs from the recorded one, so editing one kill rebuilds only that kill.
+"""
+
+
+def get_cache_key(artifact_path):
+    return os.path.normpath(os.path.abspath(artifact_path))
+
+
+def load_build_cache(cache_path=None):
+    """
+    Load the artifact -> input hash map (empty if there is no cache yet)
+    """
+    if cache_path is None:
+        cache_path = data_paths["build_cache_path"]
+    if not os.path.isfile(cache_path):
+        return {}
+    try:
+        with open(cache_path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"WARNING: Ignoring unreadable build cache {cache_path}: {e}")
+        return {}
+
+
+def save_build_cache(cache, cache_path=None):
+    if cache_path is None:
+        cache_path = data_paths["build_cache_path"]
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, cache_path)
+
+
+def encode_input(value):
+    # mappings that are not dicts (event_table.EventRecord configs) as the dicts they stand for,
+    # timestamps and other objects by their string form
+    return dict(value) if isinstance(value, Mapping) else str(value)
+
+
+def hash_inputs(*inputs):
+    """
+    Stable hash of any json-able inputs (timestamps and other objects are hashed by their string form)
+    """
+    encoded = json.dumps(inputs, sort_keys=True, default=encode_input).encode("utf-8")
+    return hashlib.sha1(encoded).hexdigest()
+
+
+def get_file_stamp(path):
+    """
+    Cheap change detection for (large) input files: [size, mtime], None if the file does not exist
+    """
+    try:
+        stats = os.stat(path)
+    except OSError:
+        return None
+    return [stats.st_size, stats.st_mtime]
+
+
+def is_stale(cache, artifact_path, input_hash):
+    """
+    True if the artifact has to be (re)built: it is missing or was built from different inputs
+    """
+    if not os.path.isfile(artifact_path):
+        return True
+    return cache.get(get_cache_key(artifact_path)) != input_hash
+
+
+def record(cache, artifact_path, input_hash):
+    cache[get_cache_key(artifact_path)] = input_hash
+
+
+def record_outputs(cache, pending, since):
+    """
+    Record the artifacts of jobs that ran externally (R scripts/workers), once they exist
+    :param pending: dict of artifact path -> input hash
+    :param since: start time of the run, older files are from a previous run and are not recorded
+    :return: number of artifacts recorded
+    """
+    recorded = 0
+    for artifact_path, input_hash in pending.items():
+        # allow for filesystems with coarse (1-2 s) modification times
+        if os.path.isfile(artifact_path) and os.path.getmtime(artifact_path) >= since - 2:
+            record(cache, artifact_path, input_hash)
+            recorded += 1
+    return recorded
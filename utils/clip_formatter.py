@@ -0,0 +1,57 @@
+from pathlib import Path
+import sys
+
+import numpy as np
+import pandas as pd
+
+# get the project root as the parent of the parent directory of this file
+ROOT_DIR = str(Path(__file__).parent.parent.absolute())
+sys.path.append(ROOT_DIR)
+from utils.clip_stats import get_clip_stats
+from utils.clip_store import save_clip
+
+"""
+Formatting of a single BEBE clip from a labeled window (acc_<clip_id>.txt written by spreadsheet_utils).
+
+Kept out of BEBE_format_cougar.py (which runs top to bottom as a notebook) so that the clips can be
+formatted in a process pool: every clip is independent, the workers only need this module.
+"""
+
+
+def get_label_index(behavior, beh_names):
+    # given the string of a label, convert it into an int representation of the behavior names list
+    # If not found, return 0 for unknown
+    try:
+        return int(beh_names.index(behavior))
+    except ValueError:
+        return 0
+
+
+def format_clip(acc_fp, clip_id, individual_id, header_names, beh_names, formatted_data_dir, clip_format):
+    """
+    Read a labeled window once and save it as a clip (axes, derived channels, individual_id, label index)
+    :return: (clip stats, clip values) - the values are only returned for the hdf5 format, where the
+             caller owns the (single) output file; the other formats are saved here
+    """
+    # single read per clip: the raw axes (and derived channels) as float64 so the saved text is unchanged,
+    # the label straight into a categorical.
+    # header=1 as before: the header line and the first data row are skipped
+    clip_data = pd.read_csv(acc_fp, delimiter=",", header=None, skiprows=2, names=header_names,
+                            dtype={**{name: np.float64 for name in header_names[:-1]}, "Category": "category"})
+    clip_dur_samples = len(clip_data)
+
+    # map label names to their index in beh_names through a lookup on the (few) categories instead of per row,
+    # labels that are not in beh_names (or missing) become 0, aka "unknown"
+    categories = clip_data["Category"].cat.categories
+    label_lookup = np.array([get_label_index(name, beh_names) for name in categories] + [0], dtype=np.int64)
+    clip_data["Category"] = label_lookup[clip_data["Category"].cat.codes.to_numpy()]
+
+    # insert individual id (nullable Int64 keeps it an integer next to the float columns when saved as text)
+    clip_data.insert(len(header_names) - 1, "individual_id",
+                     pd.array(np.full(clip_dur_samples, individual_id), dtype="Int64"))
+
+    stats = get_clip_stats(clip_data["Category"].to_numpy(), len(beh_names))
+    if clip_format == "hdf5":
+        return stats, clip_data.to_numpy(dtype=np.float32)
+    save_clip(formatted_data_dir, clip_id, clip_data, clip_format)
+    return stats, None
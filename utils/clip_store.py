@@ -0,0 +1,104 @@
+import os
+
+import numpy as np
+import pandas as pd
+import yaml
+
+"""
+Storage formats for the formatted BEBE clips (formatted_data_root/clip_data).
+
+    csv     clip_data/<clip_id>.csv, headerless text (the format BEBE reads)
+    npy     clip_data/<clip_id>.npy, float32 [num_samples, num_channels], memory mapped on load
+    hdf5    clips.h5 with one chunked, gzip compressed dataset per clip under /clip_data and the
+            dataset_metadata.yaml fields as attributes of the file
+
+load_clip returns a zero-copy view for npy (a read only memory map) and a lazy h5py dataset for hdf5,
+so only the rows that are sliced are read. h5py is only needed for the hdf5 format.
+"""
+
+CLIP_FORMATS = ["csv", "npy", "hdf5"]
+HDF5_FILE = "clips.h5"
+HDF5_GROUP = "clip_data"
+HDF5_CHUNK_ROWS = 4096
+
+
+def get_clip_path(formatted_data_dir, clip_id, clip_format):
+    """
+    File holding a clip (for hdf5 the shared file of all clips)
+    """
+    if clip_format == "hdf5":
+        return os.path.join(formatted_data_dir, HDF5_FILE)
+    return os.path.join(formatted_data_dir, "clip_data", f"{clip_id}.{clip_format}")
+
+
+def check_clip_format(clip_format):
+    if clip_format not in CLIP_FORMATS:
+        raise ValueError(f"Unknown clip format {clip_format}, expected one of {', '.join(CLIP_FORMATS)}")
+
+
+def to_attr(value):
+    """
+    HDF5 attributes hold scalars/arrays, nested metadata (dicts, lists of strings) is stored as yaml text
+    """
+    if isinstance(value, (int, float, str)):
+        return value
+    return yaml.dump(value)
+
+
+def open_hdf5(formatted_data_dir, dataset_metadata=None, mode="a"):
+    """
+    Open the clips file for writing, storing the dataset metadata fields as file attributes
+    """
+    import h5py
+
+    h5_file = h5py.File(os.path.join(formatted_data_dir, HDF5_FILE), mode)
+    h5_file.require_group(HDF5_GROUP)
+    if dataset_metadata:
+        for key, value in dataset_metadata.items():
+            h5_file.attrs[key] = to_attr(value)
+    return h5_file
+
+
+def save_clip(formatted_data_dir, clip_id, clip_data, clip_format, h5_file=None):
+    """
+    Save a clip [num_samples, num_channels] (last two channels individual_id and label)
+    :param h5_file: open file from open_hdf5, required for the hdf5 format
+    :return: path of the file written
+    """
+    check_clip_format(clip_format)
+    clip_path = get_clip_path(formatted_data_dir, clip_id, clip_format)
+    if clip_format == "csv":
+        np.savetxt(clip_path, clip_data, delimiter=",", fmt="%s")
+    elif clip_format == "npy":
+        np.save(clip_path, np.asarray(clip_data, dtype=np.float32))
+    else:
+        group = h5_file[HDF5_GROUP]
+        if clip_id in group:
+            del group[clip_id]
+        values = np.asarray(clip_data, dtype=np.float32)
+        chunks = (max(1, min(HDF5_CHUNK_ROWS, len(values))), values.shape[1]) if values.ndim == 2 else None
+        group.create_dataset(clip_id, data=values, chunks=chunks, compression="gzip", shuffle=True)
+    return clip_path
+
+
+def load_clip(formatted_data_dir, clip_id, clip_format, h5_file=None):
+    """
+    Load a clip as [num_samples, num_channels]
+        csv:  parsed into memory
+        npy:  read only memory map (no copy)
+        hdf5: h5py dataset, rows are read (and decompressed) only when sliced
+              without h5_file the whole clip is read into memory and the file closed again
+    :param h5_file: open h5py file of the clips, keep it open while the returned dataset is used
+    """
+    check_clip_format(clip_format)
+    clip_path = get_clip_path(formatted_data_dir, clip_id, clip_format)
+    if clip_format == "csv":
+        return pd.read_csv(clip_path, delimiter=",", header=None).to_numpy()
+    if clip_format == "npy":
+        return np.load(clip_path, mmap_mode="r")
+    if h5_file is None:
+        import h5py
+
+        with h5py.File(clip_path, "r") as f:
+            return f[HDF5_GROUP][clip_id][()]
+    return h5_file[HDF5_GROUP][clip_id]
@@ -0,0 +1,168 @@
+import io
+import json
+import os
+from pathlib import Path
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+
+# get the project root as the parent of the parent directory of this file
+ROOT_DIR = str(Path(__file__).parent.parent.absolute())
+sys.path.append(ROOT_DIR)
+from utils.data_config import constants
+from utils.day_store import (frame_to_columns, get_day_from_csv_path, get_source_stats, day_start_ms, read_day_csv,
+                             TIME_COL, MS_COL, ACC_COLS, STORE_COLS)
+
+"""
+Sparse time -> byte offset index for the MotionData day csvs.
+
+The index is a sidecar file next to each day csv (<YYYY-MM-DD>.csv.idx.json) holding the byte offset of the
+first row of every time bucket (CSV_INDEX_SECS wide, one minute by default). It is built once per day file
+(and rebuilt if the csv changes), after which a window can be read by seeking straight to its first bucket
+and parsing only the lines up to its last bucket.
+
+Rows in the day files are expected to be in time order with HH:MM:SS times in the first column. build_index
+raises ValueError for files that are not, read_csv_window then falls back to parsing the whole file.
+"""
+
+INDEX_SUFFIX = ".idx.json"
+HEADER_LINES = 2    # first line is collar info, second line is the column header
+
+
+def get_index_path(csv_path):
+    return f"{csv_path}{INDEX_SUFFIX}"
+
+
+def build_index(csv_path, granularity_secs=None):
+    """
+    Scan a day csv once and write its sidecar index
+    :return: the index dict
+    """
+    if granularity_secs is None:
+        granularity_secs = constants["CSV_INDEX_SECS"]
+
+    with open(csv_path, "rb") as f:
+        raw = np.frombuffer(f.read(), dtype=np.uint8)
+    line_starts = np.concatenate([[0], np.flatnonzero(raw == ord("\n")) + 1])
+    line_starts = line_starts[line_starts < len(raw)]
+    if len(line_starts) < HEADER_LINES:
+        raise ValueError(f"No header found in {csv_path}")
+    data_start = int(line_starts[HEADER_LINES]) if len(line_starts) > HEADER_LINES else len(raw)
+    row_starts = line_starts[HEADER_LINES:]
+    row_starts = row_starts[row_starts + 8 <= len(raw)]
+
+    # times are fixed width HH:MM:SS at the start of each row, decode them straight from the bytes
+    time_bytes = raw[row_starts[:, None] + np.arange(8)]
+    if len(time_bytes) and not (np.all(time_bytes[:, 2] == ord(":")) and np.all(time_bytes[:, 5] == ord(":"))):
+        raise ValueError(f"Unexpected time format in {csv_path}, expected HH:MM:SS")
+    digits = time_bytes[:, [0, 1, 3, 4, 6, 7]].astype(np.int64) - ord("0")
+    secs = (digits[:, 0] * 10 + digits[:, 1]) * 3600 + (digits[:, 2] * 10 + digits[:, 3]) * 60 \
+        + digits[:, 4] * 10 + digits[:, 5]
+    buckets = secs // granularity_secs
+    if np.any(np.diff(buckets) < 0):
+        raise ValueError(f"Rows are not in time order in {csv_path}")
+
+    # offset of the first row in each bucket; empty buckets point at the next non-empty one
+    n_buckets = -(-24 * 3600 // granularity_secs)
+    first_rows = np.searchsorted(buckets, np.arange(n_buckets + 1), side="left")
+    offsets = np.append(row_starts, len(raw))[first_rows]
+
+    index = get_source_stats(csv_path)
+    index.update({
+        "granularity_secs": int(granularity_secs),
+        "data_start": data_start,
+        "offsets": offsets.tolist(),
+    })
+    try:
+        with open(get_index_path(csv_path), "w") as f:
+            json.dump(index, f)
+    except OSError as e:
+        # read only data archive, the index is still usable for this read
+        print(f"WARNING: Unable to save index for {csv_path}: {e}")
+    return index
+
+
+def load_index(csv_path, build=True):
+    """
+    Load the index of a day csv, (re)building it when missing or out of date
+    Returns None if there is no usable index and build is False.
+    """
+    index_path = get_index_path(csv_path)
+    if os.path.isfile(index_path):
+        with open(index_path, "r") as f:
+            index = json.load(f)
+        stats = get_source_stats(csv_path)
+        if index["size"] == stats["size"] and index["mtime"] == stats["mtime"]:
+            return index
+    if not build:
+        return None
+    return build_index(csv_path)
+
+
+def get_byte_range(index, start_ms, end_ms, day_ms):
+    """
+    Byte range [lo, hi) of the rows in the buckets overlapping start_ms..end_ms (epoch ms) on the day starting at day_ms
+    """
+    gran_ms = index["granularity_secs"] * 1000
+    offsets = index["offsets"]
+    n_buckets = len(offsets) - 1
+    lo_bucket = int(np.clip((start_ms - day_ms) // gran_ms, 0, n_buckets))
+    hi_bucket = int(np.clip((end_ms - day_ms) // gran_ms + 1, 0, n_buckets))
+    return offsets[lo_bucket], offsets[hi_bucket]
+
+
+def read_csv_window(csv_path, start_ms, end_ms):
+    """
+    Read only the rows of a day csv with start_ms <= ts <= end_ms (epoch ms), seeking via the sidecar index.
+    Day csvs that can not be indexed (times not zero padded, rows out of order) are parsed in full instead.
+    :return: dict of column arrays (ts, x, y, z)
+    """
+    try:
+        index = load_index(csv_path)
+    except ValueError as e:
+        print(f"WARNING: Reading all of {csv_path} without its index: {e}")
+        return read_unindexed_window(csv_path, start_ms, end_ms)
+    day = get_day_from_csv_path(csv_path)
+    lo, hi = get_byte_range(index, start_ms, end_ms, day_start_ms(day))
+    with open(csv_path, "rb") as f:
+        header = f.read(index["data_start"])
+        f.seek(lo)
+        body = f.read(hi - lo)
+
+    df = pd.read_csv(io.BytesIO(header + body), skiprows=1, usecols=[TIME_COL, MS_COL, *ACC_COLS.values()],
+                     dtype={TIME_COL: str, MS_COL: np.int64, **{col: np.float32 for col in ACC_COLS.values()}})
+    columns = frame_to_columns(df, day)
+    keep = (columns["ts"] >= start_ms) & (columns["ts"] <= end_ms)
+    return {key: columns[key][keep] for key in STORE_COLS}
+
+
+def read_unindexed_window(csv_path, start_ms, end_ms):
+    """
+    Rows of a day csv parsed whole with start_ms <= ts <= end_ms, in file order (the rows may not be sorted,
+    so they are masked rather than binary searched)
+    """
+    columns = read_day_csv(csv_path)
+    keep = (columns["ts"] >= start_ms) & (columns["ts"] <= end_ms)
+    return {key: columns[key][keep] for key in STORE_COLS}
+
+
+def write_csv_slice(csv_path, start_ms, end_ms, out_path):
+    """
+    Write a copy of a day csv holding only the index buckets that overlap the window (plus the header lines),
+    for consumers like the R template that read whole csv files. Bytes are copied without parsing.
+    """
+    try:
+        index = load_index(csv_path)
+    except ValueError as e:
+        # the consumers filter the rows to the window themselves, as they did with whole day files
+        print(f"WARNING: Copying all of {csv_path} without its index: {e}")
+        shutil.copyfile(csv_path, out_path)
+        return out_path
+    lo, hi = get_byte_range(index, start_ms, end_ms, day_start_ms(get_day_from_csv_path(csv_path)))
+    with open(csv_path, "rb") as f_in, open(out_path, "wb") as f_out:
+        f_out.write(f_in.read(index["data_start"]))
+        f_in.seek(lo)
+        f_out.write(f_in.read(hi - lo))
+    return out_path
@@ -21,11 +21,17 @@ data_paths = {
     "spreadsheet_root": f"{ROOT_DIR}/data",
     "csv_backup": f"{ROOT_DIR}/data/csv_backup",
     "template_path": f"{ROOT_DIR}/rcode/template.r",
+    "worker_path": f"{ROOT_DIR}/rcode/worker.r",     # long lived R worker that renders rows of a job manifest
     "output_path": f"{ROOT_DIR}/rcode/jobs/",
     "r_path": "C:\\Program Files\\R\\R-4.3.1\\bin\\Rscript.exe",
     "plot_root": f"{ROOT_DIR}/plots/",
     "raw_data_root": f"{ROOT_DIR}/BEBE-datasets/raw_{experiment_name}/RawData/",   # dir where spreadsheet script writes files for BEBE formatter
     "formatted_data_root": f"{ROOT_DIR}/BEBE-datasets/format_{experiment_name}/",   # dir where BEBE formatted datasets live
+    "day_store_root": f"{ROOT_DIR}/data/day_store/",     # columnar (npy) copies of the MotionData day csvs, see day_store.py
+    "build_cache_path": f"{ROOT_DIR}/data/build_cache.json",   # input hashes of generated artifacts, see build_cache.py
+    "run_report_path": f"{ROOT_DIR}/data/run_report.json",     # per job timings/status of the last plot run, see run_report.py
+    "spreadsheet_cache_root": f"{ROOT_DIR}/data/spreadsheet_cache/",   # parsed spreadsheet tabs, see spreadsheet_cache.py
+    "day_catalog_path": f"{ROOT_DIR}/data/day_catalog.sqlite",   # catalog of the MotionData day csvs, see day_catalog.py
 }
 
 if is_unix:
@@ -56,8 +62,20 @@ spreadsheets = {
 constants = {
     "INPUT_SAMPLE_RATE": 16,      # input from cougar collars is 16Hz
     "OUTPUT_SAMPLE_RATE": 1,     # desired output (Hz) to feed into BEBE models (unused yet)
+    "RESAMPLE_AGGREGATOR": "mean",  # how input samples are reduced to the output rate: mean, std, max_abs, decimate (see resample.py)
+    "FEATURE_CHANNELS": [],      # derived channels appended to the labeled windows and clips, e.g. ["ODBA", "VeDBA"] (see features.py)
+    "STATIC_WINDOW_SECS": 2,     # running mean window that separates static from dynamic acceleration
+    "DBA_SMOOTH_SECS": 0,        # running mean window applied to ODBA/VeDBA, 0 for none
+    "STREAM_CHUNK_ROWS": 500_000,   # rows per chunk when windows are streamed (bounds memory, see stream_reader.py)
+    "CSV_INDEX_SECS": 60,        # granularity of the time -> byte offset index built for each day csv
 }
 
+"""
+Behavior classes written to the labeled windows. The integer code of a label is its index in this list
+(BEBE convention: 'unknown' is always first).
+"""
+behavior_labels = ['unknown', 'STALK', 'KILL', 'FEED', 'NON_KILL']
+
 
 """
 Configs for different data windows we may care about.
@@ -70,31 +88,36 @@ view_configs = {
         "window_pre_mins": 1,
         "window_post_mins": 1,
         "minor_tick_interval": 5,
+        "plot_width_px": 700,       # image width, wide windows are drawn as min/max envelopes at this resolution (envelope.py)
     },
     # stalking: short before, short after
     "stalking": {
         "window_pre_mins": 10,
         "window_post_mins": 2,
         "minor_tick_interval": 30,
+        "plot_width_px": 700,
     },
     # feeding: short before, long after
     "feeding": {
         "window_pre_mins": 2,
         "window_post_mins": 30,
         "minor_tick_interval": 60,
+        "plot_width_px": 700,
     },
     
-    # day: several hours before and after (will not cross days yet)
+    # day: several hours before and after (crosses into the previous/next day files)
     "day": {
         "window_pre_mins": 24*60,
         "window_post_mins": 24*60,
         "minor_tick_interval": 60 * 60,     # every hour
+        "plot_width_px": 700,
     },
     # sixhour: shorter than day window, still wide window
     "sixhour": {
         "window_pre_mins": 6 * 60,
         "window_post_mins": 6 * 60,
         "minor_tick_interval": 60 * 60,     # every hour
+        "plot_width_px": 700,
     }
 }
 
@@ -127,6 +150,7 @@ def validate_config():
     spreadsheet_root = data_paths["spreadsheet_root"]
     assert(os.path.isdir(spreadsheet_root)), f"Unable to find input data dir: {spreadsheet_root}"
     assert(os.access(data_paths["template_path"], os.R_OK)), f"Unable tp read template file: {data_paths['template_path']}"
+    assert(os.access(data_paths["worker_path"], os.R_OK)), f"Unable to read R worker file: {data_paths['worker_path']}"
     os.makedirs(data_paths["output_path"], exist_ok=True)
     assert(os.access(data_paths["output_path"], os.W_OK)), f"Unable to write to output dir: {data_paths['output_path']}"
     assert(os.access(data_paths["r_path"], os.X_OK)), "Unable to find/execute R"
@@ -145,11 +169,13 @@ def validate_config():
         assert("window_pre_mins" in value), f"Missing window_pre_mins for view_configs[{key}]"
         assert ("window_post_mins" in value), f"Missing window_post_mins for view_configs[{key}]"
         assert ("minor_tick_interval" in value), f"Missing minor_tick_interval for view_configs[{key}]"
+        assert ("plot_width_px" in value), f"Missing plot_width_px for view_configs[{key}]"
 
     # sanity checks for sampling rates
     assert constants['INPUT_SAMPLE_RATE'] == 16, "Input sample rate should always be 16"
     assert 0 < constants['OUTPUT_SAMPLE_RATE'] <= constants['INPUT_SAMPLE_RATE'], f"Output sample rate must be positive and less than input sample rate ({constants['INPUT_SAMPLE_RATE']} Hz)"
     assert constants['INPUT_SAMPLE_RATE'] % constants['OUTPUT_SAMPLE_RATE'] == 0, f"Input sample rate must divide evenly into into output"
+    assert 0 < constants['CSV_INDEX_SECS'] <= 24 * 60 * 60, "CSV index granularity must be between 1 second and 1 day"
 
     print("Data config checks passed\n")
 
@@ -0,0 +1,271 @@
+import concurrent.futures
+from datetime import datetime
+import os
+from pathlib import Path
+import re
+import sqlite3
+import sys
+
+import numpy as np
+
+# get the project root as the parent of the parent directory of this file
+ROOT_DIR = str(Path(__file__).parent.parent.absolute())
+sys.path.append(ROOT_DIR)
+from utils.data_config import data_paths
+from utils.csv_index import HEADER_LINES
+from utils.day_store import day_start_ms
+
+"""
+Deployment wide catalog of the MotionData day csvs, kept in a SQLite database (data_paths day_catalog_path).
+
+Collar archives are laid out as
+    <root>/<collar_id>_<serial>_<dates>/MotionData_<n>/YYYY/MM Mon/DD/YYYY-MM-DD.csv
+refresh_catalog walks a root once and records for every day file its collar, data root (the MotionData dir),
+date, size and mtime, from the directory listing only. Refreshing is incremental: files that are new or whose
+size/mtime changed are (re)recorded, files that disappeared are dropped.
+The row count, first/last timestamp (epoch ms) and detected sample rate need a read of the whole file: they are
+filled by get_day_info the first time a file is asked for, or for every file with refresh_catalog(scan=True).
+
+Paths are then resolved with queries (find_day_file by collar id, get_day_file by data root) instead of a
+glob or stat per lookup, which is slow on network mounted archives.
+"""
+
+DAY_FILE_RE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})\.csv$")
+HEAD_BYTES = 1 << 16        # bytes read from the start of a file to find its first row and sample rate
+TAIL_BYTES = 1 << 12        # bytes read from the end of a file to find its last row
+READ_BYTES = 1 << 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS day_files (
+    path        TEXT PRIMARY KEY,
+    collar_id   TEXT NOT NULL,
+    data_root   TEXT NOT NULL,
+    date        TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    mtime_ns    INTEGER NOT NULL,
+    rows        INTEGER,
+    first_ts    INTEGER,
+    last_ts     INTEGER,
+    sample_rate INTEGER
+);
+CREATE INDEX IF NOT EXISTS day_files_collar_date ON day_files (collar_id, date);
+CREATE INDEX IF NOT EXISTS day_files_root_date ON day_files (data_root, date);
+"""
+SCHEMA_VERSION = 1          # bump when SCHEMA changes, older catalogs are rebuilt
+STAT_FIELDS = ["rows", "first_ts", "last_ts", "sample_rate"]
+
+
+def normalize_path(path):
+    # one spelling per file: no trailing/duplicate separators, forward slashes (R does not like backward slashes)
+    return os.path.normpath(str(path)).replace("\\", "/")
+
+
+def to_date_key(date):
+    return date if isinstance(date, str) else date.strftime("%Y-%m-%d")
+
+
+def open_catalog(catalog_path=None):
+    """
+    Open (creating if needed) the catalog database
+    """
+    if catalog_path is None:
+        catalog_path = data_paths["day_catalog_path"]
+    if catalog_path != ":memory:":
+        os.makedirs(os.path.dirname(os.path.abspath(catalog_path)), exist_ok=True)
+    conn = sqlite3.connect(catalog_path)
+    conn.row_factory = sqlite3.Row
+    if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        # the catalog only mirrors the archive, an outdated one is simply rebuilt by the next refresh
+        conn.execute("DROP TABLE IF EXISTS day_files")
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def parse_day_path(path):
+    """
+    Collar id, data root and date of a day csv from its place in the archive layout
+    :return: (collar_id, data_root, date) or None if the path does not follow the layout
+    """
+    parts = Path(path).parts
+    match = DAY_FILE_RE.match(parts[-1])
+    if not match or len(parts) < 6:
+        return None
+    year, month, day = match.groups()
+    if parts[-2] != day or parts[-3][:2] != month or parts[-4] != year:
+        return None
+    collar_id = parts[-6].split("_")[0]
+    return collar_id, normalize_path(Path(*parts[:-4])), f"{year}-{month}-{day}"
+
+
+def iter_day_files(root):
+    """
+    Walk a directory tree once, yielding (path, stat) of every file named like a day csv
+    """
+    stack = [root]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif DAY_FILE_RE.match(entry.name) and entry.is_file():
+                        yield normalize_path(entry.path), entry.stat()
+        except OSError as e:
+            print(f"WARNING: Unable to list {e.filename}: {e.strerror}")
+
+
+def parse_row_time(line):
+    # rows start with HH:MM:SS,<milliseconds>
+    fields = line.split(b",", 2)
+    hours, mins, secs = (int(value) for value in fields[0].split(b":"))
+    return (hours * 3600 + mins * 60 + secs) * 1000 + int(fields[1])
+
+
+def scan_day_file(path, date):
+    """
+    Read a day csv once for its row count, first/last timestamp (epoch ms) and sample rate (the most rows
+    seen in one second at the start of the file)
+    :param date: YYYY-MM-DD of the file
+    """
+    newlines = 0
+    with open(path, "rb") as f:
+        head = f.read(HEAD_BYTES)
+        block = head
+        tail = b""
+        while block:
+            newlines += block.count(b"\n")
+            tail = (tail + block)[-TAIL_BYTES:]
+            block = f.read(READ_BYTES)
+    if tail and not tail.endswith(b"\n"):
+        newlines += 1
+    stats = {"rows": max(0, newlines - HEADER_LINES), "first_ts": None, "last_ts": None, "sample_rate": None}
+    if not stats["rows"]:
+        return stats
+
+    # the last line of the head may be cut, only use complete ones
+    head_rows = [line for line in head.split(b"\n")[HEADER_LINES:-1] if line.strip()]
+    tail_rows = [line for line in tail.split(b"\n") if line.strip()]
+    origin = day_start_ms(datetime.strptime(date, "%Y-%m-%d"))
+    try:
+        stats["first_ts"] = origin + parse_row_time(head_rows[0] if head_rows else tail_rows[-1])
+        stats["last_ts"] = origin + parse_row_time(tail_rows[-1])
+        if head_rows:
+            seconds = np.array([line[:8] for line in head_rows])
+            stats["sample_rate"] = int(np.unique(seconds, return_counts=True)[1].max())
+    except (ValueError, IndexError) as e:
+        print(f"WARNING: Unexpected row format in {path}: {e}")
+    return stats
+
+
+def scan_entry(path, date):
+    """
+    scan_day_file for the catalog: the stats in STAT_FIELDS order, None if the file can not be read
+    """
+    try:
+        stats = scan_day_file(path, date)
+    except OSError as e:
+        print(f"WARNING: Unable to read {path}: {e}")
+        return None
+    return tuple(stats[field] for field in STAT_FIELDS)
+
+
+def refresh_catalog(conn, roots, scan=False, max_workers=8):
+    """
+    Bring the catalog up to date with the day files under each root (one walk per root)
+    Files are only stat'ed, their stats (rows, timestamps, sample rate) are left for get_day_info to fill
+    :param scan: also read every file without stats (new, changed or never scanned) in a thread pool
+    :return: (added, updated, removed) counts
+    """
+    added = updated = removed = 0
+    for root in roots:
+        root = normalize_path(root)
+        prefix = root.rstrip("/") + "/"
+        known = {row["path"]: (row["size"], row["mtime_ns"]) for row in
+                 conn.execute("SELECT path, size, mtime_ns FROM day_files WHERE substr(path, 1, ?) = ?",
+                              (len(prefix), prefix))}
+
+        seen = set()
+        entries = []
+        for path, stat in iter_day_files(root):
+            parsed = parse_day_path(path)
+            if parsed is None:
+                continue
+            seen.add(path)
+            if known.get(path) != (stat.st_size, stat.st_mtime_ns):
+                entries.append((path, *parsed, stat.st_size, stat.st_mtime_ns))
+        conn.executemany("INSERT OR REPLACE INTO day_files (path, collar_id, data_root, date, size, mtime_ns) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", entries)
+        stale = [(path,) for path in known if path not in seen]
+        conn.executemany("DELETE FROM day_files WHERE path = ?", stale)
+        conn.commit()
+
+        scanned = 0
+        if scan:
+            to_scan = conn.execute("SELECT path, date FROM day_files WHERE rows IS NULL AND substr(path, 1, ?) = ?",
+                                   (len(prefix), prefix)).fetchall()
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+                stats = executor.map(lambda row: scan_entry(row["path"], row["date"]), to_scan)
+                updates = [(*entry, row["path"]) for row, entry in zip(to_scan, stats) if entry]
+            save_stats(conn, updates)
+            scanned = len(updates)
+
+        root_added = sum(1 for entry in entries if entry[0] not in known)
+        added += root_added
+        updated += len(entries) - root_added
+        removed += len(stale)
+        print(f"Day catalog: {len(seen)} day files under {root} "
+              f"({root_added} added, {len(entries) - root_added} updated, {len(stale)} removed"
+              + (f", {scanned} scanned)" if scan else ")"))
+    return added, updated, removed
+
+
+def save_stats(conn, updates):
+    """
+    :param updates: (rows, first_ts, last_ts, sample_rate, path) per file
+    """
+    conn.executemany(f"UPDATE day_files SET {', '.join(f'{field} = ?' for field in STAT_FIELDS)} WHERE path = ?",
+                     updates)
+    conn.commit()
+
+
+def find_day_file(conn, collar_id, date, root=None):
+    """
+    Path of the day csv of a collar (e.g. F202) on a date, optionally only under root
+    :return: path or None
+    """
+    query = "SELECT path FROM day_files WHERE collar_id = ? AND date = ?"
+    params = [collar_id, to_date_key(date)]
+    if root is not None:
+        prefix = normalize_path(root).rstrip("/") + "/"
+        query += " AND substr(path, 1, ?) = ?"
+        params += [len(prefix), prefix]
+    row = conn.execute(query + " ORDER BY path LIMIT 1", params).fetchone()
+    return row["path"] if row else None
+
+
+def get_day_file(conn, data_root, date):
+    """
+    Path of the day csv in a MotionData dir on a date
+    :return: path or None
+    """
+    row = conn.execute("SELECT path FROM day_files WHERE data_root = ? AND date = ?",
+                       (normalize_path(data_root), to_date_key(date))).fetchone()
+    return row["path"] if row else None
+
+
+def get_day_info(conn, path):
+    """
+    Catalog entry of a day csv as a dict (None if it is not cataloged)
+    The file is read for its stats the first time they are asked for (see refresh_catalog)
+    """
+    row = conn.execute("SELECT * FROM day_files WHERE path = ?", (normalize_path(path),)).fetchone()
+    if row is None:
+        return None
+    info = dict(row)
+    if info["rows"] is None:
+        stats = scan_entry(info["path"], info["date"])
+        if stats is not None:
+            save_stats(conn, [(*stats, info["path"])])
+            info.update(zip(STAT_FIELDS, stats))
+    return info
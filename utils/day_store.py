@@ -0,0 +1,208 @@
+from datetime import date, datetime
+import json
+import os
+from pathlib import Path
+import sys
+
+import numpy as np
+import pandas as pd
+
+# get the project root as the parent of the parent directory of this file
+ROOT_DIR = str(Path(__file__).parent.parent.absolute())
+sys.path.append(ROOT_DIR)
+from utils.data_config import data_paths, spreadsheets
+from utils.envelope import build_pyramid, save_pyramid
+
+"""
+Columnar binary store for the daily MotionData accelerometer CSVs.
+
+Each day file (~1.4M rows at 16 Hz) is parsed once and saved as one .npy file per column:
+    <day_store_root>/<lion_id>/<YYYY-MM-DD>/ts.npy     epoch milliseconds (int64)
+    <day_store_root>/<lion_id>/<YYYY-MM-DD>/x.npy      Acc X [g] (float32)
+    <day_store_root>/<lion_id>/<YYYY-MM-DD>/y.npy      Acc Y [g] (float32)
+    <day_store_root>/<lion_id>/<YYYY-MM-DD>/z.npy      Acc Z [g] (float32)
+    <day_store_root>/<lion_id>/<YYYY-MM-DD>/envelope.npz  min/max/mean pyramid used for wide plots (see envelope.py)
+    <day_store_root>/<lion_id>/<YYYY-MM-DD>/meta.json  source csv path/size/mtime and row count
+The .npy files are memory mapped on load, so readers only page in the rows they touch.
+"""
+
+# column names in the MotionData day csvs (the first line of each file is skipped)
+TIME_COL = "UTC DateTime"
+MS_COL = "Milliseconds"
+ACC_COLS = {"x": "Acc X [g]", "y": "Acc Y [g]", "z": "Acc Z [g]"}
+STORE_COLS = ["ts", "x", "y", "z"]
+
+
+def get_day_csv_path(data_root, day):
+    """
+    Return the path of the MotionData csv for the given day, e.g. <data_root>/2018/03 Mar/10/2018-03-10.csv
+    """
+    csv_folder = day.strftime("%Y/%m %b/%d/")
+    csv_name = day.strftime("%Y-%m-%d.csv")
+    csv_path = os.path.join(data_root, csv_folder, csv_name)
+    return csv_path.replace("\\", "/")      # R does not like backward slashes, convert to forward
+
+
+def get_day_from_csv_path(csv_path):
+    """
+    Day files are named YYYY-MM-DD.csv, return the date of the given file
+    """
+    return datetime.strptime(Path(csv_path).stem, "%Y-%m-%d").date()
+
+
+def get_day_store_dir(lion_id, day):
+    return os.path.join(data_paths["day_store_root"], lion_id, day.strftime("%Y-%m-%d"))
+
+
+def day_start_ms(day):
+    """
+    Epoch milliseconds (UTC) of midnight at the start of the given day
+    """
+    return int(np.datetime64(date(day.year, day.month, day.day), "ms").astype(np.int64))
+
+
+def to_epoch_ms(timestamp):
+    """
+    Convert a naive (UTC) datetime/Timestamp into epoch milliseconds
+    """
+    return int(pd.Timestamp(timestamp).value // 1_000_000)
+
+
+def time_strings_to_ms(times):
+    """
+    Vectorized conversion of HH:MM:SS strings into milliseconds since midnight
+    """
+    return pd.to_timedelta(pd.Series(times, copy=False)).to_numpy().astype(np.int64) // 1_000_000
+
+
+def frame_to_columns(df, day):
+    """
+    Convert a frame read from a day csv into the columnar representation
+    (epoch ms timestamps + float32 acceleration)
+    """
+    ts = day_start_ms(day) + time_strings_to_ms(df[TIME_COL].to_numpy())
+    if MS_COL in df:
+        ts += df[MS_COL].to_numpy(dtype=np.int64)
+    columns = {"ts": ts.astype(np.int64)}
+    for key, col in ACC_COLS.items():
+        columns[key] = df[col].to_numpy(dtype=np.float32)
+    return columns
+
+
+def read_day_csv(csv_path):
+    """
+    Parse a full MotionData day csv into columns
+    """
+    df = pd.read_csv(csv_path, skiprows=1, usecols=[TIME_COL, MS_COL, *ACC_COLS.values()],
+                     dtype={TIME_COL: str, MS_COL: np.int64, **{col: np.float32 for col in ACC_COLS.values()}})
+    return frame_to_columns(df, get_day_from_csv_path(csv_path))
+
+
+def get_source_stats(csv_path):
+    stats = os.stat(csv_path)
+    return {"source": csv_path, "size": stats.st_size, "mtime": stats.st_mtime}
+
+
+def is_day_stored(lion_id, day, csv_path=None):
+    """
+    True if the day is in the store (and, when csv_path is given, the csv has not changed since ingest)
+    """
+    meta_path = os.path.join(get_day_store_dir(lion_id, day), "meta.json")
+    if not os.path.isfile(meta_path):
+        return False
+    if csv_path is None:
+        return True
+    with open(meta_path, "r") as f:
+        meta = json.load(f)
+    stats = get_source_stats(csv_path)
+    return meta["size"] == stats["size"] and meta["mtime"] == stats["mtime"]
+
+
+def ingest_day(lion_id, csv_path, force=False):
+    """
+    Convert a single day csv into the columnar store, skipping days that are already up to date
+    :return: True if the day was (re)written
+    """
+    day = get_day_from_csv_path(csv_path)
+    if not force and is_day_stored(lion_id, day, csv_path):
+        return False
+
+    columns = read_day_csv(csv_path)
+    store_dir = get_day_store_dir(lion_id, day)
+    os.makedirs(store_dir, exist_ok=True)
+    for key in STORE_COLS:
+        np.save(os.path.join(store_dir, f"{key}.npy"), columns[key])
+    save_pyramid(build_pyramid(columns), store_dir)
+
+    # meta is written last so that a partially written day is never treated as stored
+    meta = get_source_stats(csv_path)
+    meta["rows"] = len(columns["ts"])
+    with open(os.path.join(store_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    return True
+
+
+def ingest_collar(lion_id, data_root, force=False):
+    """
+    Ingest every day csv found under a collar's MotionData root
+    :return: number of days written
+    """
+    csv_paths = sorted(Path(data_root).glob("*/* */*/*.csv"))
+    written = 0
+    for csv_path in csv_paths:
+        try:
+            if ingest_day(lion_id, str(csv_path).replace("\\", "/"), force=force):
+                written += 1
+        except Exception as e:
+            print(f"Unable to ingest {csv_path}: {e}")
+    print(f"{lion_id}: ingested {written} of {len(csv_paths)} day files")
+    return written
+
+
+def ingest_all(force=False):
+    """
+    Ingest the MotionData roots of every tab listed in the spreadsheet config
+    """
+    for spreadsheet in spreadsheets.values():
+        for lion_id, data_root in spreadsheet.get("tabs", {}).items():
+            if not os.path.isdir(data_root):
+                print(f"WARNING: Missing data root for {lion_id}: {data_root}")
+                continue
+            ingest_collar(lion_id, data_root, force=force)
+
+
+def load_day(lion_id, day, mmap=True):
+    """
+    Load a stored day as a dict of column arrays (ts, x, y, z)
+    Returns None if the day has not been ingested.
+    """
+    if not is_day_stored(lion_id, day):
+        return None
+    store_dir = get_day_store_dir(lion_id, day)
+    mmap_mode = "r" if mmap else None
+    return {key: np.load(os.path.join(store_dir, f"{key}.npy"), mmap_mode=mmap_mode) for key in STORE_COLS}
+
+
+def load_day_columns(lion_id, csv_path):
+    """
+    Return the columns of a day, from the store if it has been ingested, otherwise by parsing the csv
+    """
+    day = get_day_from_csv_path(csv_path)
+    if is_day_stored(lion_id, day, csv_path):
+        return load_day(lion_id, day)
+    return read_day_csv(csv_path)
+
+
+def columns_to_frame(columns, start=0, stop=None):
+    """
+    Build the frame layout used by the window extraction code from (a slice of) day columns
+    """
+    ts = np.asarray(columns["ts"][start:stop])
+    df = pd.DataFrame({"UTC DateTime": pd.to_datetime(ts, unit="ms")})
+    for key, col in ACC_COLS.items():
+        df[col] = np.asarray(columns[key][start:stop])
+    return df
+
+
+if __name__ == '__main__':
+    ingest_all()
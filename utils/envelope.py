@@ -0,0 +1,118 @@
+import os
+
+import numpy as np
+
+"""
+Multi-resolution min/max/mean envelopes of the accelerometer axes, used to plot wide views.
+
+Level k groups samples into time buckets of BASE_BUCKET_MS * LEVEL_FACTOR**k (1 s, 4 s, 16 s, ...) aligned
+to midnight, so the buckets of consecutive days line up. Each level stores per bucket: start time, sample
+count and the min/max/mean of every axis. Views whose raw samples fit in MAX_RAW_POINTS per axis (the narrow
+labeling views) are drawn from the raw samples. Wider views draw the min/max band of the coarsest level with
+at least one bucket per pixel, which keeps every surge peak visible while plotting a few thousand points
+instead of millions.
+
+The pyramid of each day is saved next to its day store columns (envelope.npz) when the day is ingested.
+"""
+
+AXIS_KEYS = ["x", "y", "z"]
+BASE_BUCKET_MS = 1000
+LEVEL_FACTOR = 4
+NUM_LEVELS = 7      # coarsest level is 4096 s buckets (~21 per day)
+ENVELOPE_FILE = "envelope.npz"
+MAX_RAW_POINTS = 16000  # raw samples drawn per axis before switching to an envelope (~16 min at 16 Hz)
+
+
+def get_bucket_ms(level):
+    return BASE_BUCKET_MS * LEVEL_FACTOR ** level
+
+
+def reduce_buckets(ts, bucket_ms, counts, mins, maxs, sums):
+    """
+    Merge (already sorted) entries into time buckets of bucket_ms
+    :param ts: entry start times (epoch ms)
+    :param counts: samples per entry
+    :param mins/maxs/sums: dicts of per-entry min/max/sum for each axis
+    """
+    ids = ts // bucket_ms
+    starts = np.flatnonzero(np.diff(ids, prepend=-1)) if len(ids) else np.empty(0, dtype=np.int64)
+    if not len(starts):
+        empty = np.empty(0, dtype=np.float32)
+        level = {"ts": np.empty(0, dtype=np.int64), "count": np.empty(0, dtype=np.int64)}
+        level.update({f"{key}_{stat}": empty for key in AXIS_KEYS for stat in ["min", "max", "sum"]})
+        return level
+
+    level = {"ts": ids[starts] * bucket_ms, "count": np.add.reduceat(counts, starts)}
+    for key in AXIS_KEYS:
+        level[f"{key}_min"] = np.minimum.reduceat(mins[key], starts)
+        level[f"{key}_max"] = np.maximum.reduceat(maxs[key], starts)
+        level[f"{key}_sum"] = np.add.reduceat(sums[key], starts)
+    return level
+
+
+def build_pyramid(columns, num_levels=NUM_LEVELS):
+    """
+    Build all envelope levels from raw day columns (ts, x, y, z)
+    :return: list of level dicts, finest first
+    """
+    levels = [build_envelope_window(columns, 0)]
+    for level in range(1, num_levels):
+        prev = levels[-1]
+        levels.append(reduce_buckets(prev["ts"], get_bucket_ms(level), prev["count"],
+                                     {key: prev[f"{key}_min"] for key in AXIS_KEYS},
+                                     {key: prev[f"{key}_max"] for key in AXIS_KEYS},
+                                     {key: prev[f"{key}_sum"] for key in AXIS_KEYS}))
+    return levels
+
+
+def get_means(level, key):
+    return (level[f"{key}_sum"] / np.maximum(level["count"], 1)).astype(np.float32)
+
+
+def save_pyramid(levels, store_dir):
+    arrays = {f"{idx}_{name}": values for idx, level in enumerate(levels) for name, values in level.items()}
+    np.savez(os.path.join(store_dir, ENVELOPE_FILE), **arrays)
+
+
+def load_level(store_dir, level):
+    """
+    Load a single level of the pyramid saved in a day store dir, None if the day has no stored envelope
+    """
+    path = os.path.join(store_dir, ENVELOPE_FILE)
+    if not os.path.isfile(path):
+        return None
+    with np.load(path) as data:
+        prefix = f"{level}_"
+        return {name[len(prefix):]: data[name] for name in data.files if name.startswith(prefix)}
+
+
+def slice_level(level, start_ms, end_ms):
+    lo, hi = np.searchsorted(level["ts"], [start_ms, end_ms], side="left")
+    return {name: values[lo:hi] for name, values in level.items()}
+
+
+def concat_levels(parts):
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+
+def build_envelope_window(columns, level):
+    """
+    Compute a single envelope level directly from raw window columns (when no pyramid is stored)
+    """
+    ts = np.asarray(columns["ts"])
+    raw = {key: np.asarray(columns[key]) for key in AXIS_KEYS}
+    sums = {key: raw[key].astype(np.float64) for key in AXIS_KEYS}
+    return reduce_buckets(ts, get_bucket_ms(level), np.ones(len(ts), dtype=np.int64), raw, raw, sums)
+
+
+def select_level(duration_ms, num_samples, width_px):
+    """
+    Pick the resolution for a plot: None (raw samples) if there are at most MAX_RAW_POINTS of them,
+    otherwise the coarsest envelope level that still has at least one bucket per pixel
+    """
+    if num_samples <= MAX_RAW_POINTS:
+        return None
+    for level in reversed(range(NUM_LEVELS)):
+        if duration_ms / get_bucket_ms(level) >= width_px:
+            return level
+    return 0
@@ -0,0 +1,136 @@
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+import sys
+
+import numpy as np
+import pandas as pd
+
+# get the project root as the parent of the parent directory of this file
+ROOT_DIR = str(Path(__file__).parent.parent.absolute())
+sys.path.append(ROOT_DIR)
+from utils.labeling import (get_config_intervals, get_label_code, paint_intervals, to_ns, DEFAULT_LABEL,
+                            LABEL_INTERVALS)
+
+"""
+Interval index over the labeled events of every animal (all kills of all tabs, plus the InfoPlots markers).
+
+Per animal the events are kept as arrays sorted by start time (int64 ns), next to a running maximum of
+their end times. The events overlapping [start, end] are then found with two binary searches, O(log n)
+plus the number of candidates, however many events an animal has:
+    events with event_start <= end          searchsorted on the sorted starts
+    events with event_end >= start          searchsorted on the running max of the ends (it is sorted too)
+
+Windows are labeled against every event of the animal (label_times), so the overlapping windows of two
+kills on the same day get the same labels. Overlaps between events resolve by LABEL_INTERVALS priority.
+"""
+
+MARKER_CODE = -1        # code of point events (plot markers), never painted onto labels
+MARKER_KEYS = ["marker_1", "marker_2"]
+UNUSED_MARKERS = [0, "0", "Unused", None]
+LABEL_PRIORITY = {get_label_code(label): rank for rank, (label, _, _) in enumerate(LABEL_INTERVALS)}
+
+
+def get_config_events(config):
+    """
+    Events of a config (from create_data_from_row or get_plot_info_entries)
+    :return: list of (lion_id, code, start_ns, end_ns, label, kill_id)
+    """
+    lion_id, kill_id = config['lion_id'], config.get('Kill_ID')
+    events = [(lion_id, code, start, end, None, kill_id) for code, start, end in get_config_intervals(config)]
+    for key in MARKER_KEYS:
+        label = config.get(f"{key}_label")
+        if label in UNUSED_MARKERS or pd.isnull(label):
+            continue
+        time = to_ns(datetime(config['year'], config['month'], config['day'],
+                              config[f"{key}_hour"], config[f"{key}_min"], config[f"{key}_sec"]))
+        events.append((lion_id, MARKER_CODE, time, time, label, kill_id))
+    return events
+
+
+class EventIndex:
+    """
+    Sorted arrays of events per animal, see the module doc
+    """
+    def __init__(self, events=()):
+        self.animals = {}
+        self.add_events(events)
+
+    @classmethod
+    def from_configs(cls, configs):
+        return cls(event for config in configs for event in get_config_events(config))
+
+    def add_configs(self, configs):
+        self.add_events(event for config in configs for event in get_config_events(config))
+
+    def add_events(self, events):
+        """
+        :param events: iterable of (lion_id, code, start_ns, end_ns, label, kill_id)
+        """
+        by_animal = defaultdict(list)
+        for lion_id, *event in events:
+            by_animal[lion_id].append(event)
+        for lion_id, rows in by_animal.items():
+            code, start, end, label, kill_id = zip(*rows)
+            arrays = {
+                "code": np.asarray(code, dtype=np.int64),
+                "start": np.asarray(start, dtype=np.int64),
+                "end": np.asarray(end, dtype=np.int64),
+                "label": np.asarray(label, dtype=object),
+                "kill_id": np.asarray(kill_id, dtype=object),
+            }
+            if lion_id in self.animals:
+                arrays = {key: np.concatenate([self.animals[lion_id][key], values]) for key, values in arrays.items()}
+            order = np.argsort(arrays["start"], kind="stable")
+            arrays = {key: values[order] for key, values in arrays.items()}
+            arrays["max_end"] = np.maximum.accumulate(arrays["end"])
+            self.animals[lion_id] = arrays
+
+    def __len__(self):
+        return sum(len(arrays["start"]) for arrays in self.animals.values())
+
+    def query(self, lion_id, start, end, markers=True):
+        """
+        Events of an animal overlapping [start, end]
+        :param start, end: datetime-like or int64 ns
+        :param markers: include the point events (plot markers)
+        :return: dict of arrays (code, start, end, label, kill_id) sorted by start
+        """
+        arrays = self.animals.get(lion_id)
+        if arrays is None:
+            return {key: np.empty(0, dtype=np.int64 if key in ("code", "start", "end") else object)
+                    for key in ("code", "start", "end", "label", "kill_id")}
+        start, end = to_ns(start), to_ns(end)
+        lo = np.searchsorted(arrays["max_end"], start, side="left")
+        hi = np.searchsorted(arrays["start"], end, side="right")
+        idx = lo + np.flatnonzero(arrays["end"][lo:hi] >= start)
+        if not markers:
+            idx = idx[arrays["code"][idx] != MARKER_CODE]
+        return {key: arrays[key][idx] for key in ("code", "start", "end", "label", "kill_id")}
+
+    def get_events(self, lion_id, start, end):
+        """
+        Events overlapping [start, end] as a list of tuples (for input hashes)
+        """
+        events = self.query(lion_id, start, end)
+        return list(zip(events["code"].tolist(), events["start"].tolist(), events["end"].tolist(),
+                        events["label"].tolist(), events["kill_id"].tolist()))
+
+    def label_times(self, lion_id, times, default_code=None):
+        """
+        Label every sample of a window against every event of the animal
+        :param times: sorted sample timestamps (datetime64 Series/array)
+        :return: int array of behavior codes (see behavior_labels)
+        """
+        if default_code is None:
+            default_code = get_label_code(DEFAULT_LABEL)
+        times = to_ns(times)
+        if not len(times):
+            return np.full(0, default_code, dtype=np.int64)
+        events = self.query(lion_id, times[0], times[-1], markers=False)
+        # highest priority first, as paint_intervals expects
+        rank = np.array([LABEL_PRIORITY.get(code, len(LABEL_PRIORITY)) for code in events["code"].tolist()])
+        order = np.argsort(rank, kind="stable")
+        intervals = list(zip(events["code"][order].tolist(), events["start"][order].tolist(),
+                             events["end"][order].tolist()))
+        return paint_intervals(times, intervals, default_code)
@@ -0,0 +1,326 @@
+from collections.abc import MutableMapping
+from pathlib import Path
+import sys
+
+import numpy as np
+import pandas as pd
+
+# get the project root as the parent of the parent directory of this file
+ROOT_DIR = str(Path(__file__).parent.parent.absolute())
+sys.path.append(ROOT_DIR)
+
+"""
+Columnar table of the events of a spreadsheet (kill tabs or InfoPlots), built in one vectorized pass.
+
+Every time column of data_cols/data_cols_info is combined with 'Start Date' into a typed datetime64 column
+(table.times), whatever the cells hold: datetime.time/datetime objects from Excel, or text such as
+'05:19:42' and '02/23/2020'. The rows are then validated in bulk (table.errors holds the reason a row is
+unusable, table.skipped the kill rows without a StartKill), and the fields of the configs used downstream
+(window_low_min, cons_window_low_hour, df_kill_start, ...) are derived as whole columns.
+
+EventRecord is the config of a single row: a mapping that reads those columns at its row index, with the
+per row fields (Kill_ID, csv_path, ...) and later edits (set_view_fields) kept on the side. It pickles (and
+hashes, see build_cache.hash_inputs) as the plain dict it replaces.
+"""
+
+KILL_TIME_COLS = {
+    "window_start": "Start time",
+    "window_end": "End Time",
+    "stalk_start": "StartStalk",
+    "kill_start": "StartKill",
+    "kill_end": "EndCons",
+    "lib_end": "EndLib",
+    "feed_start": "FeedStart",
+    "feed_stop": "FeedStop",
+}
+INFO_TIME_COLS = {
+    "window_start": "Start time",
+    "window_end": "End time",
+    "marker_1": "MarkerTime1",
+    "marker_2": "MarkerTime2",
+}
+# config field prefix -> event time it is split from (hour/min/sec)
+KILL_TIME_FIELDS = {
+    "cons_window_low": "kill_start",
+    "cons_window_high": "kill_end",
+    "lib_window_low": "kill_start",
+    "lib_window_high": "lib_end",
+    "stalk_start": "stalk_start",
+    "feed_start": "feed_start",
+    "feed_stop": "feed_stop",
+}
+# config field -> event time, as Timestamps (used for behavior classification)
+KILL_TIMESTAMP_FIELDS = {
+    "df_stalk_start": "stalk_start",
+    "df_stalk_end": "kill_start",
+    "df_kill_start": "kill_start",
+    "df_kill_end": "kill_end",
+    "df_feed_start": "feed_start",
+    "df_feed_stop": "feed_stop",
+}
+UNUSED_TIME_FIELDS = ["cons_window_low", "cons_window_high", "lib_window_low", "lib_window_high", "stalk_start",
+                      "feed_start", "feed_stop"]
+MARKER_FIELDS = ["marker_1", "marker_2"]
+UNUSED_MARKER_LABEL = "Unused"
+# HH:MM[:SS[.fff]] at the end of the text of a cell: time objects, datetimes and typed in text alike
+TIME_PATTERN = r"(\d{1,2}):(\d{2})(?::(\d{2}))?(?:\.\d+)?$"
+
+
+def parse_dates(values):
+    """
+    Dates (datetime64, midnight) of a column of datetimes or date text, NaT where there is none
+    """
+    values = pd.Series(values).reset_index(drop=True)
+    if not pd.api.types.is_datetime64_any_dtype(values):
+        values = pd.to_datetime(values.astype(object), errors="coerce", format="mixed")
+    return values.dt.normalize()
+
+
+def parse_time_offsets(values):
+    """
+    Time of day of a column of times, datetimes or time text, as a timedelta64 column (seconds resolution)
+    :return: (offsets with NaT where there is no usable time, bool array of the empty cells)
+    """
+    values = pd.Series(values).reset_index(drop=True)
+    missing = values.isnull().to_numpy()
+    if pd.api.types.is_datetime64_any_dtype(values):
+        seconds = (values.dt.hour * 3600 + values.dt.minute * 60 + values.dt.second).astype(np.float64)
+    else:
+        parts = values.astype(str).str.extract(TIME_PATTERN).astype(np.float64)
+        hours, minutes, secs = parts[0], parts[1], parts[2].fillna(0)
+        seconds = hours * 3600 + minutes * 60 + secs
+        seconds[(hours > 23) | (minutes > 59) | (secs > 59)] = np.nan
+    seconds[missing] = np.nan
+    return pd.to_timedelta(seconds, unit="s"), missing
+
+
+def read_times(df, time_cols):
+    """
+    Typed event times of a spreadsheet frame: 'Start Date' combined with every time column
+    :param time_cols: dict of event name -> spreadsheet column
+    :return: (dict of name -> datetime64 column (plus 'date'), dict of name -> bool array of the empty cells)
+    """
+    times = {"date": parse_dates(df["Start Date"])}
+    missing = {"date": times["date"].isnull().to_numpy()}
+    for name, column in time_cols.items():
+        offsets, missing[name] = parse_time_offsets(df[column])
+        times[name] = times["date"] + offsets
+    return times, missing
+
+
+def split_time(times):
+    """
+    Hour, minute and second int arrays of a datetime64 column (0 where NaT)
+    """
+    return [field.fillna(0).to_numpy(dtype=np.int64) for field in (times.dt.hour, times.dt.minute, times.dt.second)]
+
+
+def get_row_errors(n, checks):
+    """
+    Reason every row is unusable, from the first of the checks it fails
+    :param checks: list of (bool array of the failing rows, reason)
+    :return: dict of row position -> reason
+    """
+    reasons = np.full(n, None, dtype=object)
+    for failed, reason in checks:
+        reasons[np.asarray(failed) & (reasons == None)] = reason      # noqa: E711, elementwise
+    return {int(row): reasons[row] for row in np.flatnonzero(reasons != None)}      # noqa: E711
+
+
+def check_time(times, missing, name, column):
+    """
+    (failing rows, reason) checks of a required time column: empty, or not a time
+    """
+    unusable = times[name].isnull().to_numpy()
+    return [(missing[name], f"missing {column}"), (unusable & ~missing[name], f"{column} is not a time")]
+
+
+class EventTable:
+    """
+    Spreadsheet rows as columns, see the module doc
+    :param times: typed datetime64 columns (not config fields)
+    :param columns: config fields that differ per row, as numpy arrays
+    :param constants: config fields shared by every row
+    """
+    def __init__(self, times, columns, constants=None, errors=None, skipped=None):
+        self.times = times
+        self.columns = columns
+        self.constants = constants or {}
+        self.errors = errors or {}
+        self.skipped = np.zeros(len(self), dtype=bool) if skipped is None else skipped
+
+    def __len__(self):
+        return len(self.times["date"])
+
+    @property
+    def valid(self):
+        valid = ~self.skipped
+        valid[list(self.errors)] = False
+        return valid
+
+    def record(self, index, **fields):
+        """
+        Config of a row, with its per row fields
+        """
+        return EventRecord(self, index, fields)
+
+
+class EventRecord(MutableMapping):
+    """
+    Config of a single row of an EventTable: reads the table columns at its index, fields set on the
+    record (per row fields, per view edits) are kept apart and take precedence
+    """
+    __slots__ = ("table", "index", "fields")
+
+    def __init__(self, table, index, fields=None):
+        self.table = table
+        self.index = index
+        self.fields = {} if fields is None else fields
+
+    def __getitem__(self, key):
+        if key in self.fields:
+            return self.fields[key]
+        if key in self.table.columns:
+            value = self.table.columns[key][self.index]
+            # numpy scalars as python values, so formats and hashes are those of the former dicts
+            return value.item() if isinstance(value, np.generic) else value
+        return self.table.constants[key]
+
+    def __setitem__(self, key, value):
+        self.fields[key] = value
+
+    def __delitem__(self, key):
+        if key not in self.fields:
+            raise KeyError(f"{key} is a table column, it can only be overwritten")
+        del self.fields[key]
+
+    def __iter__(self):
+        yield from self.table.columns
+        yield from (key for key in self.table.constants if key not in self.table.columns)
+        yield from (key for key in self.fields if key not in self.table.columns and key not in self.table.constants)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __contains__(self, key):
+        return key in self.fields or key in self.table.columns or key in self.table.constants
+
+    def __reduce__(self):
+        # a plain dict across processes, not the whole table
+        return dict, (dict(self),)
+
+    def __repr__(self):
+        return f"EventRecord({dict(self)!r})"
+
+    def copy(self):
+        return dict(self)
+
+
+def get_lion_ids(df):
+    """
+    lion ids (Sex + AnimalID) of a spreadsheet frame, None where the AnimalID is not a number
+    """
+    animal_ids = pd.to_numeric(df["AnimalID"], errors="coerce").to_numpy()
+    sexes = df["Sex"].astype(str).to_numpy()
+    lion_ids = np.full(len(df), None, dtype=object)
+    known = ~np.isnan(animal_ids)
+    lion_ids[known] = [f"{sex}{animal_id}" for sex, animal_id in zip(sexes[known], animal_ids[known].astype(np.int64))]
+    return lion_ids
+
+
+def get_window_columns(times):
+    """
+    Plot window fields shared by kills and info plots (window_low_min, window_high_min, year, month, day, hour)
+    """
+    hour, window_low_min, _ = split_time(times["window_start"])
+    _, window_high_min, _ = split_time(times["window_end"])
+    dates = times["date"]
+    return {
+        "window_low_min": window_low_min,
+        "window_high_min": np.maximum(window_low_min + 1, window_high_min),  # ensure the window is at least 1 minute
+        "year": dates.dt.year.fillna(0).to_numpy(dtype=np.int64),
+        "month": dates.dt.month.fillna(0).to_numpy(dtype=np.int64),
+        "day": dates.dt.day.fillna(0).to_numpy(dtype=np.int64),
+        "hour": hour,
+    }
+
+
+def get_plot_dates(times, columns):
+    """
+    Start of the plot window of every row (date, hour and window_low_min), as datetime64
+    """
+    return times["date"] + pd.to_timedelta(columns["hour"] * 60 + columns["window_low_min"], unit="m")
+
+
+def build_kill_table(df):
+    """
+    Event table of the Kill rows of the kill tabs (data_cols plus data_root)
+    Rows without a StartKill are skipped, rows with a missing/invalid id or event time are errors.
+    """
+    n = len(df)
+    times, missing = read_times(df, KILL_TIME_COLS)
+    lion_ids = get_lion_ids(df)
+    kill_ids = pd.to_numeric(df["Kill_ID"], errors="coerce").to_numpy(dtype=np.float64)
+
+    # the window has to be readable to tell a kill without StartKill (skipped) from a broken row
+    window_checks = (check_time(times, missing, "window_start", KILL_TIME_COLS["window_start"])
+                     + check_time(times, missing, "window_end", KILL_TIME_COLS["window_end"]))
+    window_errors = get_row_errors(n, window_checks)
+    skipped = missing["kill_start"].copy()
+    skipped[list(window_errors)] = False
+
+    checks = window_checks + [(missing["date"], "missing Start Date"), (lion_ids == None, "missing AnimalID"),  # noqa: E711
+                              (np.isnan(kill_ids), "missing Kill_ID")]
+    for name, column in KILL_TIME_COLS.items():
+        checks += check_time(times, missing, name, column)
+    errors = get_row_errors(n, [(failed & ~skipped, reason) for failed, reason in checks])
+
+    columns = {"lion_name": lion_ids, "lion_id": lion_ids}
+    columns.update(get_window_columns(times))
+    for prefix, name in KILL_TIME_FIELDS.items():
+        columns[f"{prefix}_hour"], columns[f"{prefix}_min"], columns[f"{prefix}_sec"] = split_time(times[name])
+    columns["Kill_ID"] = np.nan_to_num(kill_ids).astype(np.int64)
+    columns["data_root"] = df["data_root"].to_numpy(dtype=object)
+    # datetime64[us] converts to python datetimes
+    columns["ts_kill_start"] = times["kill_start"].to_numpy().astype("datetime64[us]").astype(object)
+    for field, name in KILL_TIMESTAMP_FIELDS.items():
+        columns[field] = times[name].array
+
+    times["plot_date"] = get_plot_dates(times, columns)
+    constants = {f"{marker}_{unit}": 0 for marker in MARKER_FIELDS for unit in ("hour", "min", "sec", "label")}
+    constants["is_sixhour"] = "FALSE"
+    return EventTable(times, columns, constants, errors, skipped)
+
+
+def build_info_table(df):
+    """
+    Event table of the InfoPlots tab (data_cols_info): plot windows with up to two markers each
+    Empty markers are unused, rows with a missing/invalid window, id or marker time are errors.
+    """
+    n = len(df)
+    times, missing = read_times(df, INFO_TIME_COLS)
+    lion_ids = get_lion_ids(df)
+
+    checks = [(missing["date"], "missing Start Date"), (lion_ids == None, "missing AnimalID")]  # noqa: E711
+    checks += check_time(times, missing, "window_start", INFO_TIME_COLS["window_start"])
+    checks += check_time(times, missing, "window_end", INFO_TIME_COLS["window_end"])
+    for marker in MARKER_FIELDS:
+        # an empty marker is fine, text that is not a time is not
+        checks += check_time(times, missing, marker, INFO_TIME_COLS[marker])[1:]
+    errors = get_row_errors(n, checks)
+
+    columns = {"lion_name": lion_ids, "lion_id": lion_ids}
+    columns.update(get_window_columns(times))
+    for index, marker in enumerate(MARKER_FIELDS, start=1):
+        columns[f"{marker}_hour"], columns[f"{marker}_min"], columns[f"{marker}_sec"] = split_time(times[marker])
+        labels = df[f"MarkerLabel{index}"].to_numpy(dtype=object).copy()
+        labels[missing[marker]] = UNUSED_MARKER_LABEL
+        columns[f"{marker}_label"] = labels
+    # the raw id (may be a float), it is only part of the plot names
+    columns["Kill_ID"] = df["Kill_ID"].to_numpy(dtype=object)
+
+    times["plot_date"] = get_plot_dates(times, columns)
+    constants = {f"{prefix}_{unit}": 0 for prefix in UNUSED_TIME_FIELDS for unit in ("hour", "min", "sec")}
+    constants["info_view"] = True
+    constants["is_sixhour"] = "FALSE"
+    return EventTable(times, columns, constants, errors)
@@ -0,0 +1,105 @@
+from pathlib import Path
+import sys
+
+import numpy as np
+
+# get the project root as the parent of the parent directory of this file
+ROOT_DIR = str(Path(__file__).parent.parent.absolute())
+sys.path.append(ROOT_DIR)
+from utils.data_config import constants
+from utils.day_store import STORE_COLS
+
+"""
+Derived acceleration channels used to describe activity (dynamic body acceleration).
+
+    static      running mean of each axis over STATIC_WINDOW_SECS (gravity / posture component)
+    dynamic     raw - static (movement component)
+    ODBA        overall dynamic body acceleration, |dx| + |dy| + |dz|
+    VeDBA       vectorial dynamic body acceleration, sqrt(dx^2 + dy^2 + dz^2)
+
+ODBA and VeDBA can be smoothed with a second running mean (DBA_SMOOTH_SECS, 0 = no smoothing).
+Running means are computed with cumulative sums over whole arrays; at the edges the mean is taken over the
+samples that are available, so read a little past the window (get_feature_padding) for exact values.
+Channels are named the way they are written to the labeled windows and BEBE clips (constants FEATURE_CHANNELS).
+"""
+
+AXIS_KEYS = STORE_COLS[1:]
+FEATURE_CHANNELS = ["StaticX", "StaticY", "StaticZ", "DynamicX", "DynamicY", "DynamicZ", "ODBA", "VeDBA"]
+
+
+def running_mean(values, window_samples):
+    """
+    Centered running mean over window_samples samples, normalized by the number of samples present at the edges
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if window_samples <= 1 or not len(values):
+        return values
+    cumsum = np.concatenate([[0.0], np.cumsum(values)])
+    idx = np.arange(len(values))
+    lo = np.clip(idx - window_samples // 2, 0, len(values))
+    hi = np.clip(idx - window_samples // 2 + window_samples, 0, len(values))
+    return (cumsum[hi] - cumsum[lo]) / (hi - lo)
+
+
+def get_window_samples(secs, sample_rate):
+    return max(1, int(round(secs * sample_rate)))
+
+
+def get_feature_padding(static_window_secs=None, smooth_window_secs=None):
+    """
+    Seconds to read on either side of a window so that the running means at its edges are exact
+    """
+    if static_window_secs is None:
+        static_window_secs = constants["STATIC_WINDOW_SECS"]
+    if smooth_window_secs is None:
+        smooth_window_secs = constants["DBA_SMOOTH_SECS"]
+    return (static_window_secs + smooth_window_secs) / 2 + 1
+
+
+def compute_features(columns, sample_rate, static_window_secs=None, smooth_window_secs=None):
+    """
+    Compute all derived channels for (a window or a day of) raw columns
+    :param columns: dict of column arrays (ts, x, y, z), at sample_rate Hz
+    :return: dict of channel name -> float32 array
+    """
+    if static_window_secs is None:
+        static_window_secs = constants["STATIC_WINDOW_SECS"]
+    if smooth_window_secs is None:
+        smooth_window_secs = constants["DBA_SMOOTH_SECS"]
+
+    static_samples = get_window_samples(static_window_secs, sample_rate)
+    features = {}
+    dynamic = {}
+    for key in AXIS_KEYS:
+        raw = np.asarray(columns[key], dtype=np.float64)
+        static = running_mean(raw, static_samples)
+        dynamic[key] = raw - static
+        features[f"Static{key.upper()}"] = static
+        features[f"Dynamic{key.upper()}"] = dynamic[key]
+
+    odba = np.abs(dynamic["x"]) + np.abs(dynamic["y"]) + np.abs(dynamic["z"])
+    vedba = np.sqrt(dynamic["x"] ** 2 + dynamic["y"] ** 2 + dynamic["z"] ** 2)
+    if smooth_window_secs:
+        smooth_samples = get_window_samples(smooth_window_secs, sample_rate)
+        odba = running_mean(odba, smooth_samples)
+        vedba = running_mean(vedba, smooth_samples)
+    features["ODBA"] = odba
+    features["VeDBA"] = vedba
+    return {name: values.astype(np.float32) for name, values in features.items()}
+
+
+def add_feature_columns(columns, sample_rate, channels=None):
+    """
+    Return a copy of the columns with the requested derived channels added
+    :param channels: channel names (see FEATURE_CHANNELS), defaults to constants FEATURE_CHANNELS
+    """
+    if channels is None:
+        channels = constants["FEATURE_CHANNELS"]
+    unknown = [channel for channel in channels if channel not in FEATURE_CHANNELS]
+    if unknown:
+        raise ValueError(f"Unknown feature channels {unknown}, expected any of {', '.join(FEATURE_CHANNELS)}")
+    columns = dict(columns)
+    if channels:
+        features = compute_features(columns, sample_rate)
+        columns.update({channel: features[channel] for channel in channels})
+    return columns
@@ -0,0 +1,97 @@
+from pathlib import Path
+import sys
+
+import numpy as np
+import pandas as pd
+
+# get the project root as the parent of the parent directory of this file
+ROOT_DIR = str(Path(__file__).parent.parent.absolute())
+sys.path.append(ROOT_DIR)
+from utils.data_config import behavior_labels
+
+"""
+Vectorized behavior labeling.
+
+Instead of checking every sample against every window, each labeled interval [start, end) is
+located on the (sorted) time axis with a binary search and painted onto an integer label array.
+Intervals are painted from lowest to highest priority so that overlaps resolve the same way the
+old row-wise if/elif chain did (STALK before KILL before FEED).
+"""
+
+DEFAULT_LABEL = "NON_KILL"
+
+# (label, config key of interval start, config key of interval end), highest priority first
+LABEL_INTERVALS = [
+    ("STALK", "df_stalk_start", "df_kill_start"),
+    ("KILL", "df_kill_start", "df_kill_end"),
+    ("FEED", "df_feed_start", "df_feed_stop"),
+]
+
+
+def get_label_code(label):
+    """
+    Integer code of a label (index into behavior_labels), 0 (unknown) if not found
+    """
+    try:
+        return behavior_labels.index(label)
+    except ValueError:
+        return 0
+
+
+def to_ns(times):
+    """
+    Convert datetime-like values (Series, array or scalar) to int64 nanoseconds
+    """
+    if np.isscalar(times) or isinstance(times, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(times).value
+    return np.asarray(times, dtype="datetime64[ns]").view(np.int64)
+
+
+def paint_intervals(times, intervals, default_code):
+    """
+    Paint labeled intervals onto a sorted time axis
+    :param times: sorted int64 timestamps
+    :param intervals: list of (code, start, end) in priority order (highest first), same units as times
+    :param default_code: code given to samples outside all intervals
+    :return: int array of label codes, one per sample
+    """
+    labels = np.full(len(times), default_code, dtype=np.int64)
+    for code, start, end in reversed(intervals):
+        lo, hi = np.searchsorted(times, [start, end], side="left")
+        if lo < hi:
+            labels[lo:hi] = code
+    return labels
+
+
+def get_config_intervals(config):
+    """
+    Build the (code, start_ns, end_ns) intervals for a kill config, skipping unset (NaT) times
+    """
+    intervals = []
+    for label, start_key, end_key in LABEL_INTERVALS:
+        start, end = config.get(start_key), config.get(end_key)
+        if pd.isnull(start) or pd.isnull(end):
+            continue
+        intervals.append((get_label_code(label), to_ns(start), to_ns(end)))
+    return intervals
+
+
+def label_window(times, config, event_index=None):
+    """
+    Label every sample in a window using the start/end windows set in the ODBA spreadsheet.
+    :param times: sorted sample timestamps (datetime64 Series/array)
+    :param config: kill config from create_data_from_row
+    :param event_index: EventIndex of all kills (see event_index.py), when given the samples are labeled against
+                        every event of the animal instead of only the windows of this config
+    :return: int array of behavior codes (see behavior_labels)
+    """
+    if event_index is not None:
+        return event_index.label_times(config['lion_id'], times, get_label_code(DEFAULT_LABEL))
+    return paint_intervals(to_ns(times), get_config_intervals(config), get_label_code(DEFAULT_LABEL))
+
+
+def codes_to_names(codes):
+    """
+    Convert an array of label codes back to label names
+    """
+    return np.asarray(behavior_labels, dtype=object)[codes]
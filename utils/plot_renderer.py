@@ -0,0 +1,279 @@
+from collections import defaultdict
+import concurrent.futures
+from datetime import datetime, timedelta
+import os
+from pathlib import Path
+import sys
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.dates as mdates
+from matplotlib import pyplot as plt
+import numpy as np
+
+# get the project root as the parent of the parent directory of this file
+ROOT_DIR = str(Path(__file__).parent.parent.absolute())
+sys.path.append(ROOT_DIR)
+from utils.data_config import plot_lines, view_configs
+from utils.day_store import get_day_from_csv_path, get_day_store_dir, is_day_stored, to_epoch_ms
+from utils.envelope import (build_envelope_window, concat_levels, get_means, load_level, select_level,
+                            slice_level)
+from utils.event_index import MARKER_CODE
+from utils.labeling import get_label_code, to_ns
+from utils.run_report import get_total_size, run_job
+from utils.window_reader import get_window_csv_paths, read_window
+
+"""
+In-process alternative to the generated R scripts (rcode/template.r).
+
+Kill configs are grouped by the day file they came from. Each group reads the span covering every
+view of every kill in it once, then slices each view out of that shared array and renders it with
+matplotlib, using the same panels, colors and plot_lines markers as the R template. Views with more raw
+samples than envelope.MAX_RAW_POINTS are drawn from min/max envelopes at their plot_width_px (see envelope.py).
+"""
+
+R_ACCEL_SCALE = 64 / 1000       # same scaling the R template applies to the raw accelerometer values
+AXES = [("x", "Xg", "red"), ("y", "Yg", "black"), ("z", "Zg", "blue")]
+Y_LIMITS = (-0.3, 0.3)
+LINESTYLES = {"solid": "-", "dashed": "--", "dotted": ":", "dotdash": "-."}
+PLOT_DPI = 100
+PLOT_HEIGHT_IN = 7              # the width comes from the view's plot_width_px
+
+
+def get_window_times(config):
+    """
+    Start/end of the original (spreadsheet) window of a config
+    """
+    window_low = datetime(config['year'], config['month'], config['day'], config['hour'], config['window_low_min'])
+    window_high = window_low + timedelta(minutes=config['window_high_min'] - config['window_low_min'])
+    return window_low, window_high
+
+
+def get_view_span(config, view):
+    """
+    Start/end of the data plotted for a view of a config
+    """
+    window_low, window_high = get_window_times(config)
+    return window_low - timedelta(minutes=view["window_pre_mins"]), window_high + timedelta(minutes=view["window_post_mins"])
+
+
+def get_marker_times(config):
+    """
+    Times of the values referenced by plot_lines (same names as the variables in the R template)
+    """
+    def config_time(prefix):
+        return datetime(config['year'], config['month'], config['day'],
+                        config[f"{prefix}_hour"], config[f"{prefix}_min"], config[f"{prefix}_sec"])
+
+    window_low, window_high = get_window_times(config)
+    return {
+        "window_low": window_low,
+        "window_high": window_high,
+        "cons_window_low": config_time("cons_window_low"),
+        "cons_window_high": config_time("cons_window_high"),
+        "lib_window_high": config_time("lib_window_high"),
+        "stalk_window_start": config_time("stalk_start"),
+        "feed_window_start": config_time("feed_start"),
+        "feed_window_stop": config_time("feed_stop"),
+        "marker_1": config_time("marker_1"),
+        "marker_2": config_time("marker_2"),
+    }
+
+
+def load_envelope_window(lion_id, data_root, start, end, level):
+    """
+    Stitch a level of the stored envelope pyramids of every day overlapping [start, end]
+    Returns None if any of those days has no stored envelope.
+    """
+    start_ms, end_ms = to_epoch_ms(start), to_epoch_ms(end)
+    parts = []
+    for csv_path in get_window_csv_paths(data_root, start, end):
+        day = get_day_from_csv_path(csv_path)
+        if not is_day_stored(lion_id, day, csv_path):
+            return None
+        day_level = load_level(get_day_store_dir(lion_id, day), level)
+        if day_level is None:
+            return None
+        parts.append(slice_level(day_level, start_ms, end_ms))
+    return concat_levels(parts) if parts else None
+
+
+def get_plot_path(config, view_name):
+    return f"{config['lion_plot_path']}_{view_name}_{config['Kill_ID']}.png"
+
+
+def get_view_markers(event_index, config, view_start, view_end):
+    """
+    Kill starts and InfoPlots markers of the animal inside a view, from the event index
+    :return: (kill start times, list of (marker time, label))
+    """
+    events = event_index.query(config['lion_id'], view_start, view_end)
+    in_view = events["start"] >= to_ns(view_start)
+    kills = in_view & (events["code"] == get_label_code("KILL"))
+    markers = in_view & (events["code"] == MARKER_CODE)
+    return (events["start"][kills].astype("datetime64[ns]"),
+            list(zip(events["start"][markers].astype("datetime64[ns]"), events["label"][markers])))
+
+
+def render_view(columns, config, view_name, view, line_key="default", event_index=None):
+    """
+    Render a single view of a config from (a superset of) its data
+    :param columns: dict of column arrays (ts, x, y, z) covering at least the view span
+    :param event_index: EventIndex of all kills/markers, the sixhour view then marks every kill start
+                        (and InfoPlots marker) of the animal in its span instead of only this kill's
+    """
+    view_start, view_end = get_view_span(config, view)
+    start_ms, end_ms = to_epoch_ms(view_start), to_epoch_ms(view_end)
+    lo, hi = np.searchsorted(columns["ts"], [start_ms, end_ms], side="left")
+
+    # wide views are drawn from a min/max envelope with at least one bucket per pixel
+    level = select_level(end_ms - start_ms, hi - lo, view["plot_width_px"])
+    envelope = None
+    if level is not None:
+        envelope = load_envelope_window(config['lion_id'], config['data_root'], view_start, view_end, level)
+        if envelope is None:
+            envelope = build_envelope_window({key: columns[key][lo:hi] for key in columns}, level)
+
+    fig, axes = plt.subplots(len(AXES), 1, sharex=True, figsize=(view["plot_width_px"] / PLOT_DPI, PLOT_HEIGHT_IN),
+                             dpi=PLOT_DPI)
+    for ax, (key, label, color) in zip(axes, AXES):
+        if envelope is None:
+            times = columns["ts"][lo:hi].astype("datetime64[ms]")
+            ax.plot(times, np.asarray(columns[key][lo:hi]) * R_ACCEL_SCALE, color=color, linewidth=0.6, label=label)
+        else:
+            times = envelope["ts"].astype("datetime64[ms]")
+            ax.fill_between(times, envelope[f"{key}_min"] * R_ACCEL_SCALE, envelope[f"{key}_max"] * R_ACCEL_SCALE,
+                            color=color, alpha=0.5, linewidth=0, step="post")
+            ax.plot(times, get_means(envelope, key) * R_ACCEL_SCALE, color=color, linewidth=0.6, label=label,
+                    drawstyle="steps-post")
+        ax.set_ylim(*Y_LIMITS)
+        ax.set_title(label, fontsize=9)
+        ax.grid(which="major", color="darkgray", linewidth=0.4)
+        ax.grid(which="minor", color="lightgray", linewidth=0.2)
+
+    marker_times = get_marker_times(config)
+    handles = {}
+    if view_name == "sixhour":
+        kill_starts, markers = [marker_times["cons_window_low"]], []
+        if event_index is not None:
+            kill_starts, markers = get_view_markers(event_index, config, view_start, view_end)
+        for ax in axes:
+            handles["Kill Start"] = ax.scatter(kill_starts, [Y_LIMITS[0]] * len(kill_starts), marker="x",
+                                               color="orange", s=60, label="Kill Start")
+            for time, label in markers:
+                handles["Marker"] = ax.axvline(time, color="gray", linestyle=":", label="Marker")
+                ax.annotate(label, (time, Y_LIMITS[1]), fontsize=6, rotation=90, va="top")
+    else:
+        for line_dict in plot_lines[line_key]:
+            for value in line_dict["value"].split(","):
+                for ax in axes:
+                    handles[line_dict["label"]] = ax.axvline(marker_times[value.strip()], color=line_dict["color"],
+                                                             alpha=float(line_dict["alpha"]),
+                                                             linestyle=LINESTYLES.get(line_dict["linetype"], "-"),
+                                                             label=line_dict["label"])
+
+    minor_interval = view["minor_tick_interval"]
+    axes[-1].xaxis.set_minor_locator(mdates.SecondLocator(interval=minor_interval) if minor_interval < 60
+                                     else mdates.MinuteLocator(interval=max(1, minor_interval // 60)))
+    major_locator = mdates.AutoDateLocator()
+    axes[-1].xaxis.set_major_locator(major_locator)
+    axes[-1].xaxis.set_major_formatter(mdates.ConciseDateFormatter(major_locator))
+    axes[-1].set_xlim(view_start, view_end)
+    axes[-1].set_xlabel("Time")
+    axes[len(AXES) // 2].set_ylabel("Acceleration (g's)")
+    fig.suptitle(view_name.title())
+    if handles:
+        fig.legend(handles.values(), handles.keys(), loc="center right", title="Surge Windows", fontsize=8)
+        fig.subplots_adjust(right=0.78)
+
+    plot_path = get_plot_path(config, view_name)
+    fig.savefig(plot_path)
+    plt.close(fig)
+    return plot_path
+
+
+def render_day_group(configs, views=None, skip_plots=None, event_index=None):
+    """
+    Render every view of every config in a group that shares a source day file, reading the data once
+    :param skip_plots: plot paths that are already up to date and are not rendered again
+    :param event_index: EventIndex the sixhour markers are taken from
+    :return: list of generated plot paths
+    """
+    if views is None:
+        views = view_configs
+    if skip_plots is None:
+        skip_plots = set()
+    todo = [(config, view_name, view) for config in configs for view_name, view in views.items()
+            if get_plot_path(config, view_name) not in skip_plots]
+    if not todo:
+        return []
+    spans = [get_view_span(config, view) for config, _, view in todo]
+    group_start = min(span[0] for span in spans)
+    group_end = max(span[1] for span in spans)
+    first = configs[0]
+    columns = read_window(first['data_root'], group_start, group_end, lion_id=first['lion_id'])
+
+    plot_paths = []
+    for config, view_name, view in todo:
+        try:
+            plot_paths.append(render_view(columns, config, view_name, view, event_index=event_index))
+        except Exception as e:
+            print(f"Unable to render {view_name} for {config['lion_id']} kill {config['Kill_ID']}: {e}")
+    return plot_paths
+
+
+def group_configs_by_day(configs):
+    """
+    Group kill configs by the day csv they were read from
+    """
+    groups = defaultdict(list)
+    for config in configs:
+        groups[config['csv_path']].append(config)
+    return groups
+
+
+def render_configs(configs, max_workers=1, views=None, skip_plots=None, event_index=None, on_done=None, jobs=None):
+    """
+    Render all views for all configs, one task per source day file
+    :param skip_plots: plot paths that are already up to date and are not rendered again
+    :param event_index: EventIndex the sixhour markers are taken from
+    :param on_done: called with the plot paths of every day file as soon as they are rendered
+    :param jobs: if given, filled with the run report entry of every day file (see run_report.py)
+    :return: list of generated plot paths
+    """
+    groups = group_configs_by_day(configs)
+    print(f"Rendering {len(configs)} kills from {len(groups)} day files")
+    plot_paths = []
+
+    def group_done(entry, group_paths):
+        if jobs is not None:
+            jobs.append(entry)
+        if entry["status"] != "ok":
+            print(f"Error occurred: {entry['error']}")
+            return
+        entry["output_bytes"] = get_total_size(group_paths)
+        plot_paths.extend(group_paths)
+        if on_done is not None:
+            on_done(group_paths)
+
+    def job_args(csv_path, group):
+        return dict(name=os.path.basename(csv_path), kind="python_render", input_paths=[csv_path],
+                    lion_id=group[0]['lion_id'])
+
+    if max_workers <= 1:
+        for csv_path, group in groups.items():
+            group_done(*run_job(render_day_group, group, views, skip_plots, event_index, **job_args(csv_path, group)))
+        return plot_paths
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(run_job, render_day_group, group, views, skip_plots, event_index,
+                                   **job_args(csv_path, group))
+                   for csv_path, group in groups.items()]
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                entry, group_paths = future.result()
+            except Exception as e:
+                print(f"Error occurred: {e}")
+                continue
+            group_done(entry, group_paths)
+    return plot_paths
@@ -0,0 +1,142 @@
+import os
+from pathlib import Path
+import sys
+
+import numpy as np
+
+# get the project root as the parent of the parent directory of this file
+ROOT_DIR = str(Path(__file__).parent.parent.absolute())
+sys.path.append(ROOT_DIR)
+from utils.data_config import constants
+from utils.day_store import (day_start_ms, get_day_from_csv_path, get_day_store_dir, get_source_stats,
+                             load_day_columns, read_day_csv, to_epoch_ms, STORE_COLS)
+from utils.window_reader import get_lion_id_for_root, get_window_csv_paths, slice_columns
+
+"""
+Reduce the collar sample rate (INPUT_SAMPLE_RATE) to OUTPUT_SAMPLE_RATE on a time grid.
+
+Output samples are buckets of 1/OUTPUT_SAMPLE_RATE seconds aligned to midnight, so samples dropped by the
+collar shorten a bucket instead of shifting every following one, and the grids of consecutive days line up.
+Each output sample is stamped with the start of its bucket. Aggregators:
+    mean        average of the samples in the bucket
+    std         standard deviation of the samples in the bucket
+    max_abs     largest absolute value in the bucket
+    decimate    anti-aliasing low pass (Butterworth, zero phase) then the first sample of each bucket
+
+A whole day is resampled at a time and cached in the day store dir of the lion
+(resampled_<rate>hz_<aggregator>.npz), so windows of other kills on the same day, and later runs at the
+same rate, only slice the cached arrays.
+"""
+
+AGGREGATORS = ["mean", "std", "max_abs", "decimate"]
+ANTI_ALIAS_ORDER = 8
+ANTI_ALIAS_CUTOFF = 0.8     # fraction of the output Nyquist frequency kept by the decimation filter
+
+
+def get_bucket_ids(ts, day_ms, output_sr):
+    """
+    Index of the output sample (time bucket since midnight) of each input sample
+    """
+    return (np.asarray(ts, dtype=np.int64) - day_ms) * output_sr // 1000
+
+
+def get_segments(ts, input_sr):
+    """
+    Split points of the contiguous runs of samples (gaps of more than two sample periods start a new run)
+    """
+    max_gap_ms = 2 * 1000 / input_sr
+    return np.flatnonzero(np.diff(ts) > max_gap_ms) + 1
+
+
+def anti_alias(values, ts, input_sr, output_sr):
+    """
+    Zero phase low pass of each contiguous run, runs too short for the filter are left as they are
+    """
+    from scipy import signal
+
+    sos = signal.butter(ANTI_ALIAS_ORDER, ANTI_ALIAS_CUTOFF * output_sr / 2, fs=input_sr, output="sos")
+    filtered = np.asarray(values, dtype=np.float64).copy()
+    for segment in np.split(np.arange(len(ts)), get_segments(ts, input_sr)):
+        # sosfiltfilt pads the input by this many samples on each side
+        if len(segment) > 3 * (2 * len(sos) + 1):
+            filtered[segment] = signal.sosfiltfilt(sos, filtered[segment])
+    return filtered
+
+
+def resample_columns(columns, day_ms, input_sr, output_sr, aggregator="mean"):
+    """
+    Resample day (or window) columns onto the output time grid
+    :param columns: dict of column arrays (ts, x, y, z and any derived channels), sorted by time
+    :param day_ms: epoch ms of midnight, the origin of the grid
+    :return: dict of the same column arrays, one row per non-empty bucket
+    """
+    if aggregator not in AGGREGATORS:
+        raise ValueError(f"Unknown resample aggregator {aggregator}, expected one of {', '.join(AGGREGATORS)}")
+    ts = np.asarray(columns["ts"], dtype=np.int64)
+    if not len(ts):
+        return {key: np.asarray(columns[key]) for key in columns}
+
+    ids = get_bucket_ids(ts, day_ms, output_sr)
+    starts = np.flatnonzero(np.diff(ids, prepend=ids[0] - 1))
+    counts = np.diff(np.append(starts, len(ts)))
+    resampled = {"ts": day_ms + ids[starts] * 1000 // output_sr}
+    for key in columns:
+        if key == "ts":
+            continue
+        values = np.asarray(columns[key], dtype=np.float64)
+        if aggregator == "mean":
+            result = np.add.reduceat(values, starts) / counts
+        elif aggregator == "std":
+            means = np.add.reduceat(values, starts) / counts
+            result = np.sqrt(np.maximum(np.add.reduceat(values * values, starts) / counts - means * means, 0))
+        elif aggregator == "max_abs":
+            result = np.maximum.reduceat(np.abs(values), starts)
+        else:
+            result = anti_alias(values, ts, input_sr, output_sr)[starts]
+        resampled[key] = result.astype(np.float32)
+    return resampled
+
+
+def get_resampled_path(lion_id, day, output_sr, aggregator):
+    return os.path.join(get_day_store_dir(lion_id, day), f"resampled_{output_sr}hz_{aggregator}.npz")
+
+
+def load_resampled_day(lion_id, csv_path, output_sr, aggregator="mean"):
+    """
+    Resampled columns of a full day, cached per (day, rate, aggregator) and rebuilt when the day csv changes
+    """
+    day = get_day_from_csv_path(csv_path)
+    input_sr = constants["INPUT_SAMPLE_RATE"]
+    stats = get_source_stats(csv_path)
+    cache_path = get_resampled_path(lion_id, day, output_sr, aggregator) if lion_id is not None else None
+    if cache_path and os.path.isfile(cache_path):
+        with np.load(cache_path) as data:
+            if data["size"] == stats["size"] and data["mtime"] == stats["mtime"]:
+                return {key: data[key] for key in STORE_COLS}
+
+    columns = load_day_columns(lion_id, csv_path) if lion_id is not None else read_day_csv(csv_path)
+    resampled = resample_columns(columns, day_start_ms(day), input_sr, output_sr, aggregator)
+    if cache_path:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.tmp.npz"
+        np.savez(tmp_path, size=stats["size"], mtime=stats["mtime"], **resampled)
+        os.replace(tmp_path, cache_path)
+    return resampled
+
+
+def read_resampled_window(data_root, start, end, output_sr=None, aggregator="mean", lion_id=None):
+    """
+    Resampled samples with start <= time <= end, stitched across day files like read_window
+    :return: dict of column arrays (ts, x, y, z)
+    """
+    if output_sr is None:
+        output_sr = constants["OUTPUT_SAMPLE_RATE"]
+    if lion_id is None:
+        lion_id = get_lion_id_for_root(data_root)
+    start_ms, end_ms = to_epoch_ms(start), to_epoch_ms(end)
+
+    parts = [slice_columns(load_resampled_day(lion_id, csv_path, output_sr, aggregator), start_ms, end_ms)
+             for csv_path in get_window_csv_paths(data_root, start, end)]
+    if not parts:
+        return {"ts": np.empty(0, dtype=np.int64), **{key: np.empty(0, dtype=np.float32) for key in STORE_COLS[1:]}}
+    return {key: np.concatenate([part[key] for part in parts]) for key in STORE_COLS}
@@ -0,0 +1,144 @@
+from collections import defaultdict
+import glob
+import json
+import os
+from pathlib import Path
+import subprocess
+import sys
+import time
+
+# get the project root as the parent of the parent directory of this file
+ROOT_DIR = str(Path(__file__).parent.parent.absolute())
+sys.path.append(ROOT_DIR)
+from utils.data_config import data_paths
+
+"""
+Report of a plotting run (spreadsheet_utils.main), written as JSON to data_paths['run_report_path'] with a
+summary on the console.
+
+Every job of the run (R script, R worker, python rendering of a day file, mega plot) is one entry:
+    name, kind         script/day file/plot name and job type
+    status             "ok" or "failed", with exit_code (R) and error
+    seconds            wall time of the job itself (not the time it waited in the pool)
+    log_path           output of the R process, if any
+    input_bytes        size of the files the job read (day csvs or slices, views of a mega plot)
+    output_bytes       size of the files it wrote, None when unknown (R workers)
+    lion_id, view      what was rendered, when the job is about a single animal/view
+The summary adds up the time per kind, view and animal, and lists the slowest jobs and the failures.
+Expected plots are checked by exact file name against one listing of the plot dir.
+"""
+
+SLOWEST_JOBS = 10
+
+
+def get_total_size(paths):
+    """
+    Total size of the files that exist, None if paths is None (unknown)
+    """
+    if paths is None:
+        return None
+    return sum(os.path.getsize(path) for path in paths if path and os.path.isfile(path))
+
+
+def run_job(func, *args, name, kind, log_path=None, input_paths=(), output_paths=(), **fields):
+    """
+    Run and time a job, exceptions (failed R processes included) are reported instead of raised
+    :param output_paths: files written by the job (measured once it is done), None if unknown
+    :param fields: extra report fields (lion_id, view)
+    :return: (report entry, result of func or None if it failed)
+    """
+    start = time.time()
+    status, exit_code, error, result = "ok", 0, None, None
+    try:
+        result = func(*args)
+    except subprocess.CalledProcessError as e:
+        status, exit_code, error = "failed", e.returncode, str(e)
+    except Exception as e:
+        status, exit_code, error = "failed", None, f"{type(e).__name__}: {e}"
+    entry = {
+        "name": name,
+        "kind": kind,
+        "status": status,
+        "exit_code": exit_code,
+        "error": error,
+        "seconds": round(time.time() - start, 3),
+        "log_path": log_path,
+        "input_bytes": get_total_size(input_paths),
+        "output_bytes": get_total_size(output_paths),
+        "lion_id": fields.pop("lion_id", None),
+        "view": fields.pop("view", None),
+        **fields,
+    }
+    return entry, result
+
+
+def find_missing_plots(expected_plots, plot_root):
+    """
+    Expected plot file names (basenames) that are not anywhere under plot_root
+    """
+    generated = {os.path.basename(path) for path in glob.glob(os.path.join(plot_root, "**", "*.png"), recursive=True)}
+    return set(expected_plots) - generated
+
+
+def get_time_totals(jobs, key):
+    """
+    Number of jobs and total seconds per value of a job field (jobs without it are left out)
+    """
+    totals = defaultdict(lambda: {"jobs": 0, "seconds": 0.0})
+    for job in jobs:
+        if job.get(key) is None:
+            continue
+        totals[job[key]]["jobs"] += 1
+        totals[job[key]]["seconds"] += job["seconds"]
+    return {value: {"jobs": total["jobs"], "seconds": round(total["seconds"], 3)}
+            for value, total in sorted(totals.items(), key=lambda item: -item[1]["seconds"])}
+
+
+def build_run_report(jobs, runtime, expected_plots=(), missing_plots=(), slowest=SLOWEST_JOBS):
+    return {
+        "finished": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "runtime_seconds": round(runtime, 3),
+        "num_jobs": len(jobs),
+        "per_kind": get_time_totals(jobs, "kind"),
+        "per_view": get_time_totals(jobs, "view"),
+        "per_animal": get_time_totals(jobs, "lion_id"),
+        "slowest": sorted(jobs, key=lambda job: -job["seconds"])[:slowest],
+        "failures": [job for job in jobs if job["status"] != "ok"],
+        "expected_plots": len(expected_plots),
+        "missing_plots": sorted(missing_plots),
+        "jobs": jobs,
+    }
+
+
+def print_run_report(report, report_path=None):
+    print(f"\nRun report: {report['num_jobs']} jobs in {report['runtime_seconds']:.0f} seconds, "
+          f"{len(report['failures'])} failed" + (f" (details in {report_path})" if report_path else ""))
+    for title, key in (("kind", "per_kind"), ("view", "per_view"), ("animal", "per_animal")):
+        if report[key]:
+            print(f"Time per {title}:")
+            for value, total in report[key].items():
+                print(f"\t{value}: {total['seconds']:.1f} s over {total['jobs']} jobs")
+    if report["slowest"]:
+        print("Slowest jobs:")
+        for job in report["slowest"]:
+            print(f"\t{job['seconds']:7.1f} s  {job['kind']}  {job['name']}")
+    if report["failures"]:
+        print("Failed jobs:")
+        for job in report["failures"]:
+            log = f", log: {job['log_path']}" if job["log_path"] else ""
+            print(f"\t{job['kind']} {job['name']}: {job['error']}{log}")
+
+
+def write_run_report(jobs, runtime, expected_plots=(), missing_plots=(), report_path=None):
+    """
+    Save the report as JSON and print its summary
+    :return: the report
+    """
+    if report_path is None:
+        report_path = data_paths["run_report_path"]
+    report = build_run_report(jobs, runtime, expected_plots, missing_plots)
+    os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=1)
+    print_run_report(report, report_path)
+    return report
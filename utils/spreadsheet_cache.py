@@ -0,0 +1,93 @@
+import glob
+import hashlib
+import os
+from pathlib import Path
+import pickle
+import sys
+
+import pandas as pd
+
+# get the project root as the parent of the parent directory of this file
+ROOT_DIR = str(Path(__file__).parent.parent.absolute())
+sys.path.append(ROOT_DIR)
+from utils.data_config import data_paths
+
+"""
+Single pass ingest of the kill spreadsheets.
+
+Every tab of a workbook is parsed once (openpyxl in read only mode) and the frames are pickled to
+spreadsheet_cache_root, keyed by the sha1 of the workbook. Later runs (and every caller within a run:
+identify_kills, get_plot_info_entries, the csv backups) are served from that cache until the workbook changes.
+Pickle keeps the mixed cell types (dates, times, strings) exactly as pandas parsed them.
+"""
+
+# in process cache: workbook path -> (size, mtime, {sheet name: frame})
+_loaded = {}
+
+
+def get_workbook_hash(xls_path):
+    sha1 = hashlib.sha1()
+    with open(xls_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def get_cache_path(xls_path, workbook_hash):
+    return os.path.join(data_paths["spreadsheet_cache_root"], f"{Path(xls_path).stem}_{workbook_hash}.pkl")
+
+
+def parse_workbook(xls_path):
+    """
+    Parse every tab of a workbook in a single pass
+    :return: dict of sheet name -> DataFrame, in workbook order
+    """
+    return pd.read_excel(xls_path, sheet_name=None, engine="openpyxl")
+
+
+def load_workbook_tabs(xls_path):
+    """
+    Return all tabs of a workbook, parsing it only if neither this process nor the disk cache has seen this version
+    :return: dict of sheet name -> DataFrame, in workbook order
+    """
+    stats = os.stat(xls_path)
+    loaded = _loaded.get(xls_path)
+    if loaded and loaded[0] == stats.st_size and loaded[1] == stats.st_mtime:
+        return loaded[2]
+
+    cache_path = get_cache_path(xls_path, get_workbook_hash(xls_path))
+    tabs = None
+    if os.path.isfile(cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                tabs = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            print(f"WARNING: Ignoring unreadable spreadsheet cache {cache_path}: {e}")
+
+    if tabs is None:
+        tabs = parse_workbook(xls_path)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        # older versions of this workbook are no longer needed
+        for old_path in glob.glob(get_cache_path(xls_path, "*")):
+            os.remove(old_path)
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(tabs, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+
+    _loaded[xls_path] = (stats.st_size, stats.st_mtime, tabs)
+    return tabs
+
+
+def get_sheet_names(xls_path):
+    return list(load_workbook_tabs(xls_path).keys())
+
+
+def get_tab(xls_path, sheet_name):
+    """
+    A single tab of a workbook (a copy, callers are free to modify it)
+    """
+    tabs = load_workbook_tabs(xls_path)
+    if sheet_name not in tabs:
+        raise ValueError(f"Worksheet named '{sheet_name}' not found in {xls_path}")
+    return tabs[sheet_name].copy()
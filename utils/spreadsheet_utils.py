@@ -2,13 +2,14 @@ from collections import defaultdict
 import concurrent.futures
 from datetime import datetime, timedelta
 import glob
-import math
 import multiprocessing
+import numpy as np
 import os
 import pandas as pd
 from pathlib import Path
 from PIL import Image
 import shutil
+import string
 import subprocess
 import sys
 import time
@@ -17,6 +18,21 @@ import time
 ROOT_DIR = str(Path(__file__).parent.parent.absolute())
 sys.path.append(ROOT_DIR)
 from utils.data_config import data_paths, spreadsheets, validate_config, view_configs, is_unix, plot_lines, constants
+from utils.build_cache import (load_build_cache, save_build_cache, hash_inputs, get_file_stamp, is_stale, record,
+                               record_outputs)
+from utils.csv_index import write_csv_slice
+from utils.day_catalog import open_catalog, refresh_catalog, get_day_file
+from utils.day_store import columns_to_frame, to_epoch_ms, day_start_ms
+from utils.event_index import EventIndex
+from utils.event_table import build_info_table, build_kill_table
+from utils.features import add_feature_columns, get_feature_padding
+from utils.labeling import label_window, codes_to_names
+from utils.plot_renderer import render_configs, get_plot_path, get_view_span
+from utils.spreadsheet_cache import get_sheet_names, get_tab
+from utils.resample import read_resampled_window, resample_columns
+from utils.run_report import find_missing_plots, run_job, write_run_report
+from utils.stream_reader import iter_window_chunks, iter_resampled_window_chunks, STREAMED_AGGREGATORS
+from utils.window_reader import read_window, get_window_csv_paths, slice_columns
 
 # TODO: use logger
 # TODO: make command line args
@@ -24,11 +40,19 @@ from utils.data_config import data_paths, spreadsheets, validate_config, view_co
 # TODO: make yellow transpare
 launch = True
 verbose = False
-clear_plot_dir = True
+clear_plot_dir = True      # ignored when incremental, stale plots are overwritten instead
+incremental = True          # only rebuild artifacts whose inputs changed since the last run (see build_cache.py)
 create_csvs = True
+slice_csvs_for_r = True     # give the R scripts pre-sliced copies of the day csvs holding only the plot window
+render_mode = "r"           # "r": one generated R script per kill/view, "r_pool": job manifest rendered by
+                            # long lived R workers, "python": render in process with matplotlib
+use_day_catalog = True      # resolve the day csvs through the catalog of MotionData day files (see day_catalog.py)
+stream_windows = False      # write the labeled windows chunk by chunk (STREAM_CHUNK_ROWS), bounding memory for
+                            # long windows; not available with FEATURE_CHANNELS or the decimate aggregator
 PRE_POST_WINDOW_HOURS = 1
 PRE_KILL_WINDOW_MINS = 30
 POST_KILL_WINDOW_MINS = 30
+MEGA_VIEWS = ["sixhour", "stalking", "killing", "feeding"]     # views of a mega plot, left to right
 
 def dump_tab(xls_path, sheet_name):
     # Get the current date
@@ -42,10 +66,37 @@ def dump_tab(xls_path, sheet_name):
 
     csv_path = os.path.join(root_dir, f"{sheet_name}.csv")
 
-    df = pd.read_excel(xls_path, sheet_name=sheet_name)
+    df = get_tab(xls_path, sheet_name)
     df.to_csv(csv_path, index=False)
     print(f"Created {csv_path=}")
 
+_day_catalog = None
+
+def get_day_catalog():
+    """
+    Catalog of the day csvs under every data root in the spreadsheets config, refreshed (stat only) once per run
+    """
+    global _day_catalog
+    if _day_catalog is None:
+        _day_catalog = open_catalog()
+        data_roots = {root for spreadsheet in spreadsheets.values() for root in spreadsheet.get("tabs", {}).values()}
+        refresh_catalog(_day_catalog, sorted(root for root in data_roots if os.path.isdir(root)))
+    return _day_catalog
+
+def resolve_csv_path(data_root, plot_date):
+    """
+    Day csv of a data root holding the given date
+    :return: (csv_path, found) - when not found the path where the csv was expected
+    """
+    csv_folder = plot_date.strftime("%Y/%m %b/%d/")
+    csv_name = plot_date.strftime("%Y-%m-%d.csv")
+    csv_path = os.path.join(data_root, csv_folder, csv_name)
+    csv_path = csv_path.replace("\\", "/")      # R does not like backward slashes, convert to forward
+    if use_day_catalog:
+        cataloged_path = get_day_file(get_day_catalog(), data_root, plot_date)
+        return (cataloged_path, True) if cataloged_path else (csv_path, False)
+    return csv_path, os.path.isfile(csv_path)
+
 def get_lion_plot_window_dir(lion_id, main=False):
     """
     Return the path where the sub plots (individual windows) for the given lion are expected
@@ -60,135 +111,28 @@ def get_lion_plot_window_dir(lion_id, main=False):
 
     return lion_plot_root
 
-def create_data_from_row(row, missing_csvs, expected_plots, plot_counts):
-    year = row['Start Date'].year
-    month = row['Start Date'].month
-    day = row['Start Date'].day
-    hour = row['Start time'].hour
-    window_low_min = row['Start time'].minute
-    window_high_min = row['End Time'].minute
-    window_high_min = max(window_low_min + 1, window_high_min)      # ensure the window is at least 1 minute
-
-    if 'StartKill' not in row or pd.isnull(row['StartKill']):
-        return None
-
-    cons_window_low_hour = row['StartKill'].hour
-    cons_window_low_min = row['StartKill'].minute
-    cons_window_low_sec = row['StartKill'].second
-    cons_window_high_hour = row['EndCons'].hour
-    cons_window_high_min = row['EndCons'].minute
-    cons_window_high_sec = row['EndCons'].second
-
-    lib_window_low_hour = cons_window_low_hour# row['StartLib'].hour
-    lib_window_low_min = cons_window_low_min # row['StartLib'].minute
-    lib_window_low_sec = cons_window_low_sec # row['StartLib'].second
-    lib_window_high_hour = row['EndLib'].hour
-    lib_window_high_min = row['EndLib'].minute
-    lib_window_high_sec = row['EndLib'].second
-   
-    stalk_start_hour = row['StartStalk'].hour
-    stalk_start_min = row['StartStalk'].minute
-    stalk_start_sec = row['StartStalk'].second
-
-    feed_start_hour = row['FeedStart'].hour
-    feed_start_min = row['FeedStart'].minute
-    feed_start_sec = row['FeedStart'].second
-    feed_stop_hour = row['FeedStop'].hour
-    feed_stop_min = row['FeedStop'].minute
-    feed_stop_sec = row['FeedStop'].second
-    
-
-    plot_date = datetime(year=year, month=month, day=day, hour=hour, minute=window_low_min)
-
-    # csv related
-    # TODO: stalk window, kill start, phase1, phase2  
-
-    kill_id = row['Kill_ID']
-    # if kill_id != 940:          # TODO Debug get rid of
-    #     continue
-    if math.isnan(kill_id):
-        kill_id = no_id_kill_index
-        no_id_kill_index += 1
-    else:
-        kill_id = int(kill_id)
+def create_data_from_row(table, index, missing_csvs, expected_plots, plot_counts):
+    """
+    Config of a valid kill row of the event table (see event_table.py), None when its day csv is missing
+    """
+    lion_id = table.columns["lion_id"][index]
+    kill_id = int(table.columns["Kill_ID"][index])
+    plot_date = table.times["plot_date"].iat[index].to_pydatetime()
 
-    lion_id = f"{row['Sex']}{int(row['AnimalID'])}"
-    lion_plot_root = get_lion_plot_window_dir(lion_id)    
+    lion_plot_root = get_lion_plot_window_dir(lion_id)
     plot_name = plot_date.strftime(f"{lion_id}_%Y-%m-%d__%H_%M__{kill_id}")  # the R script will append config type/kill id and .png
     lion_plot_path = os.path.join(lion_plot_root, plot_name)
 
-    csv_folder = plot_date.strftime("%Y/%m %b/%d/")
-    csv_name = plot_date.strftime("%Y-%m-%d.csv")
-    csv_path = os.path.join(row["data_root"], csv_folder, csv_name)
-    csv_path = csv_path.replace("\\", "/")      # R does not like backward slashes, convert to forward
-    if not os.path.isfile(csv_path):
+    csv_path, found = resolve_csv_path(table.columns["data_root"][index], plot_date)
+    if not found:
         missing_csvs.add(csv_path)
         return None
 
     expected_plots.add(plot_name)
 
     plot_counts[lion_id] += 1
-    data = {
-        "lion_name": f"{lion_id}",
-        "lion_id": lion_id,
-        "window_low_min": window_low_min,
-        "window_high_min": window_high_min,
-        # TODO : can this be simplified?
-        "cons_window_low_hour": cons_window_low_hour,
-        "cons_window_low_min": cons_window_low_min,
-        "cons_window_low_sec": cons_window_low_sec,
-        "cons_window_high_hour": cons_window_high_hour,
-        "cons_window_high_min": cons_window_high_min,
-        "cons_window_high_sec": cons_window_high_sec,
-        # TODO
-        "lib_window_low_hour": lib_window_low_hour,
-        "lib_window_low_min": lib_window_low_min,
-        "lib_window_low_sec": lib_window_low_sec,
-        "lib_window_high_hour": lib_window_high_hour,
-        "lib_window_high_min": lib_window_high_min,
-        "lib_window_high_sec": lib_window_high_sec,
-        # TODO
-        "stalk_start_hour": stalk_start_hour,
-        "stalk_start_min": stalk_start_min,
-        "stalk_start_sec": stalk_start_sec,
-        "feed_start_hour": feed_start_hour,
-        "feed_start_min": feed_start_min,
-        "feed_start_sec": feed_start_sec,
-        "feed_stop_hour": feed_stop_hour,
-        "feed_stop_min": feed_stop_min,
-        "feed_stop_sec": feed_stop_sec,
-        "year": year,
-        "month": month,
-        "day": day,
-        "hour": hour,
-        "Kill_ID": kill_id,
-        "lion_plot_path": lion_plot_path,
-        "csv_path": csv_path,
-
-        "marker_1_hour": 0,
-        "marker_1_min": 0,
-        "marker_1_sec": 0,
-        "marker_1_label": 0,   
-        # TODO
-        "marker_2_hour": 0,
-        "marker_2_min": 0,
-        "marker_2_sec": 0,
-        "marker_2_label": 0, 
-
-        "marker_info": get_marker_info(info_plot=False),
-        "is_sixhour": "FALSE",
-        # timestamps
-        "ts_kill_start": datetime(year, month, day, cons_window_low_hour, cons_window_low_min, cons_window_low_sec),
-        # dataframe timestamps, used for behavior classification
-        "df_stalk_start": pd.Timestamp(pd.Timestamp(year, month, day, stalk_start_hour, stalk_start_min, stalk_start_sec)),
-        "df_stalk_end": pd.Timestamp(pd.Timestamp(year, month, day, cons_window_low_hour, cons_window_low_min, cons_window_low_sec)),
-        "df_kill_start": pd.Timestamp(pd.Timestamp(year, month, day, cons_window_low_hour, cons_window_low_min, cons_window_low_sec)),
-        "df_kill_end": pd.Timestamp(pd.Timestamp(year, month, day, cons_window_high_hour, cons_window_high_min, cons_window_high_sec)),
-        "df_feed_start": pd.Timestamp(pd.Timestamp(year, month, day, feed_start_hour, feed_start_min, feed_start_sec)),
-        "df_feed_stop": pd.Timestamp(pd.Timestamp(year, month, day, feed_stop_hour, feed_stop_min, feed_stop_sec)),
-    }
+    return table.record(index, lion_plot_path=lion_plot_path, csv_path=csv_path)
 
-    return data
 def identify_kills():
     """
     Iterate over all spreadsheets/tabs and generate a config dict
@@ -206,46 +150,46 @@ def identify_kills():
         path = os.path.join(spreadsheet_root, spreadsheet)
         print(f"Processing spreadsheet {path}")
         df_all = pd.DataFrame()
-        with pd.ExcelFile(path) as f:
-            sheets = f.sheet_names
-            if "tabs" in spreadsheets[spreadsheet]:
-                cfg_sheets = spreadsheets[spreadsheet]["tabs"]
-                if sheets != cfg_sheets:
-                    print("INFO: You are using a subset of the sheets in the spreadsheet:")
-                    print(f"\tSheets in file: {sorted(sheets)}")
-                    print(f"\tSheets in cfg:  {sorted(cfg_sheets)}")
-            else:
-                cfg_sheets = f.sheet_names
-
-            tab_skipped = False
-            for sheet in cfg_sheets:
-                dump_tab(path, sheet)
-                df = f.parse(sheet)
-                cols = spreadsheets[spreadsheet]['data_cols']
-                if not all(column in df.columns for column in cols):
-                    print(f"WARNING: Missing columns in tab {sheet}, no data read from there.")
-                    tab_skipped = True
-                    continue
-                df = df[cols]
-                df = df[df['Period'] == 'Kill']
-                df["data_root"] = spreadsheets[spreadsheet]["tabs"][sheet]
-                df_all = pd.concat([df_all, df], ignore_index=True)
+        # every tab is parsed once per workbook version, see spreadsheet_cache.py
+        sheets = get_sheet_names(path)
+        if "tabs" in spreadsheets[spreadsheet]:
+            cfg_sheets = spreadsheets[spreadsheet]["tabs"]
+            if sheets != cfg_sheets:
+                print("INFO: You are using a subset of the sheets in the spreadsheet:")
+                print(f"\tSheets in file: {sorted(sheets)}")
+                print(f"\tSheets in cfg:  {sorted(cfg_sheets)}")
+        else:
+            cfg_sheets = sheets
+
+        tab_skipped = False
+        for sheet in cfg_sheets:
+            dump_tab(path, sheet)
+            df = get_tab(path, sheet)
+            cols = spreadsheets[spreadsheet]['data_cols']
+            if not all(column in df.columns for column in cols):
+                print(f"WARNING: Missing columns in tab {sheet}, no data read from there.")
+                tab_skipped = True
+                continue
+            df = df[cols]
+            df = df[df['Period'] == 'Kill']
+            df["data_root"] = spreadsheets[spreadsheet]["tabs"][sheet]
+            df_all = pd.concat([df_all, df], ignore_index=True)
 
         if tab_skipped:
             print(f"Some tabs skipped because of bad data. Expected columns: {', '.join(cols)}")
         if verbose:
             print(f"ALL {df_all}")
 
-    no_id_kill_index = 9999
-    for index, row in df_all.iterrows():
-        try:
-            data = create_data_from_row(row, missing_csvs, expected_plots, plot_counts)
+    # every row is converted and validated at once, see event_table.py
+    if len(df_all):
+        table = build_kill_table(df_all)
+        table.constants["marker_info"] = get_marker_info(info_plot=False)
+        for index, reason in table.errors.items():
+            print(f"Invalid row for animal of {df_all['AnimalID'].iat[index]}, kill of {df_all['Kill_ID'].iat[index]}: {reason}")
+        for index in np.flatnonzero(table.valid):
+            data = create_data_from_row(table, index, missing_csvs, expected_plots, plot_counts)
             if data:
                 configs.append(data)
-        except Exception as e:
-            # print(f"Ignoring row {row}")
-            print(f"Invalid row for animal of {row['AnimalID']}, kill of {row['Kill_ID']}: {e}")
-        # expected_plots.add(data["lion_plot_path"])
 
     if missing_csvs:
         print(f"WARNING: The following {len(missing_csvs)} CSVs were missing, will not be processed:")
@@ -258,10 +202,11 @@ def identify_kills():
     return configs, expected_plots
 
     
-def get_plot_info_entries():
+def get_plot_info_entries(event_index=None):
     """
     Iterate over all entries in the info tab
     for each data window of interest.
+    :param event_index: EventIndex the markers of the info plots are added to
     :return:
     """
     configs = []
@@ -270,6 +215,7 @@ def get_plot_info_entries():
     missing_csvs = set()
     plot_counts = defaultdict(int)
     generated_files = []
+    info_configs = []
     template_path = os.path.abspath(data_paths["template_path"])
     output_path = os.path.abspath(data_paths["output_path"])
 
@@ -277,140 +223,66 @@ def get_plot_info_entries():
         path = os.path.join(spreadsheet_root, spreadsheet)
         print(f"Processing spreadsheet {path}")
         df_all = pd.DataFrame()
-        with pd.ExcelFile(path) as f:
-            sheets = f.sheet_names
-            if 'InfoPlots' not in sheets:
-                print("No InfoPlots tab, skipping")
-                continue
-            sheet = 'InfoPlots'
-            
-            dump_tab(path, sheet)
-            df = f.parse(sheet)
-            cols = spreadsheets[spreadsheet]['data_cols_info']
-            if not all(column in df.columns for column in cols):
-                print(f"WARNING: Missing columns in tab {sheet}, no data read from there.")
-                continue
-            df = df[cols]
-            # TODO 
-            # df["data_root"] = spreadsheets[spreadsheet]["tabs"][sheet]
-            df_all = pd.concat([df_all, df], ignore_index=True)
-
-
-    for index, row in df_all.iterrows():
-        year = row['Start Date'].year
-        month = row['Start Date'].month
-        day = row['Start Date'].day
-        hour = row['Start time'].hour
-        window_low_min = row['Start time'].minute
-        window_high_min = row['End time'].minute
-        window_high_min = max(window_low_min + 1, window_high_min)      # ensure the window is at least 1 minute
-
-        # if 'StartKill' not in row or pd.isnull(row['StartKill']):
-        #     continue
-
-        if not pd.isnull(row['MarkerTime1']):
-            marker_1_hour = row['MarkerTime1'].hour
-            marker_1_min = row['MarkerTime1'].minute
-            marker_1_sec = row['MarkerTime1'].second
-            marker_1_label = row['MarkerLabel1']
-        else:
-            marker_1_hour = marker_1_min = marker_1_sec = 0
-            marker_1_label = "Unused"
-
-        if not pd.isnull(row['MarkerTime2']):
-            marker_2_hour = row['MarkerTime2'].hour
-            marker_2_min = row['MarkerTime2'].minute
-            marker_2_sec = row['MarkerTime2'].second
-            marker_2_label = row['MarkerLabel2']
-        else:
-            marker_2_hour = marker_2_min = marker_2_sec = 0
-            marker_2_label = "Unused"
-
-        plot_label = row['PlotLabel']
-        plot_label = plot_label.replace(' ', '_')
-
-
-        plot_date = datetime(year=year, month=month, day=day, hour=hour, minute=window_low_min)
+        sheets = get_sheet_names(path)
+        if 'InfoPlots' not in sheets:
+            print("No InfoPlots tab, skipping")
+            continue
+        sheet = 'InfoPlots'
 
-        kill_id = row['Kill_ID']
-        # if kill_id != 940:          # TODO Debug get rid of
-        #     continue
-        # if math.isnan(kill_id):
-        #     kill_id = no_id_kill_index
-        #     no_id_kill_index += 1
-        # else:
-        #     kill_id = int(kill_id)
+        dump_tab(path, sheet)
+        df = get_tab(path, sheet)
+        cols = spreadsheets[spreadsheet]['data_cols_info']
+        if not all(column in df.columns for column in cols):
+            print(f"WARNING: Missing columns in tab {sheet}, no data read from there.")
+            continue
+        df = df[cols]
+        # TODO 
+        # df["data_root"] = spreadsheets[spreadsheet]["tabs"][sheet]
+        df_all = pd.concat([df_all, df], ignore_index=True)
+
+
+    # every row is converted and validated at once, see event_table.py
+    table, valid_rows = None, []
+    if len(df_all):
+        table = build_info_table(df_all)
+        valid_rows = np.flatnonzero(table.valid)
+        for index, reason in table.errors.items():
+            print(f"WARNING: Invalid InfoPlots row for animal of {df_all['AnimalID'].iat[index]}, "
+                  f"kill of {df_all['Kill_ID'].iat[index]}: {reason}")
+    unknown_lions = set()
+
+    for index in valid_rows:
+        lion_id = table.columns["lion_id"][index]
+        kill_id = table.columns["Kill_ID"][index]
+        plot_date = table.times["plot_date"].iat[index].to_pydatetime()
+        plot_label = str(df_all['PlotLabel'].iat[index]).replace(' ', '_')
+        if lion_id not in spreadsheets[spreadsheet]["tabs"]:
+            unknown_lions.add(lion_id)
+            continue
 
-        lion_id = f"{row['Sex']}{int(row['AnimalID'])}"
-        lion_plot_root = get_lion_plot_window_dir(lion_id, main=True)        
+        lion_plot_root = get_lion_plot_window_dir(lion_id, main=True)
         plot_name = plot_date.strftime(f"{lion_id}_%Y-%m-%d__%H_%M__{kill_id}__{plot_label}")  # the R script will append config type/kill id and .png
         lion_plot_path = os.path.join(lion_plot_root, plot_name)
 
-        csv_folder = plot_date.strftime("%Y/%m %b/%d/")
-        csv_name = plot_date.strftime("%Y-%m-%d.csv")
         data_root = spreadsheets[spreadsheet]["tabs"][lion_id]
-        csv_path = os.path.join(data_root, csv_folder, csv_name)
-        csv_path = csv_path.replace("\\", "/")      # R does not like backward slashes, convert to forward
-        if not os.path.isfile(csv_path):
+        csv_path, found = resolve_csv_path(data_root, plot_date)
+        if not found:
             missing_csvs.add(csv_path)
             continue
 
-        expected_plots.add(plot_name)
-
         plot_counts[lion_id] += 1
-        data = {
-            "lion_name": f"{lion_id}",
-            "window_low_min": window_low_min,
-            "window_high_min": window_high_min,
-            "info_view": True,
-            # TODO : can this be simplified?
-            "cons_window_low_hour": 0, #cons_window_low_hour,
-            "cons_window_low_min": 0, #cons_window_low_min,
-            "cons_window_low_sec": 0, #cons_window_low_sec,
-            "cons_window_high_hour": 0, #cons_window_high_hour,
-            "cons_window_high_min": 0, #cons_window_high_min,
-            "cons_window_high_sec": 0, #cons_window_high_sec,
-            # TODO
-            "lib_window_low_hour": 0, #lib_window_low_hour,
-            "lib_window_low_min": 0, #lib_window_low_min,
-            "lib_window_low_sec": 0, #lib_window_low_sec,
-            "lib_window_high_hour":0, # lib_window_high_hour,
-            "lib_window_high_min": 0, #lib_window_high_min,
-            "lib_window_high_sec": 0, #lib_window_high_sec,
-            # TODO
-            "stalk_start_hour": 0, #stalk_start_hour,
-            "stalk_start_min": 0, #stalk_start_min,
-            "stalk_start_sec": 0, #stalk_start_sec,
-            "feed_start_hour": 0,
-            "feed_start_min": 0,
-            "feed_start_sec": 0,
-            "feed_stop_hour": 0,
-            "feed_stop_min": 0,
-            "feed_stop_sec": 0,
-            # TODO
-            "marker_1_hour": marker_1_hour,
-            "marker_1_min": marker_1_min,
-            "marker_1_sec": marker_1_sec,
-            "marker_1_label": marker_1_label,   
-            # TODO
-            "marker_2_hour": marker_2_hour,
-            "marker_2_min": marker_2_min,
-            "marker_2_sec": marker_2_sec,
-            "marker_2_label": marker_2_label,           
-
-            "year": year,
-            "month": month,
-            "day": day,
-            "hour": hour,
-            "Kill_ID": kill_id,
-            "lion_plot_path": lion_plot_path,
-            "csv_path": csv_path,
-
-            "marker_info": get_marker_info(info_plot=True, marker_1_label=marker_1_label, marker_2_label=marker_2_label),
-            "is_sixhour": "FALSE",
-        }
+        data = table.record(
+            index,
+            lion_plot_path=lion_plot_path,
+            csv_path=csv_path,
+            csv_paths=f'"{csv_path}"',
+            csv_days=f'"{plot_date.strftime("%Y-%m-%d")}"',
+            marker_info=get_marker_info(info_plot=True, marker_1_label=table.columns["marker_1_label"][index],
+                                        marker_2_label=table.columns["marker_2_label"][index]),
+        )
         # configs.append(data)
         # expected_plots.add(data["lion_plot_path"])
+        info_configs.append(data)
 
     # if missing_csvs:
     #     print(f"WARNING: The following {len(missing_csvs)} CSVs were missing, will not be processed:")
@@ -432,6 +304,7 @@ def get_plot_info_entries():
             data["window_pre_mins"] = 0# value["window_pre_mins"]
             data["window_post_mins"] = 0# value["window_post_mins"]
             data["minor_tick_interval"] = 10 # TODO value["minor_tick_interval"]
+            expected_plots.add(os.path.basename(get_r_plot_path(data)))     # exact file name of the plot
             filled_template = template_content.format(**data)
             filled_template = filled_template.replace("\\", "/")
 
@@ -449,6 +322,10 @@ def get_plot_info_entries():
     #     for key in view_configs.keys():
     #         all_expected_plots.add(f"{expected_plot}_{key}")
 
+    if unknown_lions:
+        print(f"WARNING: No tab (data root) configured for {', '.join(sorted(unknown_lions))}, their info plots are skipped")
+    if event_index is not None:
+        event_index.add_configs(info_configs)
     return generated_files, expected_plots
 
 
@@ -510,60 +387,188 @@ def run_r_script(script_name):
     r_path = os.path.abspath(data_paths["r_path"])
     with open(output_file, 'w') as f:
         subprocess.run([r_path, script_name], stdout=f, stderr=subprocess.STDOUT, check=True)
+
+def run_r_worker(manifest_path, worker_id, num_workers):
+    """
+    Launch a long lived R worker that renders every num_workers-th job of the manifest,
+    save output to name of manifest + .worker<id>.log
+    """
+    output_file = f"{manifest_path}.worker{worker_id}.log"
+    r_path = os.path.abspath(data_paths["r_path"])
+    worker_path = os.path.abspath(data_paths["worker_path"])
+    template_path = os.path.abspath(data_paths["template_path"])
+    with open(output_file, 'w') as f:
+        subprocess.run([r_path, worker_path, manifest_path, template_path, str(worker_id), str(num_workers)],
+                       stdout=f, stderr=subprocess.STDOUT, check=True)
     
 
-def generate_scripts(configs, expected_plots):
+def get_view_csv_args(config, view_name, window_pre_mins, window_post_mins):
+    """
+    Return the csv_paths/csv_days template fields (R vectors) for the day files covering a view.
+    Wide views (day, sixhour) can span the previous/next day.
+    If slice_csvs_for_r is set, each day file is replaced by a slice holding only the rows in the view window
+    (the slices are written by write_view_slices).
+    """
+    window_low = datetime(config['year'], config['month'], config['day'], config['hour'], config['window_low_min'])
+    window_high = window_low + timedelta(minutes=config['window_high_min'] - config['window_low_min'])
+    view_start = window_low - timedelta(minutes=window_pre_mins)
+    view_end = window_high + timedelta(minutes=window_post_mins)
+    csv_paths = get_window_csv_paths(config['data_root'], view_start, view_end)
+    if not csv_paths:
+        csv_paths = [config['csv_path']]
+    csv_days = [Path(csv_path).stem for csv_path in csv_paths]
+
+    slices = []
+    source_csv_paths = csv_paths
+    if slice_csvs_for_r:
+        slice_dir = os.path.join(os.path.abspath(data_paths["output_path"]), "slices")
+        sliced_paths = []
+        for csv_path, csv_day in zip(csv_paths, csv_days):
+            slice_path = os.path.join(slice_dir, f"{config['lion_name']}_{view_name}_{config['Kill_ID']}_{csv_day}.csv")
+            slice_path = slice_path.replace("\\", "/")
+            slices.append((csv_path, to_epoch_ms(view_start), to_epoch_ms(view_end), slice_path))
+            sliced_paths.append(slice_path)
+        csv_paths = sliced_paths
+
+    return {
+        "csv_paths": ", ".join(f'"{csv_path}"' for csv_path in csv_paths),
+        "csv_days": ", ".join(f'"{csv_day}"' for csv_day in csv_days),
+        "source_csv_paths": source_csv_paths,
+        "view_slices": slices,
+    }
+
+def write_view_slices(config):
+    """
+    Write the pre-sliced day csvs planned by get_view_csv_args for the current view of a config
+    """
+    for csv_path, start_ms, end_ms, slice_path in config["view_slices"]:
+        os.makedirs(os.path.dirname(slice_path), exist_ok=True)
+        write_csv_slice(csv_path, start_ms, end_ms, slice_path)
+
+def get_r_plot_path(config):
+    # must match plot_name in rcode/template.r
+    return f"{config['lion_plot_path']}_{config['plot_type']}_{config['Kill_ID']}.png"
+
+def get_view_hash(filled_template, config):
+    """
+    Input hash of a rendered view: the filled template covers the row fields, template and view config,
+    the stamps cover the source day files
+    """
+    return hash_inputs(filled_template, [get_file_stamp(csv_path) for csv_path in config["source_csv_paths"]])
+
+def set_view_fields(config, key, value):
+    """
+    Fill in the per-view template fields of a config (view name, window size, day files to read)
+    """
+    config["plot_type"] = key
+    config["window_pre_mins"] = value["window_pre_mins"]
+    config["window_post_mins"] = value["window_post_mins"]
+    config["minor_tick_interval"] = value["minor_tick_interval"]
+    config["is_sixhour"] = str(key == "sixhour").upper()
+    config.update(get_view_csv_args(config, key, value["window_pre_mins"], value["window_post_mins"]))
+    return config
+
+def generate_scripts(configs, build_cache=None, pending_outputs=None, script_jobs=None):
     """
     For each config generated from the spreadhsheet data, generate
     an R script to extract the data.
     Generate a batch file that will run contain all generated scripts.
     :param configs:
-    :return:
+    :param build_cache: if given, views whose plot is up to date are skipped (see build_cache.py)
+    :param pending_outputs: if given, filled with plot path -> input hash of every generated script
+    :param script_jobs: if given, filled with script path -> plot path, input csvs, lion id and view of every
+                        generated script (for the mega plots and the run report)
+    :return: paths of the generated scripts
     """
     template_path = os.path.abspath(data_paths["template_path"])
     output_path = os.path.abspath(data_paths["output_path"])
-    all_expected_plots = set()
 
     with open(template_path, "r") as template_file:
         template_content = template_file.read()
 
     generated_files = []
+    up_to_date = 0
     for config in configs:
         for key, value in view_configs.items():
-            config["plot_type"] = key
-            config["window_pre_mins"] = value["window_pre_mins"]
-            config["window_post_mins"] = value["window_post_mins"]
-            config["minor_tick_interval"] = value["minor_tick_interval"]
-            config["is_sixhour"] = str(key == "sixhour").upper()
+            set_view_fields(config, key, value)
             filled_template = template_content.format(**config)
             filled_template = filled_template.replace("\\", "/")
 
+            plot_path = get_r_plot_path(config)
+            view_hash = get_view_hash(filled_template, config)
+            if build_cache is not None and not is_stale(build_cache, plot_path, view_hash):
+                up_to_date += 1
+                continue
+            if pending_outputs is not None:
+                pending_outputs[plot_path] = view_hash
+
+            write_view_slices(config)
             out_fname = os.path.join(output_path, f"script_{config['lion_name']}_{config['plot_type']}_{config['Kill_ID']}.r")
             with open(out_fname, "w") as output_file:
                 output_file.write(filled_template)
             if verbose:
                 print(f"Generated {out_fname}")
             generated_files.append(out_fname)
+            if script_jobs is not None:
+                input_paths = [slice_path for *_, slice_path in config["view_slices"]] or config["source_csv_paths"]
+                script_jobs[out_fname] = {"plot_path": plot_path, "input_paths": input_paths,
+                                          "lion_id": config['lion_id'], "view": key}
 
-    print(f"\nGenerated {len(generated_files)} commands")
+    print(f"\nGenerated {len(generated_files)} commands ({up_to_date} plots already up to date)")
 
-    
-    for expected_plot in expected_plots:
-        for key in view_configs.keys():
-            all_expected_plots.add(f"{expected_plot}_{key}")
+    return generated_files
+
+def generate_manifest(configs, build_cache=None, pending_outputs=None):
+    """
+    Write a single job manifest (one row per kill/view) holding the fields that the template needs.
+    The R workers (rcode/worker.r) fill the template from these rows themselves.
+    :param build_cache: if given, views whose plot is up to date are left out of the manifest
+    :param pending_outputs: if given, filled with plot path -> input hash of every job in the manifest
+    :return: path of the manifest, number of jobs
+    """
+    template_path = os.path.abspath(data_paths["template_path"])
+    output_path = os.path.abspath(data_paths["output_path"])
+
+    with open(template_path, "r") as template_file:
+        template_content = template_file.read()
+    template_fields = sorted({field for _, field, _, _ in string.Formatter().parse(template_content) if field})
+
+    rows = []
+    for config in configs:
+        for key, value in view_configs.items():
+            set_view_fields(config, key, value)
+            plot_path = get_r_plot_path(config)
+            view_hash = get_view_hash(template_content.format(**config).replace("\\", "/"), config)
+            if build_cache is not None and not is_stale(build_cache, plot_path, view_hash):
+                continue
+            if pending_outputs is not None:
+                pending_outputs[plot_path] = view_hash
 
-    return generated_files, all_expected_plots
+            write_view_slices(config)
+            row = {"job_id": f"{config['lion_name']}_{config['plot_type']}_{config['Kill_ID']}"}
+            row.update({field: str(config[field]).replace("\\", "/") for field in template_fields})
+            rows.append(row)
+
+    manifest_path = os.path.join(output_path, "manifest.csv")
+    pd.DataFrame(rows).to_csv(manifest_path, index=False)
+    print(f"\nWrote {len(rows)} jobs to {manifest_path}")
+
+    return manifest_path, len(rows)
 
 def get_all_view_options():
      # return a list of all valid views, used by command line parser
     return list(view_configs.keys())
 
 def combine_images(paths, new_name):
+    """
+    Paste the images side by side into new_name
+    :return: True if the combined image was saved
+    """
     images = []
     for path in paths:
         if not os.path.isfile(path):
             print(f"Unable to combine images due to missing {path}")
-            return
+            return False
         images.append(Image.open(path))
 
 
@@ -584,34 +589,153 @@ def combine_images(paths, new_name):
 
     # Save the combined image
     combined_image.save(new_name)
+    return True
+
+def get_mega_plot_path(killing_plot):
+    """
+    Mega plot of a kill from the path of its killing view (mega plots are moved up one dir)
+    """
+    new_name = killing_plot.replace('killing', 'mega')
+    return os.path.join(os.path.dirname(os.path.dirname(new_name)), os.path.basename(new_name))
+
+def is_mega_plot_current(image_paths, mega_path):
+    """
+    True if the mega plot exists and is newer than every one of its views
+    """
+    try:
+        mega_mtime = os.stat(mega_path).st_mtime_ns
+        return all(os.stat(path).st_mtime_ns <= mega_mtime for path in image_paths)
+    except OSError:
+        return False
 
-def make_mega_plots(root, expected_plots):
+def combine_mega_plot(image_paths, mega_path):
+    """
+    Combine the views of a kill (day, stalking, labeling, feeding) into its mega plot
+    :return: True if the mega plot was written
+    """
+    new_name = image_paths[MEGA_VIEWS.index('killing')].replace('killing', 'mega')
+    if not combine_images(image_paths, new_name):
+        return False
+    shutil.move(new_name, mega_path)
+    return True
+
+class MegaPlotCompositor:
+    """
+    Combines the mega plot of a kill as soon as the last of its views is rendered, in a thread pool
+    (PIL decodes, pastes and encodes without holding the GIL), so composing overlaps the rendering
+    instead of running serially after it.
+    Mega plots that exist and are newer than their views (or whose views are unchanged according to the
+    build cache) are not combined again.
+    """
+    def __init__(self, build_cache=None, max_workers=1):
+        self.build_cache = build_cache
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        self.image_paths = {}       # mega plot path -> view plot paths
+        self.waiting = {}           # mega plot path -> views still to be rendered
+        self.view_megas = {}        # view plot path -> mega plot path
+        self.futures = {}           # future -> (mega plot path, input hash)
+        self.jobs = []              # run report entries (see run_report.py)
+        self.up_to_date = 0
+
+    def add_kill(self, image_paths, pending_plots=()):
+        """
+        :param image_paths: view plots of the kill, in MEGA_VIEWS order
+        :param pending_plots: plots rendered in this run, the kill waits for those among its views
+        """
+        mega_path = get_mega_plot_path(image_paths[MEGA_VIEWS.index('killing')])
+        if mega_path in self.image_paths:
+            return
+        self.image_paths[mega_path] = image_paths
+        waiting = {path for path in image_paths if path in pending_plots}
+        if not waiting:
+            self.submit(mega_path)
+            return
+        self.waiting[mega_path] = waiting
+        for path in waiting:
+            self.view_megas[path] = mega_path
+
+    def add_configs(self, configs, pending_plots=()):
+        if not all(view in view_configs for view in MEGA_VIEWS):
+            return
+        for config in configs:
+            self.add_kill([get_plot_path(config, view) for view in MEGA_VIEWS], pending_plots)
+
+    def plot_done(self, plot_path):
+        """
+        A view has been rendered, combine its kill if it was the last one missing
+        """
+        mega_path = self.view_megas.pop(plot_path, None)
+        if mega_path is None:
+            return
+        waiting = self.waiting[mega_path]
+        waiting.discard(plot_path)
+        if not waiting:
+            del self.waiting[mega_path]
+            self.submit(mega_path)
+
+    def plots_done(self, plot_paths):
+        for plot_path in plot_paths:
+            self.plot_done(plot_path)
+
+    def submit(self, mega_path):
+        image_paths = self.image_paths[mega_path]
+        if is_mega_plot_current(image_paths, mega_path):
+            self.up_to_date += 1
+            return
+        mega_hash = hash_inputs([get_file_stamp(path) for path in image_paths])
+        if self.build_cache is not None and not is_stale(self.build_cache, mega_path, mega_hash):
+            self.up_to_date += 1
+            return
+        future = self.executor.submit(run_job, combine_mega_plot, image_paths, mega_path,
+                                      name=os.path.basename(mega_path), kind="mega_plot", input_paths=image_paths,
+                                      output_paths=[mega_path], lion_id=os.path.basename(os.path.dirname(mega_path)))
+        self.futures[future] = (mega_path, mega_hash)
+
+    def close(self):
+        """
+        Combine the kills still waiting for views (failed renders, R workers that do not report per plot),
+        wait for every mega plot and record them in the build cache
+        :return: number of mega plots written
+        """
+        waiting, self.waiting, self.view_megas = list(self.waiting), {}, {}
+        for mega_path in waiting:
+            self.submit(mega_path)
+
+        written = 0
+        for future in concurrent.futures.as_completed(self.futures):
+            mega_path, mega_hash = self.futures[future]
+            entry, combined = future.result()
+            self.jobs.append(entry)
+            if entry["status"] != "ok":
+                print(f"Unable to combine {mega_path}: {entry['error']}")
+                continue
+            if not combined:
+                continue
+            written += 1
+            if self.build_cache is not None:
+                record(self.build_cache, mega_path, mega_hash)
+        self.executor.shutdown()
+        print(f"Combined {written} mega plots ({self.up_to_date} already up to date)")
+        return written
+
+def make_mega_plots(root, expected_plots, build_cache=None, max_workers=1):
     """
     If we have a labeling plot, attempt to make a larger image of the sequence:
         day, stalking, labeling, feeding
-    This allows for a quick view at different levels
+    This allows for a quick view at different levels.
+    Sweeps every killing plot under root, main() combines the kills of a run as they are rendered instead
+    (see MegaPlotCompositor).
     :param root:
     :param expected_plots:
+    :param build_cache: if given, mega plots whose four views are unchanged are not combined again
     :return:
     """
-    generated_plots = glob.glob(os.path.join(data_paths["plot_root"], "*/*/*.png"))
+    compositor = MegaPlotCompositor(build_cache, max_workers)
+    generated_plots = glob.glob(os.path.join(root, "*/*/*.png"))
     for plot in generated_plots:
         if 'killing' in plot:
-            path0 = plot.replace('killing', 'sixhour')
-            path1 = plot.replace('killing', 'stalking')
-            path2 = plot
-            path3 = plot.replace('killing', 'feeding')
-            new_name = plot.replace('killing', 'mega')
-            image_paths = [path0, path1, path2, path3]
-            combine_images(image_paths, new_name)
-            if os.path.isfile(new_name):
-                # move mega plots up one dr
-                directory_containing_file = os.path.dirname(new_name)
-                parent_directory = os.path.dirname(directory_containing_file)
-                new_file_path = os.path.join(parent_directory, os.path.basename(new_name))
-
-                # Move the file
-                shutil.move(new_name, new_file_path)
+            compositor.add_kill([plot.replace('killing', view) for view in MEGA_VIEWS])
+    return compositor.close()
 
 def get_optimal_processes():
     """
@@ -622,36 +746,174 @@ def get_optimal_processes():
 
     return optimal_processes
 
-# Define a function that categorizes each row
-def categorize(row, config):    
+def read_window_columns(config, start_timestamp, end_timestamp):
     """
-    Label the behavior in the row using the start/end windows set in the ODBA spreadsheet.
+    Read (and resample / add the derived channels to) the samples of a collar between two times
+    :return: dict of column arrays (ts, x, y, z and the FEATURE_CHANNELS)
     """
-    try:
-        # print(f"Time {row['UTC DateTime']=}")
-        if config["df_stalk_start"] <= row['UTC DateTime'] < config["df_kill_start"]:
-            return "STALK"
-        elif config["df_kill_start"] <= row['UTC DateTime'] < config["df_kill_end"]:
-            return "KILL"
-        elif config["df_feed_start"] <= row['UTC DateTime'] < config["df_feed_stop"]:
-            return "FEED"
-        else:
-            return "NON_KILL"
-    except Exception as e:
-        print(f"Error at time {row['UTC DateTime']=}")
-        raise e
-    
-def create_csv_per_window(configs):
+    input_sr = constants['INPUT_SAMPLE_RATE']
+    output_sr = constants['OUTPUT_SAMPLE_RATE']
+    aggregator = constants['RESAMPLE_AGGREGATOR']
+    feature_channels = constants['FEATURE_CHANNELS']
+
+    # only the rows inside the window are read, stitching the previous/next day file when the window
+    # crosses midnight (read from the columnar day store when the day has been ingested)
+    if feature_channels:
+        padding = timedelta(seconds=get_feature_padding())
+        columns = read_window(config['data_root'], start_timestamp - padding, end_timestamp + padding,
+                              lion_id=config['lion_id'])
+        return get_feature_window(columns, start_timestamp, end_timestamp)
+    if input_sr != output_sr:
+        # the data_config allows users to downsample the data, whole days are resampled once per
+        # rate/aggregator and cached (see resample.py)
+        return read_resampled_window(config['data_root'], start_timestamp, end_timestamp, output_sr,
+                                     aggregator, lion_id=config['lion_id'])
+    return read_window(config['data_root'], start_timestamp, end_timestamp, lion_id=config['lion_id'])
+
+def get_feature_window(columns, start_timestamp, end_timestamp):
+    """
+    Add the FEATURE_CHANNELS to (and resample) the raw samples of a window
+    Derived channels are computed from the raw samples of the window padded by get_feature_padding (so the
+    running means at its edges are exact), then resampled together with the axes. Only that padded span is
+    used, whatever else columns holds, so a window never depends on the other kills read with it (the
+    decimate filter runs over the whole span it is given).
+    :param columns: raw samples covering at least the padded window
+    """
+    input_sr = constants['INPUT_SAMPLE_RATE']
+    output_sr = constants['OUTPUT_SAMPLE_RATE']
+    padding = timedelta(seconds=get_feature_padding())
+    columns = slice_columns(columns, to_epoch_ms(start_timestamp - padding), to_epoch_ms(end_timestamp + padding))
+    columns = add_feature_columns(columns, input_sr, constants['FEATURE_CHANNELS'])
+    if input_sr != output_sr:
+        columns = resample_columns(columns, day_start_ms(start_timestamp), input_sr, output_sr,
+                                   constants['RESAMPLE_AGGREGATOR'])
+    return slice_columns(columns, to_epoch_ms(start_timestamp), to_epoch_ms(end_timestamp))
+
+def write_window_csv(columns, config, output_csv, event_index=None):
+    """
+    Label the samples of a window and write them as a raw BEBE input file
+    :param event_index: EventIndex of all kills, labels come from every event of the animal when given
+    """
+    feature_channels = constants['FEATURE_CHANNELS']
+    df = columns_to_frame(columns)
+    for channel in feature_channels:
+        df[channel] = columns[channel]
+
+    # add the behavior label using the windows set in ODBA spreadsheet
+    df['Category'] = codes_to_names(label_window(df['UTC DateTime'], config, event_index))
+
+    # export only the accel data and label (leave out timestamp)
+    export_cols = ['Acc X [g]', 'Acc Y [g]', 'Acc Z [g]', *feature_channels, 'Category']
+
+    # df.to_csv(output_csv, index=False)  # Set index=False to avoid saving row numbers as a column
+    df.to_csv(output_csv, index=False, columns=export_cols)  # Set index=False to avoid saving row numbers as a column
+    print(f"Generated RAW file: {output_csv}")
+
+def can_stream_windows():
+    if constants['FEATURE_CHANNELS']:
+        print("WARNING: stream_windows is not available with FEATURE_CHANNELS, reading whole windows")
+        return False
+    if constants['INPUT_SAMPLE_RATE'] != constants['OUTPUT_SAMPLE_RATE'] \
+            and constants['RESAMPLE_AGGREGATOR'] not in STREAMED_AGGREGATORS:
+        print(f"WARNING: stream_windows is not available with the {constants['RESAMPLE_AGGREGATOR']} aggregator, "
+              f"reading whole windows")
+        return False
+    return True
+
+def stream_window_csv(config, start_timestamp, end_timestamp, output_csv, event_index=None):
+    """
+    Streaming version of read_window_columns + write_window_csv: read, resample, label and append the window
+    one chunk at a time so memory depends on STREAM_CHUNK_ROWS and not on the length of the window
+    """
+    input_sr = constants['INPUT_SAMPLE_RATE']
+    output_sr = constants['OUTPUT_SAMPLE_RATE']
+    if input_sr != output_sr:
+        chunks = iter_resampled_window_chunks(config['data_root'], start_timestamp, end_timestamp, output_sr,
+                                              constants['RESAMPLE_AGGREGATOR'], lion_id=config['lion_id'])
+    else:
+        chunks = iter_window_chunks(config['data_root'], to_epoch_ms(start_timestamp), to_epoch_ms(end_timestamp),
+                                    lion_id=config['lion_id'])
+
+    export_cols = ['Acc X [g]', 'Acc Y [g]', 'Acc Z [g]', 'Category']
+    header = True
+    with open(output_csv, 'w', newline='') as f:
+        for columns in chunks:
+            df = columns_to_frame(columns)
+            df['Category'] = codes_to_names(label_window(df['UTC DateTime'], config, event_index))
+            df.to_csv(f, index=False, columns=export_cols, header=header)
+            header = False
+        if header:
+            # empty window, same file as write_window_csv would give
+            pd.DataFrame(columns=export_cols).to_csv(f, index=False)
+    print(f"Generated RAW file: {output_csv}")
+
+def extract_day_group(jobs, event_index=None):
+    """
+    Write the windows of all kills that share a source day file, reading the span covering them once
+    :param jobs: list of (config, start, end, output_csv, window_hash)
+    :param event_index: EventIndex of all kills used to label the windows
+    :return: list of (output_csv, window_hash) written
+    """
+    if stream_windows and can_stream_windows():
+        # every window is streamed on its own, the group span is never held in memory
+        written = []
+        for config, start_timestamp, end_timestamp, output_csv, window_hash in jobs:
+            try:
+                stream_window_csv(config, start_timestamp, end_timestamp, output_csv, event_index)
+                written.append((output_csv, window_hash))
+            except Exception as e:
+                print(f"Unable to write window for {config['lion_id']} kill {config['Kill_ID']}: {e}")
+        return written
+
+    group_start = min(job[1] for job in jobs)
+    group_end = max(job[2] for job in jobs)
+    feature_channels = constants['FEATURE_CHANNELS']
+    if feature_channels:
+        # only the raw samples are shared, each window gets its features and resampling from its own
+        # padded span (get_feature_window) so it matches what read_window_columns gives for it alone
+        padding = timedelta(seconds=get_feature_padding())
+        config = jobs[0][0]
+        columns = read_window(config['data_root'], group_start - padding, group_end + padding,
+                              lion_id=config['lion_id'])
+    else:
+        columns = read_window_columns(jobs[0][0], group_start, group_end)
+
+    written = []
+    for config, start_timestamp, end_timestamp, output_csv, window_hash in jobs:
+        try:
+            if feature_channels:
+                window = get_feature_window(columns, start_timestamp, end_timestamp)
+            else:
+                window = slice_columns(columns, to_epoch_ms(start_timestamp), to_epoch_ms(end_timestamp))
+            write_window_csv(window, config, output_csv, event_index)
+            written.append((output_csv, window_hash))
+        except Exception as e:
+            print(f"Unable to write window for {config['lion_id']} kill {config['Kill_ID']}: {e}")
+    return written
+
+def create_csv_per_window(configs, build_cache=None, max_workers=1, event_index=None):
+    """
+    Write one labeled window csv per kill config for the BEBE formatter.
+    Configs are grouped by their source day file, each group is read once and the groups are
+    distributed over max_workers processes.
+    Samples are labeled against the events of every kill of the animal (event_index, built from the
+    configs if not given), so overlapping windows of two kills agree on their labels.
+    """
+    if event_index is None:
+        event_index = EventIndex.from_configs(configs)
     raw_data_root = data_paths["raw_data_root"]
     alternate_ids = defaultdict(bool)               # hack to "create" more users by splitting each user in half
     alt_ids_idx = 0
 
     input_sr = constants['INPUT_SAMPLE_RATE']
     output_sr = constants['OUTPUT_SAMPLE_RATE']
+    aggregator = constants['RESAMPLE_AGGREGATOR']
+    feature_channels = constants['FEATURE_CHANNELS']
     if input_sr != output_sr:
-        samples_to_aggregate = input_sr // output_sr
-        print(f"Aggregating {samples_to_aggregate} into 1 (reducing sample rate from {input_sr} Hz to {output_sr} Hz)")
+        print(f"Resampling with {aggregator} (reducing sample rate from {input_sr} Hz to {output_sr} Hz)")
 
+    # plan the windows first (ids and file names depend on the config order), then extract them per day file
+    day_groups = defaultdict(list)
     for config in configs:
         # for field in config:
         #     print(f"{field=}, {config[field]}")
@@ -675,73 +937,98 @@ def create_csv_per_window(configs):
 
 
 
-        input_csv = config['csv_path']
-        df = pd.read_csv(input_csv, skiprows=1)
-
-
-        specific_day = f"{config['year']:04d}-{config['month']:02d}-{config['day']:02d}"
-        # Convert 'timestamp' column from string to datetime format
-        df['UTC DateTime'] = df['UTC DateTime'].astype(str)
-        df['UTC DateTime'] = pd.to_datetime(specific_day + ' ' + df['UTC DateTime'])#, format='%H:%M:%S')        
-
         start_timestamp = (config["ts_kill_start"] - timedelta(minutes=PRE_KILL_WINDOW_MINS))
         end_timestamp = (config["ts_kill_start"] + timedelta(minutes=POST_KILL_WINDOW_MINS))
+        if PRE_POST_WINDOW_HOURS == 24:
+            # full day of the kill
+            start_timestamp = datetime(config['year'], config['month'], config['day'])
+            end_timestamp = start_timestamp + timedelta(days=1)
 
-        # TODO: this code cuts off the end of the window at midnight
-        # this is because the accel csv files are of single days
-        # a future improvement will be to combine the two csvs into one frame
-
-        # the data_config allows users to downsample the data
-        if input_sr != output_sr:
-            samples_to_aggregate = input_sr // output_sr
-            df = df.groupby(df.index // samples_to_aggregate).mean()
-            
-        
-        # Get the end of the current day (midnight of the next day)
-        end_of_day = datetime(start_timestamp.year, start_timestamp.month, start_timestamp.day) + timedelta(days=1)
-
-        # Compare and choose the earlier timestamp
-        final_end_timestamp = min(end_timestamp, end_of_day)
+        # Save the DataFrame to a CSV file
+        # only use the lion number (remove the sex)
+        # output_csv = os.path.join(raw_data_root, f"acc_exp{config['Kill_ID']}{PRE_POST_WINDOW_HOURS}_user{lion_id}.txt",)# '/home/matthew/AI_Capstone/ai-capstone/data/labeled_windows/F202_kill.csv'
+        output_csv = os.path.join(raw_data_root, f"acc_exp{config['Kill_ID']}_user{lion_id}.txt",)# '/home/matthew/AI_Capstone/ai-capstone/data/labeled_windows/F202_kill.csv'
 
-        # Format the timestamp
-        # end_timestamp = final_end_timestamp.strftime("%I:%M:%S %p")
+        # skip windows whose row, labels and source day files are unchanged since the csv was written
+        window_hash = hash_inputs(config['lion_id'], start_timestamp, end_timestamp, input_sr, output_sr,
+                                  aggregator, feature_channels, constants['STATIC_WINDOW_SECS'],
+                                  constants['DBA_SMOOTH_SECS'],
+                                  event_index.get_events(config['lion_id'], start_timestamp, end_timestamp),
+                                  [get_file_stamp(csv_path) for csv_path in
+                                   get_window_csv_paths(config['data_root'], start_timestamp, end_timestamp)])
+        if build_cache is not None and not is_stale(build_cache, output_csv, window_hash):
+            if verbose:
+                print(f"Up to date RAW file: {output_csv}")
+            continue
 
+        day_groups[config['csv_path']].append((config, start_timestamp, end_timestamp, output_csv, window_hash))
 
-        # Filter DataFrame based on the timestamp range
-        if PRE_POST_WINDOW_HOURS != 24:
-            df = df[(df['UTC DateTime'] >= start_timestamp) & (df['UTC DateTime'] <= end_timestamp)]
-        
-        # add the behavior label using the windows set in ODBA spreadsheet
-        df['Category'] = df.apply(lambda row: categorize(row, config), axis=1)
+    num_windows = sum(len(jobs) for jobs in day_groups.values())
+    print(f"Extracting {num_windows} windows from {len(day_groups)} day files")
+    written = []
+    if max_workers <= 1 or len(day_groups) <= 1:
+        for jobs in day_groups.values():
+            written.extend(extract_day_group(jobs, event_index))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(extract_day_group, jobs, event_index) for jobs in day_groups.values()]
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    written.extend(future.result())
+                except Exception as e:
+                    print(f"Error occurred: {e}")
 
-        # export only the accel data and label (leave out timestamp)
-        export_cols = ['Acc X [g]', 'Acc Y [g]', 'Acc Z [g]', 'Category']
+    if build_cache is not None:
+        for output_csv, window_hash in written:
+            record(build_cache, output_csv, window_hash)
+        save_build_cache(build_cache)
 
-        # Save the DataFrame to a CSV file
-        # only use the lion number (remove the sex)
-        # output_csv = os.path.join(raw_data_root, f"acc_exp{config['Kill_ID']}{PRE_POST_WINDOW_HOURS}_user{lion_id}.txt",)# '/home/matthew/AI_Capstone/ai-capstone/data/labeled_windows/F202_kill.csv'
-        output_csv = os.path.join(raw_data_root, f"acc_exp{config['Kill_ID']}_user{lion_id}.txt",)# '/home/matthew/AI_Capstone/ai-capstone/data/labeled_windows/F202_kill.csv'
-        # df.to_csv(output_csv, index=False)  # Set index=False to avoid saving row numbers as a column
-        df.to_csv(output_csv, index=False, columns=export_cols)  # Set index=False to avoid saving row numbers as a column
-        print(f"Generated RAW file: {output_csv}")
 
+def get_python_plot_hashes(configs, event_index=None):
+    """
+    Input hash of every plot rendered in process (render_mode "python"): row fields, view config, source day files
+    and the events drawn in the view
+    """
+    plot_hashes = {}
+    for config in configs:
+        for view_name, view in view_configs.items():
+            view_start, view_end = get_view_span(config, view)
+            stamps = [get_file_stamp(csv_path) for csv_path in get_window_csv_paths(config['data_root'], view_start, view_end)]
+            events = event_index.get_events(config['lion_id'], view_start, view_end) if event_index else None
+            plot_hashes[get_plot_path(config, view_name)] = hash_inputs("python", config, view, plot_lines, stamps, events)
+    return plot_hashes
 
 def main():
     validate_config()
-    configs, expected_plots = identify_kills()
+    configs, _ = identify_kills()
+    # every kill (and InfoPlots marker, added below) of every animal, shared by the labeler and the renderer
+    event_index = EventIndex.from_configs(configs)
+    build_cache = load_build_cache() if incremental else None
     if create_csvs:
-        create_csv_per_window(configs)
+        create_csv_per_window(configs, build_cache, max_workers=get_optimal_processes(), event_index=event_index)
         print("STOPPING at labeled files generation for now")
         return
-    generated_scripts, expected_plots = generate_scripts(configs, expected_plots)
+    manifest_path, num_jobs = None, 0
+    pending_outputs = {}        # plot path -> input hash of plots rendered by R, recorded once they exist
+    script_jobs = {}            # generated script -> the plot it renders, its inputs (see generate_scripts)
+    if render_mode == "python":
+        # kill plots are rendered in process below, only the info plots still go through R
+        generated_scripts = []
+    elif render_mode == "r_pool":
+        # kill plots are rendered by the R workers below, the info plots still use generated scripts
+        manifest_path, num_jobs = generate_manifest(configs, build_cache, pending_outputs)
+        generated_scripts = []
+    else:
+        generated_scripts = generate_scripts(configs, build_cache, pending_outputs, script_jobs)
     
-    info_scripts, info_expected_plots = get_plot_info_entries()
+    info_scripts, info_expected_plots = get_plot_info_entries(event_index)
     generated_scripts.extend(info_scripts)
-    for plot in info_expected_plots:
-        expected_plots.add(plot)
+    # exact file names of every plot of the run (kill views and info plots)
+    expected_plots = {os.path.basename(get_plot_path(config, view)) for config in configs for view in view_configs}
+    expected_plots.update(info_expected_plots)
     
     if launch:
-        if clear_plot_dir:
+        if clear_plot_dir and not incremental:
             plot_root = data_paths["plot_root"]
             print(f"Clearing PNG files from plot dir: {plot_root}")
             file_pattern = os.path.join(plot_root, '*/*.png')  # remove all mega png files
@@ -754,38 +1041,73 @@ def main():
                     print(f"Error removing file {file_path}: {e}")
 
         start = time.time()
+        jobs = []                   # run report entries of every job (see run_report.py)
         
         max_processes = get_optimal_processes()  # Adjust this based on your system's capacity
+        # mega plots are combined as soon as the views of a kill are rendered
+        compositor = MegaPlotCompositor(build_cache, max_workers=max_processes)
+        if render_mode == "python":
+            plot_hashes = get_python_plot_hashes(configs, event_index)
+            skip_plots = set()
+            if build_cache is not None:
+                skip_plots = {plot_path for plot_path, plot_hash in plot_hashes.items()
+                              if not is_stale(build_cache, plot_path, plot_hash)}
+                print(f"{len(skip_plots)} plots already up to date")
+            compositor.add_configs(configs, set(plot_hashes) - skip_plots)
+            for plot_path in render_configs(configs, max_workers=max_processes, skip_plots=skip_plots,
+                                            event_index=event_index, on_done=compositor.plots_done, jobs=jobs):
+                pending_outputs[plot_path] = plot_hashes[plot_path]
+        else:
+            compositor.add_configs(configs, pending_outputs)
+
         # Using ThreadPoolExecutor to run the scripts in parallel
         with concurrent.futures.ThreadPoolExecutor(max_workers=max_processes) as executor:
-            # Submit each script to the executor
+            # Submit each script to the executor, timed for the run report
             # TODO: use generated scripts instead of updated scripts
-            futures = [executor.submit(run_r_script, script) for script in generated_scripts]
+            futures = []
+            for script in generated_scripts:
+                # info plot scripts are not in script_jobs, their output is not known here
+                job = script_jobs.get(script, {})
+                futures.append(executor.submit(
+                    run_job, run_r_script, script, name=os.path.basename(script), kind="r_script",
+                    log_path=f"{script}.log", input_paths=job.get("input_paths", ()),
+                    output_paths=[job["plot_path"]] if job else None, plot_path=job.get("plot_path"),
+                    lion_id=job.get("lion_id"), view=job.get("view")))
+            if manifest_path:
+                num_workers = min(max_processes, num_jobs)
+                futures.extend(executor.submit(
+                    run_job, run_r_worker, manifest_path, worker_id, num_workers, name=f"r_worker{worker_id}",
+                    kind="r_worker", log_path=f"{manifest_path}.worker{worker_id}.log", input_paths=[manifest_path],
+                    output_paths=None) for worker_id in range(num_workers))
 
             # Wait for all scripts to complete
             for future in concurrent.futures.as_completed(futures):
-                try:
-                    future.result()
-                except Exception as e:
-                    print(f"Error occurred: {e}")
+                entry, _ = future.result()
+                jobs.append(entry)
+                if entry["status"] != "ok":
+                    print(f"Error occurred: {entry['error']}")
+                    continue
+                # the R workers render many kills each, their mega plots are combined in compositor.close
+                compositor.plot_done(entry.get("plot_path"))
 
         runtime = time.time() - start
         print(f"Runtime: {runtime:3.0f} seconds")
-        print(f"Average time per run: {runtime/len(expected_plots):2.2f} seconds")
-
-        make_mega_plots(data_paths["plot_root"], expected_plots)
-
-        # check expected plots
-        generated_plots = glob.glob(os.path.join(data_paths["plot_root"], "*/*/*.png"))
-        for plot in list(expected_plots):
-            for generated_plot in generated_plots:
-                if plot in generated_plot:
-                    expected_plots.remove(plot)
-                    break
-
-        if expected_plots:
-            print(f"The following {len(expected_plots)} plots were expected but not found:")
-            for plot in expected_plots:
+        print(f"Average time per run: {runtime/max(len(expected_plots), 1):2.2f} seconds")
+
+        if build_cache is not None:
+            record_outputs(build_cache, pending_outputs, start)
+        compositor.close()
+        jobs.extend(compositor.jobs)
+        if build_cache is not None:
+            save_build_cache(build_cache)
+
+        # check expected plots by exact file name, against a single listing of the plot dir
+        missing_plots = find_missing_plots(expected_plots, data_paths["plot_root"])
+        write_run_report(jobs, time.time() - start, expected_plots, missing_plots)
+
+        if missing_plots:
+            print(f"The following {len(missing_plots)} plots were expected but not found:")
+            for plot in sorted(missing_plots):
                 print(f"\t{plot}")
         else:
             print("SUCCESS: All expected plots appear to be generated!")
@@ -793,4 +1115,4 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
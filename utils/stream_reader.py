@@ -0,0 +1,168 @@
+import io
+from pathlib import Path
+import sys
+
+import numpy as np
+import pandas as pd
+
+# get the project root as the parent of the parent directory of this file
+ROOT_DIR = str(Path(__file__).parent.parent.absolute())
+sys.path.append(ROOT_DIR)
+from utils.data_config import constants
+from utils.csv_index import get_byte_range, load_index, read_unindexed_window
+from utils.day_store import (day_start_ms, frame_to_columns, get_day_from_csv_path, is_day_stored, load_day,
+                             to_epoch_ms, ACC_COLS, MS_COL, STORE_COLS, TIME_COL)
+from utils.resample import resample_columns
+from utils.window_reader import get_lion_id_for_root, get_window_csv_paths, slice_columns
+
+"""
+Streaming (bounded memory) reads of long windows.
+
+iter_window_chunks yields the samples of a window as dicts of column arrays (ts, x, y, z) of at most
+STREAM_CHUNK_ROWS rows, with the timestamps already parsed, walking the day files (or day store columns)
+that overlap the window one after the other. stream_resample reduces such a stream to the output rate,
+carrying the incomplete last bucket of each chunk over to the next one, so the result is identical to
+resampling the whole window at once (resample.py). Peak memory depends on the chunk size, not on the
+length of the window.
+
+The decimate aggregator (zero phase filter over whole runs) needs the full signal and is not streamed.
+"""
+
+STREAMED_AGGREGATORS = ["mean", "std", "max_abs"]
+
+
+class RangeReader(io.RawIOBase):
+    """
+    File like view of a csv holding its header followed by only the bytes [lo, hi) of the body
+    """
+    def __init__(self, f, header_size, lo, hi):
+        self.f = f
+        self.parts = [(0, header_size), (lo, hi)]
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while self.parts:
+            pos, end = self.parts[0]
+            if pos >= end:
+                self.parts.pop(0)
+                continue
+            self.f.seek(pos)
+            data = self.f.read(min(len(buffer), end - pos))
+            if not data:
+                self.parts.pop(0)
+                continue
+            buffer[:len(data)] = data
+            self.parts[0] = (pos + len(data), end)
+            return len(data)
+        return 0
+
+
+def iter_csv_chunks(csv_path, start_ms, end_ms, chunk_rows):
+    """
+    Chunks of the rows of a day csv with start_ms <= ts <= end_ms, seeking to the window with the sidecar index
+    """
+    try:
+        index = load_index(csv_path)
+    except ValueError as e:
+        # not indexable (see csv_index.py): parse it whole, sorted as stream_resample expects
+        print(f"WARNING: Reading all of {csv_path} without its index: {e}")
+        columns = read_unindexed_window(csv_path, start_ms, end_ms)
+        order = np.argsort(columns["ts"], kind="stable")
+        for chunk_start in range(0, len(order), chunk_rows):
+            yield {key: values[order[chunk_start:chunk_start + chunk_rows]] for key, values in columns.items()}
+        return
+    day = get_day_from_csv_path(csv_path)
+    lo, hi = get_byte_range(index, start_ms, end_ms, day_start_ms(day))
+    with open(csv_path, "rb") as f:
+        reader = io.BufferedReader(RangeReader(f, index["data_start"], lo, hi))
+        frames = pd.read_csv(reader, skiprows=1, usecols=[TIME_COL, MS_COL, *ACC_COLS.values()], chunksize=chunk_rows,
+                             dtype={TIME_COL: str, MS_COL: np.int64, **{col: np.float32 for col in ACC_COLS.values()}})
+        for df in frames:
+            columns = slice_columns(frame_to_columns(df, day), start_ms, end_ms)
+            if len(columns["ts"]):
+                yield columns
+
+
+def iter_day_chunks(lion_id, csv_path, start_ms, end_ms, chunk_rows):
+    """
+    Chunks of a single day inside the window, from the (memory mapped) day store when available
+    """
+    day = get_day_from_csv_path(csv_path)
+    if lion_id is None or not is_day_stored(lion_id, day, csv_path):
+        yield from iter_csv_chunks(csv_path, start_ms, end_ms, chunk_rows)
+        return
+
+    columns = load_day(lion_id, day)
+    lo = np.searchsorted(columns["ts"], start_ms, side="left")
+    hi = np.searchsorted(columns["ts"], end_ms, side="right")
+    for chunk_start in range(lo, hi, chunk_rows):
+        chunk_end = min(chunk_start + chunk_rows, hi)
+        yield {key: np.asarray(columns[key][chunk_start:chunk_end]) for key in STORE_COLS}
+
+
+def iter_window_chunks(data_root, start_ms, end_ms, lion_id=None, chunk_rows=None):
+    """
+    Samples with start_ms <= ts <= end_ms (epoch ms) of a collar, as chunks of at most chunk_rows rows
+    """
+    if chunk_rows is None:
+        chunk_rows = constants["STREAM_CHUNK_ROWS"]
+    if lion_id is None:
+        lion_id = get_lion_id_for_root(data_root)
+    start = pd.Timestamp(start_ms, unit="ms").to_pydatetime()
+    end = pd.Timestamp(end_ms, unit="ms").to_pydatetime()
+    for csv_path in get_window_csv_paths(data_root, start, end):
+        yield from iter_day_chunks(lion_id, csv_path, start_ms, end_ms, chunk_rows)
+
+
+def get_bucket_bounds(ts_ms, output_sr):
+    """
+    First and last epoch ms of the output bucket holding ts_ms (buckets are aligned to midnight as in resample.py)
+    """
+    origin = day_start_ms(pd.Timestamp(ts_ms, unit="ms"))
+    bucket = (ts_ms - origin) * output_sr // 1000
+    # bucket k holds the ts with (ts - origin) * output_sr // 1000 == k
+    first = origin - (-bucket * 1000 // output_sr)
+    last = origin - (-(bucket + 1) * 1000 // output_sr) - 1
+    return first, last
+
+
+def stream_resample(chunks, origin_ms, input_sr, output_sr, aggregator="mean"):
+    """
+    Resample a stream of chunks, holding back the rows of the last (possibly incomplete) bucket of each chunk
+    :param origin_ms: a midnight (epoch ms), the origin of the output grid
+    """
+    if aggregator not in STREAMED_AGGREGATORS:
+        raise ValueError(f"Aggregator {aggregator} can not be streamed, expected one of {', '.join(STREAMED_AGGREGATORS)}")
+    carry = None
+    for chunk in chunks:
+        if carry is not None:
+            chunk = {key: np.concatenate([carry[key], chunk[key]]) for key in chunk}
+        ids = (chunk["ts"] - origin_ms) * output_sr // 1000
+        split = np.searchsorted(ids, ids[-1], side="left")
+        carry = {key: values[split:] for key, values in chunk.items()}
+        if split:
+            yield resample_columns({key: values[:split] for key, values in chunk.items()}, origin_ms, input_sr,
+                                   output_sr, aggregator)
+    if carry is not None and len(carry["ts"]):
+        yield resample_columns(carry, origin_ms, input_sr, output_sr, aggregator)
+
+
+def iter_resampled_window_chunks(data_root, start, end, output_sr=None, aggregator="mean", lion_id=None,
+                                 chunk_rows=None):
+    """
+    Streaming counterpart of resample.read_resampled_window: resampled samples with start <= time <= end
+    """
+    if output_sr is None:
+        output_sr = constants["OUTPUT_SAMPLE_RATE"]
+    start_ms, end_ms = to_epoch_ms(start), to_epoch_ms(end)
+    # read whole buckets, like resampling whole days and slicing them does
+    read_start = get_bucket_bounds(start_ms, output_sr)[0]
+    read_end = get_bucket_bounds(end_ms, output_sr)[1]
+    chunks = iter_window_chunks(data_root, read_start, read_end, lion_id, chunk_rows)
+    for resampled in stream_resample(chunks, day_start_ms(start), constants["INPUT_SAMPLE_RATE"], output_sr,
+                                     aggregator):
+        resampled = slice_columns(resampled, start_ms, end_ms)
+        if len(resampled["ts"]):
+            yield resampled
@@ -0,0 +1,95 @@
+from datetime import timedelta
+import os
+from pathlib import Path
+import sys
+
+import numpy as np
+
+# get the project root as the parent of the parent directory of this file
+ROOT_DIR = str(Path(__file__).parent.parent.absolute())
+sys.path.append(ROOT_DIR)
+from utils.data_config import spreadsheets
+from utils.csv_index import read_csv_window
+from utils.day_store import get_day_csv_path, get_day_from_csv_path, is_day_stored, load_day, to_epoch_ms, STORE_COLS
+
+"""
+Read an arbitrary time window of accelerometer data for a collar, stitching consecutive
+day files together when the window crosses midnight.
+
+Only the days that overlap the window are touched, and from each of them only the rows
+inside the window are kept (the tail of the first day, the head of the last day).
+"""
+
+
+def get_lion_id_for_root(data_root):
+    """
+    Reverse lookup of the spreadsheet tab (lion id) that owns a MotionData root, None if not configured
+    """
+    norm_root = os.path.normpath(data_root)
+    for spreadsheet in spreadsheets.values():
+        for lion_id, root in spreadsheet.get("tabs", {}).items():
+            if os.path.normpath(root) == norm_root:
+                return lion_id
+    return None
+
+
+def get_window_days(start, end):
+    """
+    List of the calendar days overlapped by [start, end]
+    """
+    day = start.date()
+    days = []
+    while day <= end.date():
+        days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def get_window_csv_paths(data_root, start, end):
+    """
+    Paths of the day csvs that overlap the window (missing days are left out)
+    """
+    csv_paths = [get_day_csv_path(data_root, day) for day in get_window_days(start, end)]
+    return [csv_path for csv_path in csv_paths if os.path.isfile(csv_path)]
+
+
+def slice_columns(columns, start_ms, end_ms):
+    """
+    Keep only the rows of a day with start_ms <= ts <= end_ms
+    Day columns are sorted by time, so the boundaries are found with a binary search.
+    """
+    lo = np.searchsorted(columns["ts"], start_ms, side="left")
+    hi = np.searchsorted(columns["ts"], end_ms, side="right")
+    return {key: np.asarray(columns[key][lo:hi]) for key in columns}
+
+
+def read_day_window(lion_id, csv_path, start_ms, end_ms):
+    """
+    Read the rows of a single day inside the window, from the day store when available,
+    otherwise by seeking to the window in the csv with its sidecar index
+    """
+    day = get_day_from_csv_path(csv_path)
+    if lion_id is not None and is_day_stored(lion_id, day, csv_path):
+        return slice_columns(load_day(lion_id, day), start_ms, end_ms)
+    return read_csv_window(csv_path, start_ms, end_ms)
+
+
+def read_window(data_root, start, end, lion_id=None):
+    """
+    Read all samples with start <= time <= end for the collar stored under data_root
+    :param data_root: MotionData root of the collar (as in spreadsheets[...]["tabs"])
+    :param start: window start (naive UTC datetime)
+    :param end: window end (naive UTC datetime)
+    :param lion_id: day store key, looked up from the spreadsheet config when not given
+    :return: dict of column arrays (ts, x, y, z), empty if no day files overlap the window
+    """
+    if lion_id is None:
+        lion_id = get_lion_id_for_root(data_root)
+    start_ms = to_epoch_ms(start)
+    end_ms = to_epoch_ms(end)
+
+    parts = [read_day_window(lion_id, csv_path, start_ms, end_ms)
+             for csv_path in get_window_csv_paths(data_root, start, end)]
+    if not parts:
+        return {"ts": np.empty(0, dtype=np.int64), **{key: np.empty(0, dtype=np.float32) for key in STORE_COLS[1:]}}
+    return {key: np.concatenate([part[key] for part in parts]) for key in STORE_COLS}